@@ -2,10 +2,12 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_mail import Mail
 from pathlib import Path
+import os
 import secrets
 
 persistent_path: Path = Path(__file__).resolve().parent
-db_path = persistent_path / "database" / "sqlite.db"
+# The database location can be overridden, e.g. to run the app on a synthetic corpus (see benchmarks/)
+db_path = Path(os.environ.get("VERBATIMS_DB_PATH", persistent_path / "database" / "sqlite.db"))
 
 # App settings
 anonymise_contributors = True
@@ -15,6 +17,14 @@ app.config["SQLALCHEMY_DATABASE_URI"] = f'sqlite:///{db_path}'
 app.config["SQLALCHEMY_ECHO"] = False
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+# Seconds during which browsers and reverse proxies may reuse a contributions page without revalidating it
+app.config["CONTRIBUTIONS_CACHE_MAX_AGE"] = 60
+
+# Hand the bytes of downloads over to the fronting proxy: None, 'x-accel-redirect' (nginx) or 'x-sendfile'
+app.config["DOWNLOAD_OFFLOAD"] = os.environ.get("VERBATIMS_DOWNLOAD_OFFLOAD") or None
+# Internal nginx location holding the resources/ and app/database/exports/ directories
+app.config["DOWNLOAD_ACCEL_REDIRECT_PREFIX"] = "/protected-downloads"
+
 # Mail configuration
 app.config["MAIL_SERVER"] = "smtp.example.com"  # Replace with your SMTP server
 app.config["MAIL_PORT"] = 587
@@ -22,21 +32,46 @@ app.config["MAIL_USE_TLS"] = True
 app.config["MAIL_USERNAME"] = "your-email@example.com"  # Replace with your email
 app.config["MAIL_PASSWORD"] = "your-password"  # Replace with your password
 app.config["MAIL_DEFAULT_SENDER"] = "your-email@example.com"  # Replace with your email
-app.config["SECRET_KEY"] = secrets.token_hex(16)  # Generate a random secret key
+# Generate a random secret key, unless one is provided (required for captcha tokens to survive a restart)
+app.config["SECRET_KEY"] = os.environ.get("VERBATIMS_SECRET_KEY") or secrets.token_hex(16)
+
+# Seconds during which a captcha can be answered
+app.config["CAPTCHA_MAX_AGE"] = 10 * 60
+
+# Lifetime of a discussion event stream (each open stream holds a worker thread) and delay between two reads
+app.config["DISCUSSION_EVENTS_MAX_DURATION"] = 30
+app.config["DISCUSSION_EVENTS_POLL_INTERVAL"] = 1.0
+# Threads of a worker, set from the gunicorn threads setting when a worker is forked (see gunicorn.conf.py)
+app.config["WORKER_THREADS"] = 4
+# Share of the worker threads that event streams may hold at once (at least one stream), below 1 so that ordinary
+# requests always get a thread: 3 streams for 4 threads
+app.config["DISCUSSION_EVENTS_STREAM_SHARE"] = 0.75
 
 db = SQLAlchemy()
 mail = Mail()
 
+
+def create_app():
+    """
+    Return the app, once the database is bootstrapped.
+
+    Importing the package only configures the app: the schema creation, migrations, first import
+    and loading of the in-memory corpus structures run here, once per process tree (see
+    app.bootstrap). Under gunicorn this happens in the master process, before workers are forked.
+
+    Returns:
+        Flask: The application
+    """
+    from app.bootstrap import bootstrap
+    bootstrap(app)
+    return app
+
+
 from app import views
+from app import api
 from app import models
+from app import cli
 
 db.init_app(app)
 mail.init_app(app)
 
-with app.app_context():
-    db.create_all()
-
-# Initialize database with data if needed
-from app.database import DatabaseInitializer
-db_initializer = DatabaseInitializer(app)
-db_initializer.initialize_database()
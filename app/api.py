@@ -0,0 +1,232 @@
+import hashlib
+import itertools
+import json
+from datetime import datetime
+
+from flask import Response, jsonify, request, stream_with_context
+from sqlalchemy import func, select
+
+from app import app, db
+from app.database import get_corpus_version
+from app.models import Answer, Comment, Contribution
+from app.pagination import cursor_int, decode_cursor, encode_cursor
+
+# Public fields of each resource, mapped to their column (IP addresses and user agents are never exposed)
+CONTRIBUTION_FIELDS = {
+    'id': Contribution.id,
+    'contributor': Contribution.anonymized_contributor,
+    'body': Contribution.body,
+    'time': Contribution.time,
+    'formatted_time': Contribution.formatted_time,
+}
+COMMENT_FIELDS = {
+    'id': Comment.id,
+    'username': Comment.username,
+    'body': Comment.body,
+    'created_at': Comment.created_at,
+}
+ANSWER_FIELDS = {
+    'id': Answer.id,
+    'comment_id': Answer.comment_id,
+    'username': Answer.username,
+    'body': Answer.body,
+    'created_at': Answer.created_at,
+}
+
+# Page size of the JSON mode
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# Number of rows fetched at once from the database cursor in NDJSON mode
+STREAM_BATCH_SIZE = 1000
+
+
+class ApiError(Exception):
+    """Invalid API request, answered with a 400 JSON error."""
+
+
+@app.errorhandler(ApiError)
+def handle_api_error(error):
+    return jsonify({'error': str(error)}), 400
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value):
+    """Serialize a row, datetimes in ISO 8601."""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=_json_default)
+
+
+def parse_fields(available_fields, nested_fields=()):
+    """
+    Read the fields requested with the 'fields' parameter (every field by default).
+
+    Args:
+        available_fields (dict): Public fields of the resource
+        nested_fields (tuple): Names of the fields loaded from another table (e.g. 'answers')
+
+    Returns:
+        list: Requested field names, in the order of the request
+    """
+    fields_arg = request.args.get('fields')
+    if not fields_arg:
+        return list(available_fields) + list(nested_fields)
+    fields = [field.strip() for field in fields_arg.split(',') if field.strip()]
+    unknown_fields = [field for field in fields if field not in available_fields and field not in nested_fields]
+    if unknown_fields or not fields:
+        allowed = ', '.join(list(available_fields) + list(nested_fields))
+        raise ApiError(f"Unknown fields: {', '.join(unknown_fields) or '(none)'}. Available fields: {allowed}")
+    return list(dict.fromkeys(fields))
+
+
+def parse_limit(default):
+    """Read the 'limit' parameter, bounded by MAX_LIMIT (None means no limit when default is None)."""
+    limit_arg = request.args.get('limit')
+    if limit_arg is None:
+        return default
+    if not limit_arg.isdigit() or int(limit_arg) == 0:
+        raise ApiError("limit must be a positive integer")
+    return min(int(limit_arg), MAX_LIMIT) if default is not None else int(limit_arg)
+
+
+def wants_ndjson():
+    """Return True if the client asked for the streamed NDJSON mode."""
+    return request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson'
+
+
+def iterate_batches(model, available_fields, fields, after_id, limit=None, batch_size=STREAM_BATCH_SIZE):
+    """
+    Read rows in id order from a server-side cursor, one batch at a time.
+
+    Only the requested columns are selected; the id is always read, to build the next cursor.
+
+    Args:
+        model: The model class of the resource
+        available_fields (dict): Public fields of the resource
+        fields (list): Requested field names (nested fields are ignored)
+        after_id (int): Only rows with a greater id are read
+        limit (int): Maximum number of rows, None for every row
+        batch_size (int): Number of rows per batch
+
+    Yields:
+        list: Batch of (id, row) tuples, row being a dict of the requested fields
+    """
+    column_names = [field for field in fields if field in available_fields]
+    statement = select(model.id, *(available_fields[field] for field in column_names))
+    statement = statement.where(model.id > after_id).order_by(model.id)
+    if limit is not None:
+        statement = statement.limit(limit)
+    result = db.session.execute(statement.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield [(row[0], dict(zip(column_names, row[1:]))) for row in partition]
+
+
+def add_answers(batch, answer_fields):
+    """Attach the answers of a batch of comments, loaded with a single query."""
+    comment_ids = [comment_id for comment_id, _ in batch]
+    column_names = [field for field in answer_fields if field != 'comment_id']
+    answers_by_comment = {comment_id: [] for comment_id in comment_ids}
+    statement = select(Answer.comment_id, *(ANSWER_FIELDS[field] for field in column_names))
+    statement = statement.where(Answer.comment_id.in_(comment_ids)).order_by(Answer.id)
+    for row in db.session.execute(statement):
+        answers_by_comment[row[0]].append(dict(zip(column_names, row[1:])))
+    for comment_id, comment in batch:
+        comment['answers'] = answers_by_comment[comment_id]
+    return batch
+
+
+def discussion_version():
+    """Return a stamp that changes whenever a comment or an answer is added or deleted."""
+    comments = db.session.execute(select(func.max(Comment.id), func.count(Comment.id))).one()
+    answers = db.session.execute(select(func.max(Answer.id), func.count(Answer.id))).one()
+    return f'{comments[0]}-{comments[1]}-{answers[0]}-{answers[1]}'
+
+
+def api_response(resource, version, model, available_fields, nested_fields=(), cache_control='no-cache'):
+    """
+    Answer an API request, as a JSON page or a streamed NDJSON export.
+
+    The JSON mode returns {"data": [...], "next_cursor": ...} pages of at most MAX_LIMIT rows.
+    The NDJSON mode streams one row per line from the cursor position to the end (or to the
+    limit), in constant memory. Both depend only on the parameters and the data version, so
+    the ETag is computed before any row is read and repeated requests get a 304.
+
+    Args:
+        resource (str): Name of the resource, part of the ETag
+        version (str): Version stamp of the underlying data
+        model: The model class of the resource
+        available_fields (dict): Public fields of the resource
+        nested_fields (tuple): Names of the fields loaded from another table
+        cache_control (str): Cache-Control header of the response
+
+    Returns:
+        Response: The JSON, NDJSON or 304 response
+    """
+    fields = parse_fields(available_fields, nested_fields)
+    ndjson = wants_ndjson()
+    limit = parse_limit(None if ndjson else DEFAULT_LIMIT)
+    after_id = cursor_int(decode_cursor(request.args.get('cursor')), 'after') or 0
+
+    state = dumps([resource, version, fields, ndjson, limit, after_id])
+    etag = hashlib.sha1(state.encode('utf-8')).hexdigest()
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    elif ndjson:
+        def generate():
+            for batch in iterate_batches(model, available_fields, fields, after_id, limit):
+                if 'answers' in fields:
+                    batch = add_answers(batch, ANSWER_FIELDS)
+                yield ''.join(f'{dumps(row)}\n' for _, row in batch)
+
+        response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    else:
+        batch = list(itertools.chain.from_iterable(
+            iterate_batches(model, available_fields, fields, after_id, limit + 1, limit + 1)
+        ))
+        has_more = len(batch) > limit
+        batch = batch[:limit]
+        if 'answers' in fields and batch:
+            batch = add_answers(batch, ANSWER_FIELDS)
+        next_cursor = encode_cursor({'after': batch[-1][0]}) if has_more else None
+        response = Response(dumps({'data': [row for _, row in batch], 'next_cursor': next_cursor}),
+                            mimetype='application/json')
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+@app.route('/api/contributions', methods=['GET'])
+def api_contributions():
+    """
+    Contributions, in number order.
+
+    Parameters: fields (comma-separated, among id, contributor, body, time, formatted_time),
+    limit, cursor (next_cursor of the previous page), format=ndjson to stream every contribution.
+    """
+    return api_response('contributions', get_corpus_version(), Contribution, CONTRIBUTION_FIELDS,
+                        cache_control=f"public, max-age={app.config['CONTRIBUTIONS_CACHE_MAX_AGE']}")
+
+
+@app.route('/api/comments', methods=['GET'])
+def api_comments():
+    """
+    Discussion comments with their answers, in creation order.
+
+    Parameters: fields (among id, username, body, created_at, answers), limit, cursor, format=ndjson.
+    """
+    return api_response('comments', discussion_version(), Comment, COMMENT_FIELDS, nested_fields=('answers',))
+
+
+@app.route('/api/answers', methods=['GET'])
+def api_answers():
+    """
+    Answers to the discussion comments, in creation order.
+
+    Parameters: fields (among id, comment_id, username, body, created_at), limit, cursor, format=ndjson.
+    """
+    return api_response('answers', discussion_version(), Answer, ANSWER_FIELDS)
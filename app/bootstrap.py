@@ -0,0 +1,48 @@
+import fcntl
+import time
+
+from app import db, db_path
+from app.database import DatabaseInitializer
+from app.downloads import download_manifest
+
+# Lock file held while a process bootstraps the database, next to it
+BOOTSTRAP_LOCK_PATH = db_path.parent / 'bootstrap.lock'
+
+# Forked processes inherit the bootstrapped state of their parent
+_bootstrapped = False
+
+
+def bootstrap(app):
+    """
+    Create the schema, run the migrations, import the corpus if needed and load the corpus structures
+    and the download manifest.
+
+    Runs at most once per process tree. Processes bootstrapping the same database at the same
+    time (gunicorn without preload, a CLI command during a deployment) take turns on a file lock,
+    so that the first import cannot run twice; the next ones find the database ready and only
+    load the in-memory structures.
+
+    Args:
+        app (Flask): The application
+
+    Returns:
+        float: Duration of the bootstrap in seconds (0 if the process was already bootstrapped)
+    """
+    global _bootstrapped
+    if _bootstrapped:
+        return 0.0
+    start = time.perf_counter()
+    BOOTSTRAP_LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(BOOTSTRAP_LOCK_PATH, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            with app.app_context():
+                db.create_all()
+            DatabaseInitializer(app).initialize_database()
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    download_manifest.refresh()
+    _bootstrapped = True
+    duration = time.perf_counter() - start
+    print(f"Bootstrap done in {duration:.3f} s.")
+    return duration
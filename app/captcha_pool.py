@@ -0,0 +1,192 @@
+import collections
+import os
+import sqlite3
+import threading
+import time
+
+
+class CaptchaPool:
+    """
+    Bounded stock of pre-rendered captchas, refilled by a background thread of each worker.
+
+    Rendering a captcha (font rasterization and PNG encoding) takes tens of milliseconds,
+    so requests only take a ready (token, PNG bytes) pair from the stock in O(1). The thread
+    refills the stock up to size once it falls below low_water, and discards captchas older
+    than max_age, whose token would expire too soon after being served. When the stock is
+    empty, the request renders its captcha itself and the miss is counted.
+    """
+
+    def __init__(self, factory, size=32, low_water=8, max_age=5 * 60, check_interval=30.0):
+        """
+        Initialize an empty pool.
+
+        Args:
+            factory (callable): Function rendering a captcha, returning (captcha_token, png_bytes)
+            size (int): Maximum number of captchas in stock
+            low_water (int): Stock level under which the thread refills the pool
+            max_age (float): Age after which a captcha is discarded, in seconds
+            check_interval (float): Maximum delay between two checks of the stock, in seconds
+        """
+        self.factory = factory
+        self.size = size
+        self.low_water = low_water
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self._stock = collections.deque()  # (created_at, captcha_token, png_bytes), oldest first
+        self._lock = threading.Lock()
+        self._refill_needed = threading.Condition(self._lock)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._counters = {'hits': 0, 'misses': 0, 'generated': 0, 'expired': 0}
+
+    def start(self):
+        """Start the refill thread of the current process (threads do not survive a fork)."""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Captchas rendered by the parent process would be served twice
+                self._stock.clear()
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='captcha-pool', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def stop(self):
+        """Stop the refill thread."""
+        self._stop_event.set()
+        with self._lock:
+            self._refill_needed.notify()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=5)
+
+    def _discard_expired(self, now):
+        """Drop the captchas too old to be served (the lock must be held)."""
+        while self._stock and self._stock[0][0] + self.max_age < now:
+            self._stock.popleft()
+            self._counters['expired'] += 1
+
+    def take(self):
+        """
+        Take a captcha from the stock, or render one if the stock is empty.
+
+        Returns:
+            tuple: (captcha_token, png_bytes)
+        """
+        self.start()
+        with self._lock:
+            self._discard_expired(time.monotonic())
+            entry = self._stock.popleft() if self._stock else None
+            self._counters['hits' if entry is not None else 'misses'] += 1
+            if len(self._stock) < self.low_water:
+                self._refill_needed.notify()
+        if entry is not None:
+            return entry[1], entry[2]
+        captcha = self.factory()
+        with self._lock:
+            self._counters['generated'] += 1
+        return captcha
+
+    def refill(self):
+        """Render captchas until the stock is full, from the calling thread."""
+        while not self._stop_event.is_set():
+            with self._lock:
+                self._discard_expired(time.monotonic())
+                if len(self._stock) >= self.size:
+                    return
+            # Render outside the lock, so that requests can still take captchas
+            captcha_token, png_bytes = self.factory()
+            with self._lock:
+                self._stock.append((time.monotonic(), captcha_token, png_bytes))
+                self._counters['generated'] += 1
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refill()
+            except Exception as e:
+                print(f"Error rendering captchas: {str(e)}")
+            with self._lock:
+                self._discard_expired(time.monotonic())
+                if len(self._stock) >= self.low_water and not self._stop_event.is_set():
+                    # Also wake up regularly to replace the captchas that expire
+                    self._refill_needed.wait(timeout=self.check_interval)
+
+    def stats(self):
+        """
+        Return the counters of the current process.
+
+        Returns:
+            dict: Stock depth, captchas served from the stock (hits) or rendered on the request
+                thread (misses), captchas rendered and discarded because of their age
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            counters['depth'] = len(self._stock)
+        return counters
+
+
+class CaptchaReplaySet:
+    """
+    Set of the captcha tokens already submitted, shared by every gunicorn worker through a SQLite side file.
+
+    A token is claimed the first time it is validated, whatever the answer, so that each captcha
+    can only be tried once. Entries are kept until their token expires.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the replay set.
+
+        Args:
+            path (Path): Path of the SQLite side file
+        """
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        """Return the connection of the current thread, reopened after a fork."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS used_captchas (
+                    nonce TEXT PRIMARY KEY,
+                    expires_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS used_captchas_expires_at ON used_captchas (expires_at);
+            """)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def claim(self, nonce, expires_at):
+        """
+        Record the use of a token.
+
+        Args:
+            nonce (str): Nonce of the token
+            expires_at (float): Expiry time of the token, as a Unix timestamp
+
+        Returns:
+            bool: True on the first use of the token, False on a replay (or if the set cannot be read)
+        """
+        try:
+            connection = self._connection()
+            with connection:
+                connection.execute('DELETE FROM used_captchas WHERE expires_at < ?', (time.time(),))
+                cursor = connection.execute(
+                    'INSERT OR IGNORE INTO used_captchas (nonce, expires_at) VALUES (?, ?)', (nonce, expires_at)
+                )
+        except sqlite3.Error as e:
+            print(f"Error updating used captchas: {str(e)}")
+            return False
+        return cursor.rowcount == 1
+
+    def __len__(self):
+        return self._connection().execute('SELECT count(*) FROM used_captchas').fetchone()[0]
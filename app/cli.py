@@ -0,0 +1,65 @@
+import json
+
+import click
+
+from app import app, create_app, db
+from app.database import DatabaseInitializer
+from app.import_time import import_time_report, profile_imports
+from app.result_cache import fragment_cache, search_result_cache
+
+
+@app.cli.command('migrate-db')
+def migrate_db():
+    """Add and backfill the materialized search columns, add the discussion indexes, then rebuild the full-text index."""
+    with app.app_context():
+        db.create_all()
+    db_initializer = DatabaseInitializer(app)
+    db_initializer.migrate_contributions_table()
+    db_initializer.migrate_discussion_tables()
+    db_initializer.create_search_index()
+
+
+@app.cli.command('import-contributions')
+@click.argument('contributions_path', required=False, type=click.Path(exists=True, dir_okay=False))
+@click.option('--prune', is_flag=True, help='Also delete the contributions missing from the file.')
+def import_contributions(contributions_path, prune):
+    """Upsert a contributions.json or contributions.jsonl file into the live database, writing only the changes."""
+    stats = DatabaseInitializer(create_app()).update_contributions_table(contributions_path, prune=prune)
+    click.echo(json.dumps(stats, indent=4))
+
+
+@app.cli.command('apply-contributions-delta')
+@click.argument('delta_path', type=click.Path(exists=True, dir_okay=False))
+def apply_contributions_delta(delta_path):
+    """Upsert the added and updated contributions of a delta written by scripts/extract.py, and delete the removed ones."""
+    DatabaseInitializer(create_app()).apply_contributions_delta(delta_path)
+
+
+@app.cli.command('build-near-duplicates')
+@click.option('--rebuild', is_flag=True, help='Recompute every signature instead of only new or modified ones.')
+def build_near_duplicates(rebuild):
+    """Update the MinHash/LSH near-duplicate index stored next to the database."""
+    DatabaseInitializer(create_app()).update_near_duplicate_index(rebuild=rebuild)
+
+
+@app.cli.command('search-cache-stats')
+@click.option('--clear', is_flag=True, help='Empty the caches after printing their statistics.')
+def search_cache_stats(clear):
+    """Print the hit rate and memory use of the shared search result and fragment caches."""
+    caches = [search_result_cache, fragment_cache]
+    click.echo(json.dumps({cache.name: cache.stats() for cache in caches}, indent=4))
+    if clear:
+        for cache in caches:
+            cache.clear()
+        click.echo("Search caches cleared.")
+
+
+@app.cli.command('import-time')
+@click.option('--module', default='app', show_default=True, help='Module whose import is profiled.')
+@click.option('--top', default=20, show_default=True, help='Number of packages listed.')
+def import_time(module, top):
+    """Import a module in a fresh interpreter with -X importtime and print its slowest packages."""
+    report = import_time_report(profile_imports(module), module, top)
+    click.echo(f"import {module}: {report['total_ms']} ms")
+    for package in report['slowest']:
+        click.echo(f"{package['ms']:>10.1f} ms  {package['package']} ({package['modules']} modules)")
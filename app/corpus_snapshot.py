@@ -0,0 +1,252 @@
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+import numpy as np
+from sqlalchemy import LargeBinary, cast, func, select
+
+from app import db, db_path
+from app.models import Contribution
+
+# Default location of the snapshot, next to the application database
+CORPUS_SNAPSHOT_PATH = db_path.parent / "corpus-snapshot.bin"
+
+SNAPSHOT_MAGIC = b'VRBSNAP1'
+
+# Magic, number of contributions, widths of the time and author fields, offsets of the metadata
+# table, of the body offsets and of the body blob, and corpus version
+HEADER = struct.Struct('<8sIIIQQQ64s')
+
+# Sections start on 8-byte boundaries
+ALIGNMENT = 8
+
+# Contribution as displayed by the feed, read from the snapshot instead of the ORM
+SnapshotContribution = namedtuple('SnapshotContribution', ['id', 'anonymized_contributor', 'formatted_time', 'body'])
+
+
+def _aligned(position):
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+def _byte_length(column):
+    """Return the SQL expression of the length of the longest value of a text column, in UTF-8 bytes."""
+    return func.max(func.length(cast(column, LargeBinary)))
+
+
+def metadata_dtype(time_width, author_width):
+    """Return the dtype of a row of the fixed-width metadata table (unaligned, so rows are packed)."""
+    return np.dtype([('id', '<u4'), ('formatted_time', f'S{max(time_width, 1)}'),
+                     ('anonymized_contributor', f'S{max(author_width, 1)}')])
+
+
+def write_corpus_snapshot(version, path=CORPUS_SNAPSHOT_PATH, batch_size=1000):
+    """
+    Write the snapshot of the contributions table, atomically.
+
+    The file holds a header, a metadata table with the id, formatted time and anonymised author
+    of every contribution in id order (fixed-width UTF-8 fields, as wide as the longest value),
+    the offsets of each body in the blob, and the blob of the UTF-8 bodies. Bodies are streamed
+    from the database to the file; only the metadata table and offsets are held in memory.
+    Must be called within an application context.
+
+    Args:
+        version (str): The current corpus version, recorded in the header
+        path (Path): Path of the snapshot
+        batch_size (int): Number of rows fetched at once
+
+    Returns:
+        int: Number of contributions written
+    """
+    table = Contribution.__table__
+    temporary_path = path.with_suffix('.tmp')
+    with db.engine.connect() as connection, connection.begin():
+        # Both reads run in one transaction, so the sizes match the rows
+        count, time_width, author_width = connection.execute(
+            select(func.count(), _byte_length(table.c.formatted_time), _byte_length(table.c.anonymized_contributor))
+        ).one()
+        dtype = metadata_dtype(time_width or 0, author_width or 0)
+        metadata = np.zeros(count, dtype=dtype)
+        offsets = np.zeros(count + 1, dtype='<u8')
+        metadata_offset = _aligned(HEADER.size)
+        offsets_offset = _aligned(metadata_offset + metadata.nbytes)
+        blob_offset = _aligned(offsets_offset + offsets.nbytes)
+
+        statement = (select(table.c.id, table.c.formatted_time, table.c.anonymized_contributor, table.c.body)
+                     .order_by(table.c.id).execution_options(yield_per=batch_size))
+        with open(temporary_path, 'wb') as file:
+            file.seek(blob_offset)
+            position = 0
+            for index, (contribution_id, formatted_time, anonymized_contributor, body) in enumerate(
+                    connection.execute(statement)):
+                metadata[index] = (contribution_id, formatted_time.encode('utf-8'),
+                                   anonymized_contributor.encode('utf-8'))
+                data = body.encode('utf-8')
+                file.write(data)
+                position += len(data)
+                offsets[index + 1] = position
+            file.seek(0)
+            file.write(HEADER.pack(SNAPSHOT_MAGIC, count, dtype['formatted_time'].itemsize,
+                                   dtype['anonymized_contributor'].itemsize, metadata_offset, offsets_offset,
+                                   blob_offset, version.encode('utf-8')))
+            file.seek(metadata_offset)
+            file.write(metadata.tobytes())
+            file.seek(offsets_offset)
+            file.write(offsets.tobytes())
+    # Running workers keep reading their mapping of the previous file
+    os.replace(temporary_path, path)
+    return count
+
+
+class SnapshotView:
+    """Read-only view of one snapshot file, mapped in memory."""
+
+    def __init__(self, buffer):
+        """
+        Map the sections of a snapshot.
+
+        Args:
+            buffer (mmap): The mapped snapshot file
+
+        Raises:
+            ValueError: If the buffer is not a snapshot
+        """
+        magic, count, time_width, author_width, metadata_offset, offsets_offset, blob_offset, version = \
+            HEADER.unpack_from(buffer)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("Not a corpus snapshot")
+        self.buffer = buffer
+        self.version = version.rstrip(b'\0').decode('utf-8')
+        self.metadata = np.frombuffer(buffer, dtype=metadata_dtype(time_width, author_width), count=count,
+                                      offset=metadata_offset)
+        self.ids = self.metadata['id']
+        self.offsets = np.frombuffer(buffer, dtype='<u8', count=count + 1, offset=offsets_offset)
+        self.blob_offset = blob_offset
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows(self, positions):
+        """
+        Return the contributions at positions of the metadata table.
+
+        Args:
+            positions (ndarray): Positions in the metadata table
+
+        Returns:
+            list: SnapshotContribution objects
+        """
+        # One vectorized read of each section, instead of one numpy scalar per field
+        metadata = self.metadata[positions].tolist()
+        starts = (self.offsets[positions] + self.blob_offset).tolist()
+        ends = (self.offsets[positions + 1] + self.blob_offset).tolist()
+        buffer = self.buffer
+        return [SnapshotContribution(contribution_id, anonymized_contributor.decode('utf-8'),
+                                     formatted_time.decode('utf-8'), buffer[start:end].decode('utf-8'))
+                for (contribution_id, formatted_time, anonymized_contributor), start, end
+                in zip(metadata, starts, ends)]
+
+    def get(self, ids):
+        """
+        Return contributions by id, keeping the order of the given ids.
+
+        Args:
+            ids (list): Ordered list of contribution ids
+
+        Returns:
+            list: SnapshotContribution of each id present in the snapshot
+        """
+        if not len(self.ids):
+            return []
+        ids = np.asarray(ids, dtype=np.int64)
+        # Ids missing from the snapshot are dropped, like ids missing from the table
+        positions = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+        return self.rows(positions[self.ids[positions] == ids])
+
+    def page(self, after_id, limit):
+        """
+        Return the contributions following an id, in id order.
+
+        Args:
+            after_id (int): Id of the last contribution shown, None for the first page
+            limit (int): Maximum number of contributions
+
+        Returns:
+            list: SnapshotContribution objects
+        """
+        start = int(np.searchsorted(self.ids, after_id, side='right')) if after_id is not None else 0
+        return self.rows(np.arange(start, min(start + limit, len(self.ids))))
+
+
+class CorpusSnapshot:
+    """
+    Compact binary snapshot of the contributions, memory-mapped read-only.
+
+    The snapshot is written by the import, next to the database, and mapped by every process:
+    its pages live once in the OS page cache, and pages of the feed are read from it without
+    any query or ORM object. A snapshot is only used for the corpus version it was written
+    for; when the corpus changes, the file is reopened if another process replaced it, and
+    callers fall back to the database until then.
+    """
+
+    def __init__(self, path=CORPUS_SNAPSHOT_PATH):
+        """
+        Initialize a closed snapshot.
+
+        Args:
+            path (Path): Path of the snapshot file
+        """
+        self.path = path
+        # Replaced as a whole, so that concurrent readers always see a consistent view
+        self._view = None
+        self._file_id = None
+
+    @property
+    def version(self):
+        view = self._view
+        return view.version if view is not None else None
+
+    def open(self):
+        """
+        Map the snapshot file, unless the mapped one is still the one on disk.
+
+        Returns:
+            bool: True if a snapshot is mapped
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._view, self._file_id = None, None
+            return False
+        file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if file_id == self._file_id:
+            return self._view is not None
+        try:
+            with open(self.path, 'rb') as file:
+                view = SnapshotView(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+        except (ValueError, struct.error) as e:
+            print(f"Error opening the corpus snapshot: {e}")
+            view = None
+        # The previous mapping is unmapped once no request uses it any more
+        self._view, self._file_id = view, file_id
+        return view is not None
+
+    def view(self, version):
+        """
+        Return the snapshot of a corpus version.
+
+        Args:
+            version (str): The current corpus version
+
+        Returns:
+            SnapshotView: The mapped snapshot, None if there is no snapshot of this version
+        """
+        view = self._view
+        if view is None or view.version != version:
+            self.open()
+            view = self._view
+        return view if view is not None and view.version == version else None
+
+
+# Snapshot shared by every request of the process (and mapped before the fork when the app is preloaded)
+corpus_snapshot = CorpusSnapshot()
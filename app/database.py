@@ -1,9 +1,53 @@
 import json
 import os
+import time
 from datetime import datetime
 from pathlib import Path
+from sqlalchemy import func, or_, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from app import db
-from app.models import Contribution
+from app.corpus_snapshot import corpus_snapshot, write_corpus_snapshot
+from app.exports import build_exports
+from app.json_stream import iter_json_array, iter_json_lines
+from app.models import Contribution, CorpusVersion
+from app.search import create_fts_index, drop_outdated_fts_index
+from app.search_index import contribution_index
+from app.near_duplicates import near_duplicate_index
+
+# Connection settings of the bulk import: a 256 MiB page cache keeps the whole transaction in memory
+# (a spill to the database file would lock readers out before the commit) and temporary B-trees in RAM
+IMPORT_PRAGMAS = {'cache_size': -256 * 1024, 'temp_store': 2}
+
+
+def get_corpus_version():
+    """
+    Return the version stamp of the contributions corpus.
+
+    The stamp changes every time the contributions table is (re-)imported. Must be called
+    within an application context.
+
+    Returns:
+        str: The current corpus version ('0' if the corpus was never imported)
+    """
+    corpus_version = CorpusVersion.query.order_by(CorpusVersion.id.desc()).first()
+    if corpus_version is None:
+        return '0'
+    # The import time keeps stamps distinct when the whole database file is replaced
+    return f'{corpus_version.id}-{corpus_version.imported_at:%Y%m%dT%H%M%S%f}'
+
+
+def read_search_documents():
+    """
+    Read the corpus version and the documents of the in-memory search index.
+
+    Must be called within an application context.
+
+    Returns:
+        tuple: (corpus version, list of (contribution_id, search_text) tuples)
+    """
+    version = get_corpus_version()
+    documents = db.session.query(Contribution.id, Contribution.search_text).order_by(Contribution.id).all()
+    return version, documents
 
 
 class DatabaseInitializer:
@@ -12,13 +56,32 @@ class DatabaseInitializer:
     def __init__(self, app):
         """Initialize with Flask app instance."""
         self.app = app
-        self.contributions_json_path = Path(__file__).resolve().parent.parent / "resources" /"verbatims" / "contributions.json"
+        self.contributions_json_path = Path(os.environ.get(
+            "VERBATIMS_CONTRIBUTIONS_PATH",
+            Path(__file__).resolve().parent.parent / "resources" / "verbatims" / "contributions.json"
+        ))
     
     def is_contributions_table_empty(self):
         """Check if the contributions table is empty."""
         with self.app.app_context():
             return Contribution.query.count() == 0
     
+    def iter_contributions_data(self):
+        """
+        Read the contributions file one item at a time.
+
+        contributions.jsonl files are read line by line, contributions.json arrays with an
+        incremental parser, so that the whole corpus never has to fit in memory.
+
+        Yields:
+            dict: Items with the 'number', 'user', 'body' and 'time' keys
+        """
+        with open(self.contributions_json_path, 'r', encoding='utf-8') as file:
+            if self.contributions_json_path.suffix == '.jsonl':
+                yield from iter_json_lines(file)
+            else:
+                yield from iter_json_array(file)
+
     def load_contributions_data(self):
         """Load data from contributions.json file."""
         if not os.path.exists(self.contributions_json_path):
@@ -26,49 +89,323 @@ class DatabaseInitializer:
             return []
         
         try:
-            with open(self.contributions_json_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-                return data
+            return list(self.iter_contributions_data())
         except Exception as e:
             print(f"Error loading contributions data: {e}")
             return []
     
+    @staticmethod
+    def contribution_row(item):
+        """
+        Build the row of a contribution from an item of contributions.json, materialized columns included.
+
+        Args:
+            item (dict): Item with the 'number', 'user', 'body' and 'time' keys
+
+        Returns:
+            dict: Values of every column of the contributions table
+        """
+        if not item.get('user'):
+            raise ValueError("User is required for each contribution.")
+        contribution_id = int(item.get('number'))
+        # Parse the time string to a datetime object
+        time = datetime.strptime(item.get('time'), '%Y-%m-%d %H:%M:%S')
+        row = {'id': contribution_id, 'contributor': item.get('user'), 'body': item.get('body'), 'time': time}
+        row.update(Contribution.search_columns(contribution_id, row['contributor'], row['body'], time))
+        return row
+
+    def import_contributions(self, items, batch_size=1000, prune=False):
+        """
+        Upsert contributions by number with batched executemany statements, in one transaction.
+
+        Each batch is one INSERT ... ON CONFLICT (id) DO UPDATE statement whose update only
+        applies to rows that differ, so re-importing the same file writes nothing. The import runs
+        on its own connection with a page cache large enough to keep the transaction in memory:
+        readers of the live database are only blocked while the transaction commits.
+
+        Args:
+            items (iterable): Items of contributions.json, read one batch at a time
+            batch_size (int): Number of rows per statement
+            prune (bool): Also delete the contributions missing from items
+
+        Returns:
+            dict: Number of rows 'inserted', 'updated', 'unchanged' and 'deleted', the duration
+                in 'seconds' and the throughput in 'rows_per_second'
+        """
+        table = Contribution.__table__
+        statement = sqlite_insert(table)
+        updated_columns = [column.name for column in table.columns if column.name != 'id']
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={name: statement.excluded[name] for name in updated_columns},
+            where=or_(*(table.c[name].is_distinct_from(statement.excluded[name]) for name in updated_columns)),
+        )
+        stats = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+        seen_ids = []
+        start = time.perf_counter()
+
+        def write_batch(connection, rows):
+            existing = connection.execute(select(func.count()).select_from(table)
+                                          .where(table.c.id.in_([row['id'] for row in rows]))).scalar()
+            # Inserted and actually updated rows are counted by rowcount, unchanged ones are not
+            changed = connection.execute(statement, rows).rowcount
+            stats['inserted'] += len(rows) - existing
+            stats['updated'] += changed - (len(rows) - existing)
+            stats['unchanged'] += existing - (changed - (len(rows) - existing))
+
+        with self.app.app_context(), db.engine.connect() as connection:
+            previous_pragmas = {name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+                                for name in IMPORT_PRAGMAS}
+            for name, value in IMPORT_PRAGMAS.items():
+                connection.exec_driver_sql(f'PRAGMA {name}={value}')
+            connection.commit()
+            try:
+                with connection.begin():
+                    rows = []
+                    for item in items:
+                        rows.append(self.contribution_row(item))
+                        seen_ids.append(rows[-1]['id'])
+                        if len(rows) == batch_size:
+                            write_batch(connection, rows)
+                            rows = []
+                    if rows:
+                        write_batch(connection, rows)
+                    if prune:
+                        stats['deleted'] = connection.execute(
+                            table.delete().where(table.c.id.not_in(select(text('value')).select_from(
+                                func.json_each(json.dumps(seen_ids))
+                            )))
+                        ).rowcount
+            finally:
+                # The connection goes back to the pool
+                for name, value in previous_pragmas.items():
+                    connection.exec_driver_sql(f'PRAGMA {name}={value}')
+                connection.commit()
+
+        stats['seconds'] = round(time.perf_counter() - start, 3)
+        stats['rows_per_second'] = round(len(seen_ids) / stats['seconds']) if stats['seconds'] else None
+        return stats
+
     def populate_contributions_table(self):
-        """Populate the contributions table with data from contributions.json."""
+        """Populate the contributions table with data from contributions.json, streamed into the bulk import."""
         if not self.is_contributions_table_empty():
             print("Contributions table already populated, skipping initialization.")
             return
         
-        contributions_data = self.load_contributions_data()
-        if not contributions_data:
+        if not os.path.exists(self.contributions_json_path):
+            print(f"Warning: Contributions data file not found at {self.contributions_json_path}")
+            return
+
+        print(f"Importing contributions from {self.contributions_json_path}...")
+
+        try:
+            stats = self.import_contributions(self.iter_contributions_data())
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error loading contributions data: {e}")
+            return
+        if not stats['inserted']:
             print("No contributions data to import.")
             return
-        
-        print(f"Importing {len(contributions_data)} contributions...")
-        
-        with self.app.app_context():
-            for item in contributions_data:
-                # Parse the time string to a datetime object
-                time_str = item.get('time')
-                time = datetime.strptime(time_str, '%Y-%m-%d %H:%M:%S')
-                
-                # Create and add the contribution to the database
-                if not item.get('user'):
-                    raise ValueError("User is required for each contribution.")
-                contribution = Contribution(
-                    id=int(item.get('number')),
-                    contributor=item.get('user'),
-                    body=item.get('body'),
-                    time=time
+        print(f"Contributions table populated successfully with {stats['inserted']} contributions "
+              f"({stats['rows_per_second']} rows/s).")
+
+        self.record_corpus_version()
+
+    def update_contributions_table(self, contributions_path=None, prune=False):
+        """
+        Re-import a contributions file into the live database, applying only the changes.
+
+        Args:
+            contributions_path (Path): contributions.json or contributions.jsonl file, by default the configured one
+            prune (bool): Also delete the contributions missing from the file
+
+        Returns:
+            dict: Output of import_contributions
+        """
+        if contributions_path is not None:
+            self.contributions_json_path = Path(contributions_path)
+        stats = self.import_contributions(self.iter_contributions_data(), prune=prune)
+        self.record_changes(stats)
+        return stats
+
+    def apply_contributions_delta(self, delta_path):
+        """
+        Apply a delta written by scripts/extract.py to the contributions table, without a full reimport.
+
+        Added and updated contributions are upserted by number, removed ones deleted, then a new
+        corpus version is stamped so that running workers drop their derived caches.
+
+        Args:
+            delta_path (Path): Path of the delta-<timestamp>.json file
+
+        Returns:
+            dict: Output of import_contributions
+        """
+        with open(delta_path, 'r', encoding='utf-8') as file:
+            delta = json.load(file)
+        stats = self.import_contributions(delta.get('added', []) + delta.get('updated', []))
+        removed = [int(number) for number in delta.get('removed', [])]
+        if removed:
+            with self.app.app_context():
+                stats['deleted'] = Contribution.query.filter(Contribution.id.in_(removed)).delete(
+                    synchronize_session=False
                 )
-                db.session.add(contribution)
-            
-            # Commit all changes to the database
+                db.session.commit()
+        self.record_changes(stats)
+        return stats
+
+    def record_changes(self, stats):
+        """Print the statistics of an import and, if it changed anything, stamp a new corpus version."""
+        print(f"Contributions imported: {stats['inserted']} inserted, {stats['updated']} updated, "
+              f"{stats['unchanged']} unchanged, {stats['deleted']} deleted "
+              f"in {stats['seconds']} s ({stats['rows_per_second']} rows/s).")
+        if stats['inserted'] or stats['updated'] or stats['deleted']:
+            self.record_corpus_version()
+            # Workers forked before the import rebuild their own copy (see ContributionIndex.view)
+            self.load_search_index()
+            self.update_near_duplicate_index()
+            self.update_corpus_snapshot()
+            self.update_exports()
+
+    def record_corpus_version(self):
+        """Stamp a new corpus version, invalidating the caches derived from the contributions table."""
+        with self.app.app_context():
+            corpus_version = CorpusVersion(contribution_count=Contribution.query.count())
+            db.session.add(corpus_version)
             db.session.commit()
-            print("Contributions table populated successfully.")
+            print(f"Corpus version {corpus_version.id} recorded.")
     
+    def migrate_contributions_table(self, batch_size=1000):
+        """
+        Add the materialized search columns to databases created before they existed, and backfill them.
+
+        Safe to run at every start-up: columns and indexes are only created when missing,
+        and only rows with an empty search_text are backfilled.
+
+        Args:
+            batch_size (int): Number of rows updated per statement
+
+        Returns:
+            int: Number of backfilled contributions
+        """
+        materialized_columns = {
+            'formatted_time': "VARCHAR(32) NOT NULL DEFAULT ''",
+            'anonymized_contributor': "VARCHAR(80) NOT NULL DEFAULT ''",
+            'search_text': "TEXT NOT NULL DEFAULT ''",
+        }
+        with self.app.app_context():
+            existing_columns = {row[1] for row in db.session.execute(text('PRAGMA table_info(contributions)'))}
+            missing_columns = [name for name in materialized_columns if name not in existing_columns]
+            if missing_columns:
+                # The previous FTS5 layout must go before the backfill fires its update trigger
+                drop_outdated_fts_index(db.session)
+            for name in missing_columns:
+                print(f"Adding column contributions.{name}...")
+                db.session.execute(text(f'ALTER TABLE contributions ADD COLUMN {name} {materialized_columns[name]}'))
+            for name in ('formatted_time', 'anonymized_contributor'):
+                db.session.execute(text(
+                    f'CREATE INDEX IF NOT EXISTS ix_contributions_{name} ON contributions ({name})'
+                ))
+
+            table = Contribution.__table__
+            rows = db.session.execute(
+                db.select(table.c.id, table.c.contributor, table.c.body, table.c.time).where(table.c.search_text == '')
+            ).all()
+            for start in range(0, len(rows), batch_size):
+                db.session.execute(
+                    table.update().where(table.c.id == db.bindparam('contribution_id')),
+                    [dict(Contribution.search_columns(row.id, row.contributor, row.body, row.time),
+                          contribution_id=row.id)
+                     for row in rows[start:start + batch_size]]
+                )
+            db.session.commit()
+        if rows:
+            print(f"Backfilled search columns of {len(rows)} contributions.")
+        return len(rows)
+
+    def migrate_discussion_tables(self):
+        """Add the indexes used to page through comments and load their answers to databases created before them."""
+        with self.app.app_context():
+            db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_comments_created_at ON comments (created_at)'))
+            db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_answers_comment_id ON answers (comment_id)'))
+            db.session.commit()
+
+    def create_search_index(self):
+        """Create the FTS5 full-text index over contributions and keep it in sync with triggers."""
+        with self.app.app_context():
+            fts_enabled = create_fts_index(db.session)
+            db.session.commit()
+        self.app.config['SEARCH_FTS_ENABLED'] = fts_enabled
+        if not fts_enabled:
+            print("Warning: SQLite was built without FTS5, search will fall back to table scans.")
+
+    def load_search_index(self):
+        """Build the in-memory inverted index from the contributions table."""
+        with self.app.app_context():
+            version, documents = read_search_documents()
+        contribution_index.build(documents, version=version)
+        print(f"Search index built for {len(contribution_index)} contributions.")
+
+    def update_near_duplicate_index(self, rebuild=False):
+        """
+        Load the near-duplicate index stored next to the database, and update it if the corpus changed.
+
+        Only new or modified contributions get their MinHash signature computed.
+
+        Args:
+            rebuild (bool): Recompute every signature instead of reusing the stored ones
+
+        Returns:
+            int: Number of signatures computed
+        """
+        if rebuild or not near_duplicate_index.load():
+            near_duplicate_index.reset()
+        with self.app.app_context():
+            version = get_corpus_version()
+            if near_duplicate_index.version == version:
+                return 0
+            documents = db.session.query(Contribution.id, Contribution.body).order_by(Contribution.id).yield_per(1000)
+            computed = near_duplicate_index.update(documents, version)
+        near_duplicate_index.save()
+        print(f"Near-duplicate index updated: {computed} signatures computed.")
+        return computed
+
+    def update_corpus_snapshot(self):
+        """
+        Write the memory-mapped snapshot of the contributions, unless it is already the one of the current
+        corpus version, then map it.
+
+        Returns:
+            bool: True if the snapshot was written
+        """
+        with self.app.app_context():
+            version = get_corpus_version()
+            if corpus_snapshot.view(version) is not None:
+                return False
+            count = write_corpus_snapshot(version)
+        corpus_snapshot.open()
+        print(f"Corpus snapshot written for {count} contributions.")
+        return True
+
+    def update_exports(self):
+        """Build the anonymised exports of the current corpus version, unless they already exist."""
+        with self.app.app_context():
+            build_exports(get_corpus_version())
+
     def initialize_database(self):
         """Initialize the database by populating empty tables."""
         print("Checking database tables...")
+        self.migrate_contributions_table()
+        self.migrate_discussion_tables()
+        self.create_search_index()
         self.populate_contributions_table()
+        with self.app.app_context():
+            # Databases imported before corpus versions existed get their first stamp
+            corpus_versioned = CorpusVersion.query.count() > 0
+        if not corpus_versioned:
+            self.record_corpus_version()
+        self.load_search_index()
+        self.update_near_duplicate_index()
+        self.update_corpus_snapshot()
+        self.update_exports()
         print("Database initialization complete.")
\ No newline at end of file
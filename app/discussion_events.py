@@ -0,0 +1,162 @@
+import json
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytz
+from sqlalchemy import delete, func, select
+
+from app import db
+from app.models import DiscussionEvent
+
+# Events are kept long enough for any reader to reconnect and catch up
+EVENT_RETENTION = timedelta(days=1)
+
+# Delay after which browsers reconnect once a stream is closed, in milliseconds
+RECONNECT_DELAY_MS = 3000
+
+# Delay after which a client refused for lack of a free stream slot tries again, in milliseconds
+BUSY_RETRY_DELAY_MS = 15000
+
+
+class StreamSlots:
+    """
+    Count of the event streams open in the worker process.
+
+    Each open stream holds a worker thread for its whole lifetime, so streams are capped to
+    keep threads free for ordinary requests.
+    """
+
+    def __init__(self):
+        self._open = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, limit):
+        """
+        Take a stream slot, without waiting.
+
+        Args:
+            limit (int): Maximum number of streams open at once in the process
+
+        Returns:
+            bool: True if a slot was taken, False if every slot is taken
+        """
+        with self._lock:
+            if self._open >= limit:
+                return False
+            self._open += 1
+            return True
+
+    def release(self):
+        """Give back a slot taken with acquire."""
+        with self._lock:
+            self._open = max(self._open - 1, 0)
+
+    @property
+    def open(self):
+        return self._open
+
+
+def max_streams(threads, share):
+    """
+    Return the number of event streams a worker may hold open at once.
+
+    Args:
+        threads (int): Number of threads of the worker
+        share (float): Share of the threads streams may hold, below 1
+
+    Returns:
+        int: The rounded down share of the threads, at least 1
+    """
+    return max(1, math.floor(threads * share))
+
+
+def publish_event(kind, comment_id, item_id, html):
+    """
+    Add an event to the discussion change sequence.
+
+    The event is added to the current session, so that it is committed in the same transaction
+    as the comment or answer it announces, and old events are pruned.
+
+    Args:
+        kind (str): 'comment' or 'answer'
+        comment_id (int): Id of the new comment, or of the comment answered
+        item_id (int): Id of the new comment or answer
+        html (str): Pre-rendered fragment of the new comment or answer
+    """
+    db.session.add(DiscussionEvent(kind=kind, comment_id=comment_id, item_id=item_id, html=html))
+    cutoff = datetime.now(tz=pytz.timezone('Europe/Paris')) - EVENT_RETENTION
+    db.session.execute(delete(DiscussionEvent).where(DiscussionEvent.created_at < cutoff))
+
+
+def latest_event_id():
+    """Return the id of the last event (0 if there is none)."""
+    return db.session.execute(select(func.max(DiscussionEvent.id))).scalar() or 0
+
+
+def read_events(after_id, limit=100):
+    """
+    Read the events following an event id.
+
+    A connection is checked out for each read, so that no transaction (and no stale snapshot)
+    is held between two reads of a long-lived stream.
+
+    Args:
+        after_id (int): Id of the last event already sent
+        limit (int): Maximum number of events
+
+    Returns:
+        list: Rows with the id, kind, comment_id, item_id and html of each event, in sequence order
+    """
+    statement = (select(DiscussionEvent.id, DiscussionEvent.kind, DiscussionEvent.comment_id,
+                        DiscussionEvent.item_id, DiscussionEvent.html)
+                 .where(DiscussionEvent.id > after_id).order_by(DiscussionEvent.id).limit(limit))
+    with db.engine.connect() as connection:
+        return connection.execute(statement).all()
+
+
+def format_event(event):
+    """Format an event as a Server-Sent Events message."""
+    data = json.dumps({'comment_id': event.comment_id, 'item_id': event.item_id, 'html': event.html},
+                      ensure_ascii=False)
+    return f'id: {event.id}\nevent: {event.kind}\ndata: {data}\n\n'
+
+
+def stream_events(after_id, max_duration, poll_interval, heartbeat_interval=15.0):
+    """
+    Generate the Server-Sent Events stream of the discussion.
+
+    The change sequence is shared by every gunicorn worker through the database, so each
+    stream polls it for events it has not sent yet. Streams end after max_duration seconds,
+    so that they do not hold a worker thread forever; browsers then reconnect with the
+    Last-Event-ID header and resume where they stopped.
+
+    Args:
+        after_id (int): Id of the last event the client has seen
+        max_duration (float): Lifetime of the stream, in seconds
+        poll_interval (float): Delay between two reads of the change sequence, in seconds
+        heartbeat_interval (float): Delay after which an idle stream sends a comment line, in seconds
+
+    Yields:
+        str: SSE messages
+    """
+    yield f'retry: {RECONNECT_DELAY_MS}\n\n'
+    deadline = time.monotonic() + max_duration
+    next_heartbeat = time.monotonic() + heartbeat_interval
+    while True:
+        events = read_events(after_id)
+        if events:
+            after_id = events[-1].id
+            next_heartbeat = time.monotonic() + heartbeat_interval
+            yield ''.join(format_event(event) for event in events)
+        elif time.monotonic() >= next_heartbeat:
+            next_heartbeat = time.monotonic() + heartbeat_interval
+            yield ': keep-alive\n\n'
+        if time.monotonic() + poll_interval > deadline:
+            return
+        time.sleep(poll_interval)
+
+
+# Stream slots of the worker process
+stream_slots = StreamSlots()
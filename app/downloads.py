@@ -0,0 +1,238 @@
+import hashlib
+import mimetypes
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import quote
+
+import werkzeug.utils
+from flask import Response, request, send_file
+
+from app import app
+
+# Directory of the downloadable files
+RESOURCES_PATH = Path(__file__).resolve().parent.parent / 'resources'
+
+# Suffixes of the precompressed copies of a file, by content coding, in order of preference
+PRECOMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# Size of the blocks read to hash a file
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    """Return the SHA-256 hex digest of a file, read a block at a time."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while block := file.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DownloadManifest:
+    """
+    Index of the downloadable files, by path relative to the root directory.
+
+    Files can also be looked up by their bare name, as long as no other file of the tree has
+    the same name. The index is built once (at bootstrap, in the gunicorn master process) and
+    refreshed when the files change: lookups stat the directories of the tree at most every
+    check_interval seconds, and the tree is rescanned only when one of them was modified.
+    A file overwritten in place does not change its directory, so each lookup also stats the
+    file found and describes it again if its size or mtime changed. Content hashes are reused
+    for the files whose size and mtime did not change.
+    """
+
+    def __init__(self, root=RESOURCES_PATH, location='resources', check_interval=5.0):
+        """
+        Initialize the manifest.
+
+        Args:
+            root (Path): Directory of the files
+            location (str): Name of the directory for the fronting proxy (see send_download)
+            check_interval (float): Minimum delay between two checks of the directories, in seconds
+        """
+        self.root = Path(root)
+        self.location = location
+        self.check_interval = check_interval
+        self._entries = {}
+        self._names = {}
+        self._signature = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _directory_signature(self):
+        """Return the mtime of every directory of the tree: adding, removing or renaming a file changes it."""
+        signature = []
+        for directory, _, _ in os.walk(self.root):
+            try:
+                signature.append((directory, os.stat(directory).st_mtime_ns))
+            except FileNotFoundError:
+                pass
+        return tuple(sorted(signature))
+
+    def _describe(self, path, previous=None):
+        """Build the entry of a file, reusing the hash of its previous entry if the file did not change."""
+        stat = path.stat()
+        if previous is not None and (previous['size'], previous['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+            sha256 = previous['sha256']
+        else:
+            sha256 = file_sha256(path)
+        return {
+            'name': path.name,
+            'path': path,
+            'location': f'{self.location}/{path.relative_to(self.root).as_posix()}',
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': sha256,
+            'mimetype': mimetypes.guess_type(path.name)[0] or 'application/octet-stream',
+            'variants': {},
+        }
+
+    def _add_variants(self, entry, paths, relative_path):
+        """Add the precompressed copies found in paths (relative path -> Path) to an entry."""
+        for coding, suffix in PRECOMPRESSED_SUFFIXES.items():
+            variant_path = paths.get(relative_path + suffix)
+            if variant_path is not None:
+                entry['variants'][coding] = {
+                    'path': variant_path,
+                    'location': f'{self.location}/{relative_path}{suffix}',
+                }
+
+    def refresh(self, force=False):
+        """
+        Rescan the tree if it changed since the last scan.
+
+        Args:
+            force (bool): Rescan and recheck every file, even if no directory changed
+
+        Returns:
+            bool: True if the tree was rescanned
+        """
+        with self._lock:
+            signature = self._directory_signature()
+            self._checked_at = time.monotonic()
+            if signature == self._signature and not force:
+                return False
+            paths = {path.relative_to(self.root).as_posix(): path
+                     for path in sorted(self.root.rglob('*')) if path.is_file()}
+            entries = {}
+            for relative_path, path in paths.items():
+                coding = next((coding for coding, suffix in PRECOMPRESSED_SUFFIXES.items()
+                               if relative_path.endswith(suffix) and relative_path[:-len(suffix)] in paths), None)
+                if coding is None:
+                    entries[relative_path] = self._describe(path, None if force else self._entries.get(relative_path))
+            # Precompressed copies are served in place of their file, not under their own name
+            for relative_path, entry in entries.items():
+                self._add_variants(entry, paths, relative_path)
+            names = {}
+            for relative_path, entry in entries.items():
+                names.setdefault(entry['name'], []).append(relative_path)
+            ambiguous = sorted(name for name, relative_paths in names.items() if len(relative_paths) > 1)
+            if ambiguous:
+                print(f"Download manifest of {self.root}: {', '.join(ambiguous)} only served by relative path.")
+            self._entries = entries
+            self._names = {name: relative_paths[0] for name, relative_paths in names.items()
+                           if len(relative_paths) == 1}
+            self._signature = signature
+        print(f"Download manifest of {self.root}: {len(entries)} files.")
+        return True
+
+    def get(self, name):
+        """
+        Return the entry of a downloadable file.
+
+        Args:
+            name (str): Path relative to the root directory, or file name if it is unique in the tree
+
+        Returns:
+            dict: The 'name', 'path', 'location', 'size', 'mtime', 'sha256', 'mimetype' and
+                precompressed 'variants' (content coding -> 'path' and 'location') of the file,
+                None if there is no such file
+        """
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval:
+            self.refresh()
+        entry = self._lookup(name)
+        if entry is None:
+            return None
+        try:
+            stat = entry['path'].stat()
+        except FileNotFoundError:
+            # Removed within the check interval
+            self.refresh()
+            return self._lookup(name)
+        if (stat.st_size, stat.st_mtime_ns) != (entry['size'], entry['mtime_ns']):
+            # Overwritten in place: its directory did not change, so the scan did not see it
+            entry = self._redescribe(entry)
+        return entry
+
+    def _lookup(self, name):
+        relative_path = name if name in self._entries else self._names.get(name)
+        return self._entries.get(relative_path)
+
+    def _redescribe(self, entry):
+        """Describe again a file that changed since its entry was built, and return its new entry."""
+        relative_path = entry['path'].relative_to(self.root).as_posix()
+        with self._lock:
+            new_entry = self._describe(entry['path'])
+            new_entry['variants'] = entry['variants']
+            self._entries = {**self._entries, relative_path: new_entry}
+        return new_entry
+
+    def names(self):
+        """Return the paths of the downloadable files, relative to the root directory."""
+        return sorted(self._entries)
+
+
+def send_download(path, download_name, mimetype, etag, location, variants=None):
+    """
+    Send a file as an attachment, with conditional requests and byte ranges.
+
+    The precompressed variant preferred by the client (Accept-Encoding) is sent in place of the
+    file. With the DOWNLOAD_OFFLOAD setting, the worker answers conditional requests itself but
+    hands the bytes over to the fronting proxy: nginx serves the X-Accel-Redirect location
+    DOWNLOAD_ACCEL_REDIRECT_PREFIX/<location> (an internal location aliased to the files), and
+    Apache or lighttpd the X-Sendfile path.
+
+    Args:
+        path (Path): The file
+        download_name (str): File name proposed to the client
+        mimetype (str): Content type of the file
+        etag (str): Entity tag of the file, e.g. its content hash
+        location (str): Path of the file for the proxy, relative to DOWNLOAD_ACCEL_REDIRECT_PREFIX
+        variants (dict): Precompressed copies, content coding -> dict with 'path' and 'location'
+
+    Returns:
+        Response: The file, a 304 or a 206 response, or the offload response
+    """
+    coding = next((coding for coding in PRECOMPRESSED_SUFFIXES
+                   if variants and coding in variants and coding in request.accept_encodings), None)
+    if coding is not None:
+        path, location, etag = variants[coding]['path'], variants[coding]['location'], f'{etag}-{coding}'
+
+    offload = app.config.get('DOWNLOAD_OFFLOAD')
+    if offload and etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+    elif offload:
+        # The proxy answers range requests and sets the length of the bytes it sends
+        response = werkzeug.utils.send_file(str(Path(path).resolve()), request.environ, mimetype=mimetype,
+                                            as_attachment=True, download_name=download_name, conditional=False,
+                                            etag=etag, use_x_sendfile=True)
+        del response.headers['Content-Length']
+        if offload == 'x-accel-redirect':
+            del response.headers['X-Sendfile']
+            prefix = app.config['DOWNLOAD_ACCEL_REDIRECT_PREFIX']
+            response.headers['X-Accel-Redirect'] = f'{prefix}/{quote(location)}'
+    else:
+        response = send_file(path, mimetype=mimetype, as_attachment=True, download_name=download_name,
+                             conditional=True, etag=etag)
+    if coding is not None and response.status_code != 304:
+        response.headers['Content-Encoding'] = coding
+    if variants:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+download_manifest = DownloadManifest()
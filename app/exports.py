@@ -0,0 +1,220 @@
+import csv
+import fcntl
+import gzip
+import io
+import json
+
+from sqlalchemy import select
+
+from app import db, db_path
+from app.models import Contribution
+
+# Exports are rebuilt for each corpus version, next to the database
+EXPORTS_DIR = db_path.parent / 'exports'
+
+# Download name of each export format, and its mimetype
+EXPORT_FILE_NAMES = {
+    'contributions-anonymisees.csv': 'csv',
+    'contributions-anonymisees.jsonl': 'jsonl',
+    'contributions-anonymisees.json': 'json',
+}
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+# Fields of an exported contribution, in column order
+EXPORT_FIELDS = ['body', 'number', 'time', 'user']
+
+# Number of rows fetched at once from the database cursor
+EXPORT_BATCH_SIZE = 1000
+
+# Seconds after which clients retry a download whose export is not built yet
+EXPORT_RETRY_AFTER = 30
+
+
+def iter_export_records(batch_size=EXPORT_BATCH_SIZE):
+    """
+    Read the contributions from the database, newest first, as anonymised records.
+
+    Contributors are anonymised with Contribution.anonymise_contributor whatever the
+    anonymise_contributors setting, since exports leave the site. Must be called within an
+    application context.
+
+    Args:
+        batch_size (int): Number of rows fetched at once
+
+    Yields:
+        dict: Record with the 'body', 'number', 'time' and 'user' keys
+    """
+    statement = select(Contribution.id, Contribution.contributor, Contribution.time, Contribution.body)
+    statement = statement.order_by(Contribution.id.desc()).execution_options(yield_per=batch_size)
+    for number, contributor, time, body in db.session.execute(statement):
+        yield {
+            'body': body,
+            'number': str(number),
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'user': Contribution.anonymise_contributor(contributor),
+        }
+
+
+def iter_export(records, export_format, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Serialize records to an export format, a batch of records at a time.
+
+    Args:
+        records (iterable): Records of iter_export_records
+        export_format (str): 'csv', 'jsonl' or 'json'
+        batch_size (int): Number of records per chunk
+
+    Yields:
+        str: Chunks of the export
+    """
+    buffer = io.StringIO()
+    csv_writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, lineterminator='\n')
+    if export_format == 'csv':
+        csv_writer.writeheader()
+    elif export_format == 'json':
+        buffer.write('[')
+    count = 0
+    for record in records:
+        if export_format == 'csv':
+            csv_writer.writerow(record)
+        elif export_format == 'jsonl':
+            buffer.write(json.dumps(record, ensure_ascii=False) + '\n')
+        else:
+            buffer.write(',\n' if count else '\n')
+            # Only the newlines of the indentation are raw in JSON (U+2028 stays escaped)
+            buffer.write('    ' + json.dumps(record, ensure_ascii=False, indent=4).replace('\n', '\n    '))
+        count += 1
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if export_format == 'json':
+        buffer.write('\n]\n' if count else ']')
+    yield buffer.getvalue()
+
+
+def export_path(export_format, version):
+    """Return the path of the export of a corpus version; its gzip copy has an extra .gz suffix."""
+    return EXPORTS_DIR / f'contributions-anonymisees-{version}.{export_format}'
+
+
+def build_export(export_format, version):
+    """
+    Write the export of the current corpus and its gzip copy, unless they already exist.
+
+    Must be called within an application context.
+
+    Rows are streamed from the database to both files, so memory does not grow with the
+    corpus. Processes building the same export take turns on a file lock, so that each export is
+    built once per corpus version; exports of older versions are then deleted.
+
+    Args:
+        export_format (str): 'csv', 'jsonl' or 'json'
+        version (str): The current corpus version, see get_corpus_version
+
+    Returns:
+        Path: Path of the export
+    """
+    path = export_path(export_format, version)
+    gzip_path = path.with_name(f'{path.name}.gz')
+    if path.exists():
+        return path
+    EXPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    with open(EXPORTS_DIR / f'{export_format}.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if path.exists():
+                return path
+            temporary_path = path.with_name(f'{path.name}.tmp')
+            temporary_gzip_path = gzip_path.with_name(f'{gzip_path.name}.tmp')
+            with open(temporary_path, 'wb') as file, \
+                    gzip.GzipFile(temporary_gzip_path, 'wb', compresslevel=9, mtime=0) as gzip_file:
+                for chunk in iter_export(iter_export_records(), export_format):
+                    data = chunk.encode('utf-8')
+                    file.write(data)
+                    gzip_file.write(data)
+            # The plain file is the marker of a complete export, so it is moved last
+            temporary_gzip_path.replace(gzip_path)
+            temporary_path.replace(path)
+            for pattern in (f'*.{export_format}', f'*.{export_format}.gz'):
+                for stale_path in EXPORTS_DIR.glob(f'contributions-anonymisees-{pattern}'):
+                    if stale_path not in (path, gzip_path):
+                        stale_path.unlink(missing_ok=True)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    print(f"Export {path.name} built ({path.stat().st_size} bytes, {gzip_path.stat().st_size} gzipped).")
+    return path
+
+
+def build_exports(version):
+    """
+    Build the export of every format for a corpus version, after an import or at start-up.
+
+    Must be called within an application context.
+
+    Args:
+        version (str): The current corpus version, see get_corpus_version
+
+    Returns:
+        list: Paths of the exports
+    """
+    return [build_export(export_format, version) for export_format in EXPORT_MIMETYPES]
+
+
+def find_export(export_format, version):
+    """
+    Return the path of the export of a corpus version, or of the newest complete export while it is built.
+
+    Args:
+        export_format (str): 'csv', 'jsonl' or 'json'
+        version (str): The current corpus version
+
+    Returns:
+        Path: Path of the export, None if there is none
+    """
+    path = export_path(export_format, version)
+    if path.exists():
+        return path
+    # Exports of older versions are only deleted once the new one is complete
+    paths = []
+    for stale_path in EXPORTS_DIR.glob(f'contributions-anonymisees-*.{export_format}'):
+        try:
+            paths.append((stale_path.stat().st_mtime_ns, stale_path))
+        except FileNotFoundError:
+            continue
+    return max(paths)[1] if paths else None
+
+
+def get_export(file_name, version):
+    """
+    Return the export matching a download name.
+
+    Exports are built by the import and the database initialization (see build_exports), never
+    by a request: until the export of the current corpus version exists, the previous one is
+    served.
+
+    Args:
+        file_name (str): One of EXPORT_FILE_NAMES
+        version (str): The current corpus version
+
+    Returns:
+        dict: The 'path', proxy 'location', 'mimetype', 'etag' and gzip 'variants' of the
+            export, as expected by app.downloads.send_download, None if no export is built yet
+    """
+    export_format = EXPORT_FILE_NAMES[file_name]
+    path = find_export(export_format, version)
+    if path is None:
+        return None
+    gzip_path = path.with_name(f'{path.name}.gz')
+    return {
+        'path': path,
+        'location': f'exports/{path.name}',
+        'mimetype': EXPORT_MIMETYPES[export_format],
+        # The file name holds the corpus version
+        'etag': path.name,
+        'variants': {'gzip': {'path': gzip_path, 'location': f'exports/{gzip_path.name}'}},
+    }
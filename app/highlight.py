@@ -0,0 +1,129 @@
+import re
+from functools import lru_cache
+
+from markupsafe import Markup, escape
+
+from app.search import normalize_keywords, normalize_text
+
+HIGHLIGHT_OPEN = Markup('<span class="keyword-highlight">')
+HIGHLIGHT_CLOSE = Markup('</span>')
+
+# Contribution fields highlighted on result pages
+HIGHLIGHTED_FIELDS = ('id', 'anonymized_contributor', 'body', 'formatted_time')
+
+
+@lru_cache(maxsize=512)
+def compile_keywords_pattern(normalized_keywords):
+    """
+    Compile one alternation matching any of the keywords in accent-folded text.
+
+    Like the search, a keyword matches at the start of a word, and the tokens of a keyword
+    such as "12/04" may be separated by any non-word characters.
+
+    Args:
+        normalized_keywords (tuple): Output of normalize_keywords
+
+    Returns:
+        Pattern: Compiled regex, or None if there is nothing to highlight
+    """
+    if not normalized_keywords:
+        return None
+    alternatives = [r'\W+'.join(map(re.escape, tokens)) for tokens in normalized_keywords]
+    # Longest alternatives first so that the longest keyword wins on overlapping matches
+    alternatives.sort(key=len, reverse=True)
+    return re.compile(r'(?<!\w)(?:{})'.format('|'.join(alternatives)))
+
+
+@lru_cache(maxsize=4096)
+def _fold_char(char):
+    return normalize_text(char)
+
+
+def fold_text(text):
+    """
+    Fold accents and case of a text, keeping track of original positions.
+
+    Args:
+        text (str): The text to fold
+
+    Returns:
+        tuple: (folded_text, positions) where positions maps each folded index to its index in text,
+            or is None when both strings are aligned character by character
+    """
+    if text.isascii():
+        return text.lower(), None
+    pieces = [_fold_char(char) for char in text]
+    folded = ''.join(pieces)
+    if all(len(piece) == 1 for piece in pieces):
+        return folded, None
+    positions = []
+    for index, piece in enumerate(pieces):
+        positions.extend([index] * len(piece))
+    return folded, positions
+
+
+def highlight_with_pattern(text, pattern):
+    """
+    Highlight the matches of a compiled pattern in a single pass over the text.
+
+    Args:
+        text (str): The text to search in
+        pattern (Pattern): Pattern returned by compile_keywords_pattern
+
+    Returns:
+        Markup: HTML-escaped text with matches wrapped in highlight spans
+    """
+    text = str(text)
+    if pattern is None or not text:
+        return escape(text)
+
+    folded, positions = fold_text(text)
+    parts = []
+    last_end = 0
+    for match in pattern.finditer(folded):
+        start, end = match.span()
+        if positions is not None:
+            start, end = positions[start], positions[end - 1] + 1
+        if start < last_end:
+            continue
+        parts.append(escape(text[last_end:start]))
+        parts.append(HIGHLIGHT_OPEN + escape(text[start:end]) + HIGHLIGHT_CLOSE)
+        last_end = end
+    parts.append(escape(text[last_end:]))
+    return Markup('').join(parts)
+
+
+def highlight_keywords(text, keywords):
+    """
+    Highlight keywords in text by wrapping them in span tags with a highlight class.
+
+    Args:
+        text (str): The text to search in
+        keywords (list): List of keywords to highlight
+
+    Returns:
+        Markup: HTML-safe string with highlighted keywords
+    """
+    return highlight_with_pattern(text, compile_keywords_pattern(normalize_keywords(keywords)))
+
+
+def highlight_contributions(contribs, keywords):
+    """
+    Highlight the keywords in the displayed fields of a page of contributions.
+
+    The pattern is compiled (or fetched from the cache) once for the whole page.
+
+    Args:
+        contribs (list): List of Contribution objects
+        keywords (list): List of keywords to highlight
+
+    Returns:
+        list: List of dictionaries mapping each highlighted field to its Markup,
+            plus the raw contribution id under 'number'
+    """
+    pattern = compile_keywords_pattern(normalize_keywords(keywords))
+    return [
+        dict({field: highlight_with_pattern(getattr(contrib, field), pattern) for field in HIGHLIGHTED_FIELDS},
+             number=contrib.id)
+        for contrib in contribs
+    ]
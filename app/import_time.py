@@ -0,0 +1,81 @@
+import subprocess
+import sys
+from pathlib import Path
+
+# Root of the repository, from which `import app` is profiled
+REPOSITORY_PATH = Path(__file__).resolve().parent.parent
+
+
+def profile_imports(module='app'):
+    """
+    Import a module in a fresh interpreter with -X importtime and parse its report.
+
+    Args:
+        module (str): Name of the module to import
+
+    Returns:
+        list: One dict per imported module, in import order, with its 'module' name,
+            'self_us' and 'cumulative_us' import times in microseconds, and its nesting 'depth'
+
+    Raises:
+        RuntimeError: If the import fails
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=REPOSITORY_PATH, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Error importing {module}: {result.stderr.strip().splitlines()[-1]}")
+    return parse_import_times(result.stderr)
+
+
+def parse_import_times(report):
+    """
+    Parse the output of -X importtime.
+
+    Args:
+        report (str): Lines such as 'import time:       915 |       8387 |   flask_mail'
+
+    Returns:
+        list: One dict per imported module, see profile_imports
+    """
+    entries = []
+    for line in report.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        entries.append({
+            'module': name.strip(),
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+        })
+    return entries
+
+
+def import_time_report(entries, module='app', top=20):
+    """
+    Summarize an import profile.
+
+    The time of every submodule is summed into its top-level package, so that a package
+    shows up with its whole cost whichever module imported it first.
+
+    Args:
+        entries (list): Output of profile_imports
+        module (str): Name of the profiled module
+        top (int): Number of packages listed
+
+    Returns:
+        dict: 'total_ms' of the module import, and the 'slowest' top-level packages, each with
+            its 'package' name, import time 'ms' and number of 'modules'
+    """
+    total_us = next((entry['cumulative_us'] for entry in entries if entry['module'] == module), 0)
+    packages = {}
+    for entry in entries:
+        package = packages.setdefault(entry['module'].split('.')[0], {'us': 0, 'modules': 0})
+        package['us'] += entry['self_us']
+        package['modules'] += 1
+    slowest = sorted(packages.items(), key=lambda item: item[1]['us'], reverse=True)[:top]
+    return {
+        'total_ms': round(total_us / 1000, 1),
+        'slowest': [{'package': name, 'ms': round(package['us'] / 1000, 1), 'modules': package['modules']}
+                    for name, package in slowest],
+    }
@@ -0,0 +1,86 @@
+import json
+
+# Size of the chunks read from the file
+CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = ' \t\n\r'
+
+
+def iter_json_array(file, chunk_size=CHUNK_SIZE):
+    """
+    Parse a JSON array incrementally, yielding its items one at a time.
+
+    Only the item being decoded and the rest of the current chunk are held in memory,
+    whatever the size of the array.
+
+    Args:
+        file: Text file object positioned at the start of the array
+        chunk_size (int): Number of characters read at once
+
+    Yields:
+        The items of the array
+
+    Raises:
+        json.JSONDecodeError: If the file does not hold a valid JSON array
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+
+    def fill():
+        """Read the next chunk, dropping the part of the buffer already parsed."""
+        nonlocal buffer, position, eof
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer, position = buffer[position:] + chunk, 0
+
+    def next_character():
+        """Skip the whitespace and return the next character ('' at the end of the file)."""
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in WHITESPACE:
+                position += 1
+            if position < len(buffer) or eof:
+                return buffer[position] if position < len(buffer) else ''
+            fill()
+
+    if next_character() != '[':
+        raise json.JSONDecodeError("Expecting '['", buffer, position)
+    position += 1
+    if next_character() == ']':
+        return
+    while True:
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(buffer) or eof:
+                    break
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            fill()
+        position = end
+        yield item
+
+        character = next_character()
+        if character == ']':
+            return
+        if character != ',':
+            raise json.JSONDecodeError("Expecting ',' delimiter", buffer, position)
+        position += 1
+        next_character()
+
+
+def iter_json_lines(file):
+    """
+    Parse a JSON Lines file, yielding one item per non-empty line.
+
+    Args:
+        file: Text file object
+
+    Yields:
+        The item of each line
+    """
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
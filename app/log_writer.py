@@ -0,0 +1,187 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import pytz
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from app import app, db
+
+
+class WriteBehindLogger:
+    """
+    Write-behind logger for the SearchLog, DownloadLog and AnalyseChat tables.
+
+    Requests only enqueue their log records in memory. A background thread of each worker
+    inserts them in batched transactions once batch_size records are waiting or flush_interval
+    seconds have passed, which keeps SQLite write locks and fsyncs off the request path.
+    The queue is bounded: when the database cannot keep up, requests wait at most
+    enqueue_timeout seconds, then the record is dropped and counted.
+    """
+
+    def __init__(self, app, batch_size=200, flush_interval=2.0, max_queue_size=10000, enqueue_timeout=0.05):
+        """
+        Initialize the logger.
+
+        Args:
+            app (Flask): The Flask application, used for the database context
+            batch_size (int): Number of records triggering a flush
+            flush_interval (float): Maximum delay before a queued record is written, in seconds
+            max_queue_size (int): Maximum number of records waiting in memory
+            enqueue_timeout (float): Maximum time a request waits for room in a full queue, in seconds
+        """
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._counters = {'enqueued': 0, 'flushed': 0, 'dropped': 0, 'failed': 0, 'batches': 0}
+
+    def _increment(self, counter, value=1):
+        with self._lock:
+            self._counters[counter] += value
+
+    def _ensure_started(self):
+        """Start the flusher thread of the current process (threads do not survive a fork)."""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='write-behind-logger', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def log(self, model, **values):
+        """
+        Enqueue a log record.
+
+        Args:
+            model: The model class of the record (SearchLog, DownloadLog or AnalyseChat)
+            **values: Column values of the record; the timestamp defaults to the enqueue time
+
+        Returns:
+            bool: True if the record was queued, False if it was dropped
+        """
+        values.setdefault('timestamp', datetime.now(tz=pytz.timezone('Europe/Paris')))
+        self._ensure_started()
+        try:
+            self._queue.put((model, values), timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._increment('dropped')
+            return False
+        self._increment('enqueued')
+        return True
+
+    def _next_batch(self):
+        """Wait for a first record, then collect records until the batch is full or the interval is over."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop_event.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        """
+        Insert a batch of records in a single transaction.
+
+        If a record breaks a constraint, the batch is inserted again one record at a time, so that
+        only the offending records are lost.
+        """
+        if not batch:
+            return
+        rows_by_table = {}
+        for model, values in batch:
+            rows_by_table.setdefault(model.__table__, []).append(values)
+        with self.app.app_context():
+            try:
+                for table, rows in rows_by_table.items():
+                    db.session.execute(insert(table), rows)
+                db.session.commit()
+                self._increment('flushed', len(batch))
+                self._increment('batches')
+            except IntegrityError:
+                db.session.rollback()
+                self._write_one_by_one(batch)
+            except Exception as e:
+                db.session.rollback()
+                self._increment('failed', len(batch))
+                print(f"Error writing {len(batch)} log records: {str(e)}")
+            finally:
+                db.session.remove()
+
+    def _write_one_by_one(self, batch):
+        """Insert the records of a batch in one transaction each, within an application context."""
+        for model, values in batch:
+            try:
+                db.session.execute(insert(model.__table__), [values])
+                db.session.commit()
+                self._increment('flushed')
+            except Exception as e:
+                db.session.rollback()
+                self._increment('failed')
+                print(f"Error writing {model.__tablename__} log record {values}: {str(e)}")
+        self._increment('batches')
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._next_batch()
+            with self._flush_lock:
+                self._write(batch)
+
+    def flush(self):
+        """Write every queued record now, from the calling thread."""
+        with self._flush_lock:
+            while True:
+                batch = []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return
+                self._write(batch)
+
+    def stop(self):
+        """Stop the flusher thread and write the remaining records (called when a worker exits)."""
+        self._stop_event.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+    def stats(self):
+        """
+        Return the counters of the current process.
+
+        Returns:
+            dict: Records enqueued, flushed, dropped and failed, batches written and current queue size
+        """
+        with self._lock:
+            counters = dict(self._counters)
+        counters['queued'] = self._queue.qsize()
+        return counters
+
+
+# Logger shared by every request of the process
+log_writer = WriteBehindLogger(app)
+atexit.register(log_writer.stop)
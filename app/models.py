@@ -1,11 +1,11 @@
 from datetime import datetime
 
 import pytz
-from sqlalchemy import func
-from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.sql.expression import case
+from sqlalchemy import event, update
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app import db, anonymise_contributors
+from app.search import normalize_text
 
 
 class SearchLog(db.Model):
@@ -31,47 +31,15 @@ class Contribution(db.Model):
     body = db.Column(db.Text, nullable=False)
     time = db.Column(db.DateTime, nullable=False)
 
-    @hybrid_property
-    def formatted_time(self):
-        """Return time formatted in French style."""
-        format_str = 'Le %d/%m/%Y à %Hh%M'
-        # We need to ensure we have the actual datetime instance
-        if hasattr(self, '_time') and self._time is not None:
-            return self._time.strftime(format_str)
-        if self.time is not None:
-            # Access the actual datetime value, not the SQLAlchemy column
-            time_value = self.time
-            if hasattr(time_value, 'strftime'):  # Make sure it's a datetime object
-                return time_value.strftime(format_str)
-        return func.strftime(format_str, self.time).label('formatted_time')
-
-    @hybrid_property
-    def anonymized_contributor(self):
-        """Return anonymized or genuine contributor name based on flag."""
-        if not anonymise_contributors:
-            return self.contributor
-
-        # Get actual contributor value
-        if hasattr(self, '_contributor') and self._contributor is not None:
-            contributor_value = self._contributor
-        else:
-            contributor_value = self.contributor
-
-        if contributor_value is not None:
-            return self.anonymise_contributor(contributor_value)
-        return None
-
-    @anonymized_contributor.expression
-    def anonymized_contributor(cls):
-        """SQL expression for anonymized contributor."""
-        if not anonymise_contributors:
-            return cls.contributor
+    # Display and search columns materialized at import time (see search_columns)
+    formatted_time = db.Column(db.String(32), nullable=False, default='', index=True)
+    anonymized_contributor = db.Column(db.String(80), nullable=False, default='', index=True)
+    search_text = db.Column(db.Text, nullable=False, default='')
 
-        # Correct syntax for SQLAlchemy's case function
-        return case(
-            (func.lower(cls.contributor) == 'anonyme', cls.contributor),
-            else_='anonymisée'
-        ).label('anonymized_contributor')
+    @staticmethod
+    def format_time(time):
+        """Return time formatted in French style."""
+        return time.strftime('Le %d/%m/%Y à %Hh%M')
 
     @staticmethod
     def anonymise_contributor(contributor):
@@ -81,10 +49,73 @@ class Contribution(db.Model):
             return contributor
         return 'Anonymisée'
 
+    @classmethod
+    def search_columns(cls, contribution_id, contributor, body, time):
+        """
+        Compute the materialized columns of a contribution.
+
+        Used by the ORM before each insert or update, and directly by bulk imports and migrations.
+
+        Args:
+            contribution_id (int): The contribution number
+            contributor (str): The genuine contributor name
+            body (str): The contribution text
+            time (datetime): The contribution date
+
+        Returns:
+            dict: Values of formatted_time, anonymized_contributor and search_text
+        """
+        formatted_time = cls.format_time(time) if time is not None else ''
+        if contributor is None:
+            anonymized_contributor = ''
+        elif anonymise_contributors:
+            anonymized_contributor = cls.anonymise_contributor(contributor)
+        else:
+            anonymized_contributor = contributor
+        searchable_fields = [contribution_id, anonymized_contributor, formatted_time, body]
+        return {
+            'formatted_time': formatted_time,
+            'anonymized_contributor': anonymized_contributor,
+            # Every searchable field, lowercased and accent-folded, so a search is one predicate per keyword
+            'search_text': normalize_text(' '.join(str(field) for field in searchable_fields if field is not None)),
+        }
+
     def __repr__(self):
         return f'<Contribution {self.id} by {self.contributor}>'
 
 
+@event.listens_for(Contribution, 'before_insert')
+@event.listens_for(Contribution, 'before_update')
+def fill_contribution_search_columns(mapper, connection, contribution):
+    """Keep the materialized columns of a contribution in sync with its fields."""
+    for name, value in Contribution.search_columns(contribution.id, contribution.contributor,
+                                                   contribution.body, contribution.time).items():
+        setattr(contribution, name, value)
+
+
+@event.listens_for(Contribution, 'after_insert')
+def fill_contribution_number(mapper, connection, contribution):
+    """Add the contribution number to search_text when the database assigned it on insert."""
+    search_text = Contribution.search_columns(contribution.id, contribution.contributor,
+                                              contribution.body, contribution.time)['search_text']
+    if search_text != contribution.search_text:
+        table = Contribution.__table__
+        connection.execute(update(table).where(table.c.id == contribution.id).values(search_text=search_text))
+        set_committed_value(contribution, 'search_text', search_text)
+
+
+class CorpusVersion(db.Model):
+    """Model recording each import of the contributions table, used to invalidate derived caches."""
+    __tablename__ = 'corpus_versions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    imported_at = db.Column(db.DateTime, default=lambda: datetime.now(tz=pytz.timezone('Europe/Paris')))
+    contribution_count = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<CorpusVersion {self.id} with {self.contribution_count} contributions>'
+
+
 class Comment(db.Model):
     """Comment model for storing user comments."""
     __tablename__ = 'comments'
@@ -94,10 +125,11 @@ class Comment(db.Model):
     ip_address = db.Column(db.String(45), nullable=True)  # IPv6 can be up to 45 chars
     user_agent = db.Column(db.Text, nullable=True)  # Store user agent information
     body = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(tz=pytz.timezone('Europe/Paris')))
+    # Indexed for the keyset pagination of the discussion page
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(tz=pytz.timezone('Europe/Paris')), index=True)
 
-    # Relationship with answers
-    answers = db.relationship('Answer', backref='comment', lazy='dynamic', cascade='all, delete-orphan')
+    # Relationship with answers, loaded for a whole page of comments with selectinload
+    answers = db.relationship('Answer', backref='comment', order_by='Answer.id', cascade='all, delete-orphan')
 
     def __repr__(self):
         return f'<Comment {self.id} by {self.username}>'
@@ -113,11 +145,27 @@ class Answer(db.Model):
     user_agent = db.Column(db.Text, nullable=True)  # Store user agent information
     body = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(tz=pytz.timezone('Europe/Paris')))
-    comment_id = db.Column(db.Integer, db.ForeignKey('comments.id'), nullable=False)
+    comment_id = db.Column(db.Integer, db.ForeignKey('comments.id'), nullable=False, index=True)
 
     def __repr__(self):
         return f'<Answer {self.id} to comment {self.comment_id} by {self.username}>'
 
+
+class DiscussionEvent(db.Model):
+    """Change sequence of the discussion, read by every worker to push new comments and answers to readers."""
+    __tablename__ = 'discussion_events'
+
+    id = db.Column(db.Integer, primary_key=True)  # Sequence number, also the SSE event id
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(tz=pytz.timezone('Europe/Paris')), index=True)
+    kind = db.Column(db.String(16), nullable=False)  # 'comment' or 'answer'
+    comment_id = db.Column(db.Integer, nullable=False)
+    item_id = db.Column(db.Integer, nullable=False)  # Id of the new comment or answer
+    html = db.Column(db.Text, nullable=False)  # Pre-rendered fragment
+
+    def __repr__(self):
+        return f'<DiscussionEvent {self.id} - {self.kind} {self.item_id}>'
+
+
 class AnalyseChat(db.Model):
     """Model for storing chat messages from the analyse view."""
     __tablename__ = 'analyse_chats'
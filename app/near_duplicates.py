@@ -0,0 +1,300 @@
+import os
+import zlib
+
+import numpy as np
+
+from app import db_path
+from app.search import tokenize
+
+# Default location of the index, next to the application database
+NEAR_DUPLICATES_PATH = db_path.parent / "near-duplicates.npz"
+
+# Prime just above 2**32 used by the MinHash permutations (a * x + b) mod p
+_MINHASH_PRIME = np.uint64(4294967311)
+_MAX_HASH = np.uint32(0xFFFFFFFF)
+
+
+class NearDuplicateIndex:
+    """
+    MinHash + locality-sensitive hashing index of near-duplicate contributions.
+
+    Each contribution body is reduced to a set of word shingles and summarized by a MinHash
+    signature, whose agreement rate estimates the Jaccard similarity of two bodies. Signatures are
+    split in bands: contributions sharing a band are candidates, kept as duplicates when their
+    estimated similarity reaches the threshold, and grouped in clusters represented by their
+    smallest contribution id. Signatures are only computed for new or modified contributions.
+    """
+
+    def __init__(self, path=NEAR_DUPLICATES_PATH, num_perm=128, bands=16, threshold=0.7, shingle_size=3, seed=6058):
+        """
+        Initialize an empty index.
+
+        Args:
+            path (Path): Path of the file the index is stored in
+            num_perm (int): Number of MinHash permutations (signature length)
+            bands (int): Number of LSH bands, num_perm must be a multiple of it
+            threshold (float): Minimum estimated Jaccard similarity of near-duplicates
+            shingle_size (int): Number of words per shingle
+            seed (int): Seed of the MinHash permutations, signatures are only comparable with the same seed
+        """
+        self.path = path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.seed = seed
+        # Index saved by another process for a newer corpus version, and the file it was read from
+        self._reloaded = None
+        self._reloaded_file_id = None
+        generator = np.random.default_rng(seed)
+        self._a = generator.integers(1, 2 ** 32 - 1, size=num_perm, dtype=np.uint64)
+        self._b = generator.integers(0, 2 ** 32 - 1, size=num_perm, dtype=np.uint64)
+        self.reset()
+
+    def reset(self):
+        """Empty the index."""
+        self.ids = np.empty(0, dtype=np.uint32)
+        self.checksums = np.empty(0, dtype=np.uint32)
+        self.signatures = np.empty((0, self.num_perm), dtype=np.uint32)
+        self.representatives = np.empty(0, dtype=np.uint32)
+        self.cluster_sizes = np.empty(0, dtype=np.uint32)
+        self.version = None
+
+    @property
+    def ready(self):
+        return self.version is not None
+
+    def shingles(self, body):
+        """
+        Return the hashed word shingles of a text.
+
+        Args:
+            body (str): The contribution text
+
+        Returns:
+            ndarray: Unique 32-bit shingle hashes, as uint64 (empty for a text without words)
+        """
+        tokens = tokenize(body)
+        size = min(self.shingle_size, len(tokens))
+        if size == 0:
+            return np.empty(0, dtype=np.uint64)
+        hashes = {zlib.crc32(' '.join(tokens[i:i + size]).encode('utf-8'))
+                  for i in range(len(tokens) - size + 1)}
+        return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+    def signature(self, body):
+        """
+        Compute the MinHash signature of a text.
+
+        Args:
+            body (str): The contribution text
+
+        Returns:
+            ndarray: uint32 signature of length num_perm (all values maximal for a text without words)
+        """
+        shingles = self.shingles(body)
+        if shingles.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        # One row per permutation, one column per shingle; a * x + b stays below 2**64
+        permuted = (np.outer(self._a, shingles) + self._b[:, None]) % _MINHASH_PRIME
+        return (permuted.min(axis=1) & np.uint64(_MAX_HASH)).astype(np.uint32)
+
+    def update(self, documents, version):
+        """
+        Bring the index up to date with the contributions.
+
+        Args:
+            documents (iterable): Iterable of (contribution_id, body) tuples for the whole corpus
+            version (str): Corpus version of the documents
+
+        Returns:
+            int: Number of signatures computed (new or modified contributions)
+        """
+        known_rows = {contribution_id: row for row, contribution_id in enumerate(self.ids.tolist())}
+        ids, checksums, signatures = [], [], []
+        computed = 0
+        for contribution_id, body in documents:
+            checksum = zlib.crc32(body.encode('utf-8'))
+            row = known_rows.get(contribution_id)
+            if row is not None and self.checksums[row] == checksum:
+                signature = self.signatures[row]
+            else:
+                signature = self.signature(body)
+                computed += 1
+            ids.append(contribution_id)
+            checksums.append(checksum)
+            signatures.append(signature)
+
+        order = np.argsort(np.array(ids, dtype=np.uint32), kind='stable')
+        self.ids = np.array(ids, dtype=np.uint32)[order]
+        self.checksums = np.array(checksums, dtype=np.uint32)[order]
+        self.signatures = (np.vstack(signatures) if signatures
+                           else np.empty((0, self.num_perm), dtype=np.uint32))[order]
+        self.version = version
+        self._cluster()
+        return computed
+
+    def _cluster(self):
+        """Group the contributions whose signatures share a band and are similar enough."""
+        count = len(self.ids)
+        parents = list(range(count))
+
+        def find(row):
+            while parents[row] != row:
+                parents[row] = parents[parents[row]]
+                row = parents[row]
+            return row
+
+        # Contributions without any word all have the maximal signature and must not match each other
+        has_words = (self.signatures != _MAX_HASH).any(axis=1) if count else np.empty(0, dtype=bool)
+        rows_per_band = self.num_perm // self.bands
+        for band in range(self.bands):
+            band_values = np.ascontiguousarray(self.signatures[:, band * rows_per_band:(band + 1) * rows_per_band])
+            keys = band_values.view(np.dtype((np.void, band_values.dtype.itemsize * rows_per_band))).ravel()
+            _, bucket_of_row, bucket_sizes = np.unique(keys, return_inverse=True, return_counts=True)
+            # Rows sorted by bucket, so that the members of a bucket are a contiguous slice
+            rows_by_bucket = np.argsort(bucket_of_row.ravel(), kind='stable')
+            bucket_ends = np.cumsum(bucket_sizes)
+            for bucket in np.flatnonzero(bucket_sizes > 1):
+                members = rows_by_bucket[bucket_ends[bucket] - bucket_sizes[bucket]:bucket_ends[bucket]]
+                members = members[has_words[members]]
+                if len(members) < 2:
+                    continue
+                # Compare every candidate with the first member of the bucket
+                similarities = (self.signatures[members[1:]] == self.signatures[members[0]]).mean(axis=1)
+                first_root = find(int(members[0]))
+                for member in members[1:][similarities >= self.threshold]:
+                    member_root = find(int(member))
+                    if member_root != first_root:
+                        # Keep the smallest row (smallest id) as root
+                        first_root, member_root = min(first_root, member_root), max(first_root, member_root)
+                        parents[member_root] = first_root
+
+        roots = np.fromiter((find(row) for row in range(count)), dtype=np.int64, count=count)
+        self.representatives = self.ids[roots] if count else np.empty(0, dtype=np.uint32)
+        _, root_of_row, root_counts = np.unique(roots, return_inverse=True, return_counts=True)
+        self.cluster_sizes = root_counts[root_of_row.ravel()].astype(np.uint32)
+
+    def _row(self, contribution_id):
+        row = int(np.searchsorted(self.ids, contribution_id))
+        if row < len(self.ids) and self.ids[row] == contribution_id:
+            return row
+        return None
+
+    def cluster_size(self, contribution_id):
+        """Return the number of contributions in the duplicate cluster of a contribution (1 if unique)."""
+        row = self._row(contribution_id)
+        return int(self.cluster_sizes[row]) if row is not None else 1
+
+    def similar(self, contribution_id):
+        """
+        Return the near-duplicates of a contribution.
+
+        Args:
+            contribution_id (int): The contribution number
+
+        Returns:
+            list: List of (contribution_id, estimated_similarity) tuples, most similar first
+        """
+        row = self._row(contribution_id)
+        if row is None or self.cluster_sizes[row] < 2:
+            return []
+        members = np.flatnonzero(self.representatives == self.representatives[row])
+        members = members[members != row]
+        similarities = (self.signatures[members] == self.signatures[row]).mean(axis=1)
+        ranking = np.lexsort((self.ids[members], -similarities))
+        return [(int(self.ids[members[i]]), float(similarities[i])) for i in ranking]
+
+    def collapse(self, contribution_ids):
+        """
+        Keep only one contribution per duplicate cluster, the one with the smallest id.
+
+        Args:
+            contribution_ids (list): Ordered list of contribution ids
+
+        Returns:
+            list: The ids that represent their cluster, in the same order
+        """
+        if not len(self.ids):
+            return list(contribution_ids)
+        ids = np.asarray(contribution_ids, dtype=np.uint32)
+        rows = np.clip(np.searchsorted(self.ids, ids), 0, len(self.ids) - 1)
+        known = self.ids[rows] == ids
+        keep = ~known | (self.representatives[rows] == ids)
+        return ids[keep].tolist()
+
+    def save(self):
+        """Write the index next to the database (atomically, so running workers never read a partial file)."""
+        temporary_path = self.path.with_suffix('.tmp.npz')
+        with open(temporary_path, 'wb') as file:
+            np.savez(file, ids=self.ids, checksums=self.checksums, signatures=self.signatures,
+                     representatives=self.representatives, cluster_sizes=self.cluster_sizes,
+                     version=np.array(self.version or ''),
+                     parameters=np.array([self.num_perm, self.bands, self.shingle_size, self.seed]),
+                     threshold=np.array(self.threshold))
+        os.replace(temporary_path, self.path)
+
+    def load(self, version=None):
+        """
+        Read the index saved by save.
+
+        Args:
+            version (str): Corpus version the saved index must have been built for, None to accept
+                any version (e.g. to update it incrementally)
+
+        Returns:
+            bool: True if a compatible index was loaded
+        """
+        if not self.path.exists():
+            return False
+        with np.load(self.path) as data:
+            parameters = [self.num_perm, self.bands, self.shingle_size, self.seed]
+            if data['parameters'].tolist() != parameters or float(data['threshold']) != self.threshold:
+                return False
+            if version is not None and str(data['version']) != version:
+                return False
+            self.ids = data['ids']
+            self.checksums = data['checksums']
+            self.signatures = data['signatures']
+            self.representatives = data['representatives']
+            self.cluster_sizes = data['cluster_sizes']
+            self.version = str(data['version'])
+        return True
+
+    def view(self, version):
+        """
+        Return the index of a corpus version.
+
+        After an import by another process, the index saved next to the database is read once
+        it was rebuilt for the current corpus version; until then, there is no index to use.
+
+        Args:
+            version (str): The current corpus version
+
+        Returns:
+            NearDuplicateIndex: This index or the one saved for this version, None if there is none
+        """
+        if self.version == version:
+            return self
+        reloaded = self._reloaded
+        if reloaded is not None and reloaded.version == version:
+            return reloaded
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if file_id == self._reloaded_file_id:
+            return None
+        # Read into a separate index, so that concurrent requests never see half of the arrays replaced
+        candidate = NearDuplicateIndex(self.path, self.num_perm, self.bands, self.threshold, self.shingle_size,
+                                       self.seed)
+        self._reloaded_file_id = file_id
+        if not candidate.load(version):
+            return None
+        self._reloaded = candidate
+        return candidate
+
+
+# Index shared by every request of the process
+near_duplicate_index = NearDuplicateIndex()
@@ -0,0 +1,45 @@
+import base64
+import binascii
+import json
+
+
+def encode_cursor(values):
+    """
+    Encode pagination state into an opaque, URL-safe cursor token.
+
+    Args:
+        values (dict): JSON-serializable pagination state (e.g. last id seen, total count)
+
+    Returns:
+        str: The cursor token
+    """
+    payload = json.dumps(values, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Decode a cursor token built by encode_cursor.
+
+    Args:
+        token (str): The cursor token (may be empty or None)
+
+    Returns:
+        dict: The pagination state, or an empty dict for a missing or malformed token
+    """
+    if not token:
+        return {}
+    try:
+        payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(payload)
+    except (binascii.Error, ValueError):
+        return {}
+    return values if isinstance(values, dict) else {}
+
+
+def cursor_int(values, key):
+    """Return a non-negative integer from decoded cursor values, or None if missing or invalid."""
+    value = values.get(key)
+    if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+        return value
+    return None
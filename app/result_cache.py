@@ -0,0 +1,344 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+from app import db_path
+
+# Default location of the caches, next to the application database
+SEARCH_CACHE_PATH = db_path.parent / "search-cache.db"
+
+
+class SharedCache:
+    """
+    Cache of versioned blobs shared by every gunicorn worker through a SQLite side file.
+
+    Entries are evicted by LRU once the cache exceeds max_bytes, expire after ttl seconds,
+    and are ignored as soon as the corpus version they were computed for changes.
+    Several caches can live in the same file, each one in its own table.
+
+    Hits only read the file: the recency of an entry is written at most every touch_interval
+    seconds, and hit and miss counters are kept by each process and added to the shared
+    counters every counter_flush_interval seconds. The total size of the entries is kept
+    up to date by triggers, so that inserts do not sum the whole table.
+    """
+
+    def __init__(self, path, name, max_bytes=32 * 1024 * 1024, ttl=24 * 60 * 60, touch_interval=60,
+                 counter_flush_interval=10):
+        """
+        Initialize the cache.
+
+        Args:
+            path (Path): Path of the SQLite side file
+            name (str): Name of the cache, used as table name
+            max_bytes (int): Size bound of the cached values, in bytes
+            ttl (int): Time to live of an entry, in seconds
+            touch_interval (float): Minimum delay between two updates of the last use of an entry, in seconds
+            counter_flush_interval (float): Delay between two writes of the process counters, in seconds
+        """
+        self.path = path
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.touch_interval = touch_interval
+        self.counter_flush_interval = counter_flush_interval
+        self._local = threading.local()
+        self._counters = {}
+        self._counters_pid = os.getpid()
+        self._counters_flushed_at = time.monotonic()
+        self._counters_lock = threading.Lock()
+
+    def _connection(self):
+        """Return the connection of the current thread, reopened after a fork."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            size_counter = f"'{self.name}.bytes'"
+            # The size counter is created with its triggers, in one transaction, from the entries already cached
+            connection.executescript(f"""
+                BEGIN IMMEDIATE;
+                CREATE TABLE IF NOT EXISTS {self.name} (
+                    cache_key TEXT PRIMARY KEY,
+                    version TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS {self.name}_last_used_at ON {self.name} (last_used_at);
+                CREATE INDEX IF NOT EXISTS {self.name}_version_created_at ON {self.name} (version, created_at);
+                CREATE TABLE IF NOT EXISTS cache_counters (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO cache_counters (name, value)
+                    SELECT {size_counter}, coalesce(sum(size), 0) FROM {self.name};
+                CREATE TRIGGER IF NOT EXISTS {self.name}_size_insert AFTER INSERT ON {self.name} BEGIN
+                    INSERT INTO cache_counters (name, value) VALUES ({size_counter}, NEW.size)
+                        ON CONFLICT (name) DO UPDATE SET value = value + excluded.value;
+                END;
+                CREATE TRIGGER IF NOT EXISTS {self.name}_size_update AFTER UPDATE OF size ON {self.name} BEGIN
+                    INSERT INTO cache_counters (name, value) VALUES ({size_counter}, NEW.size - OLD.size)
+                        ON CONFLICT (name) DO UPDATE SET value = value + excluded.value;
+                END;
+                CREATE TRIGGER IF NOT EXISTS {self.name}_size_delete AFTER DELETE ON {self.name} BEGIN
+                    INSERT INTO cache_counters (name, value) VALUES ({size_counter}, -OLD.size)
+                        ON CONFLICT (name) DO UPDATE SET value = value + excluded.value;
+                END;
+                COMMIT;
+            """)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @staticmethod
+    def make_key(*parts):
+        """Build a cache key from JSON-serializable parts."""
+        return json.dumps(parts, ensure_ascii=False, separators=(',', ':'))
+
+    def _count(self, counter, increment=1):
+        """Add to a counter of the process, and write the counters if they were not written for a while."""
+        with self._counters_lock:
+            if self._counters_pid != os.getpid():
+                # Counts inherited from the parent process are written by the parent
+                self._counters, self._counters_pid = {}, os.getpid()
+            self._counters[counter] = self._counters.get(counter, 0) + increment
+            flush = time.monotonic() - self._counters_flushed_at >= self.counter_flush_interval
+        if flush:
+            self.flush_counters()
+
+    def flush_counters(self):
+        """Add the counters of the process to the counters shared by every worker."""
+        with self._counters_lock:
+            counters = self._counters if self._counters_pid == os.getpid() else {}
+            self._counters, self._counters_pid = {}, os.getpid()
+            self._counters_flushed_at = time.monotonic()
+        if not counters:
+            return
+        try:
+            connection = self._connection()
+            with connection:
+                connection.executemany(
+                    'INSERT INTO cache_counters (name, value) VALUES (?, ?) '
+                    'ON CONFLICT (name) DO UPDATE SET value = value + excluded.value',
+                    [(f'{self.name}.{counter}', value) for counter, value in counters.items()]
+                )
+        except sqlite3.Error as e:
+            print(f"Error writing {self.name} cache counters: {str(e)}")
+
+    def get_value(self, key, version):
+        """
+        Look up a key in the cache.
+
+        Args:
+            key (str): Key built by make_key
+            version (str): Current corpus version
+
+        Returns:
+            bytes: The cached value, or None on a miss
+        """
+        try:
+            connection = self._connection()
+            now = time.time()
+            row = connection.execute(
+                f'SELECT version, value, created_at, last_used_at FROM {self.name} WHERE cache_key = ?', (key,)
+            ).fetchone()
+            if row is None or row[0] != version or row[2] + self.ttl < now:
+                if row is not None:
+                    with connection:
+                        connection.execute(f'DELETE FROM {self.name} WHERE cache_key = ?', (key,))
+                self._count('misses')
+                return None
+            if row[3] + self.touch_interval <= now:
+                with connection:
+                    connection.execute(f'UPDATE {self.name} SET last_used_at = ? WHERE cache_key = ?', (now, key))
+        except sqlite3.Error as e:
+            print(f"Error reading {self.name} cache: {str(e)}")
+            return None
+        self._count('hits')
+        return row[1]
+
+    def put_value(self, key, version, value):
+        """
+        Store a value, then evict stale and least recently used entries.
+
+        Args:
+            key (str): Key built by make_key
+            version (str): Corpus version the value was computed for
+            value (bytes): The value to cache
+        """
+        if len(value) > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            connection = self._connection()
+            with connection:
+                connection.execute(
+                    f'INSERT INTO {self.name} (cache_key, version, value, size, created_at, last_used_at) '
+                    f'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (cache_key) DO UPDATE SET version = excluded.version, '
+                    f'value = excluded.value, size = excluded.size, created_at = excluded.created_at, '
+                    f'last_used_at = excluded.last_used_at',
+                    (key, version, value, len(value), now, now)
+                )
+                # Two range scans of the (version, created_at) index
+                connection.execute(f'DELETE FROM {self.name} WHERE version < ? OR version > ?', (version, version))
+                connection.execute(
+                    f'DELETE FROM {self.name} WHERE version = ? AND created_at < ?', (version, now - self.ttl)
+                )
+                self._evict(connection)
+        except sqlite3.Error as e:
+            print(f"Error writing {self.name} cache: {str(e)}")
+
+    def _total_size(self, connection):
+        """Return the size of the cached values, kept by the triggers."""
+        row = connection.execute('SELECT value FROM cache_counters WHERE name = ?', (f'{self.name}.bytes',)).fetchone()
+        return row[0] if row is not None else 0
+
+    def _evict(self, connection):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        total_size = self._total_size(connection)
+        if total_size <= self.max_bytes:
+            return
+        freed = 0
+        evicted_keys = []
+        for cache_key, size in connection.execute(f'SELECT cache_key, size FROM {self.name} ORDER BY last_used_at'):
+            evicted_keys.append((cache_key,))
+            freed += size
+            if total_size - freed <= self.max_bytes:
+                break
+        connection.executemany(f'DELETE FROM {self.name} WHERE cache_key = ?', evicted_keys)
+        self._count('evictions', len(evicted_keys))
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        with self._counters_lock:
+            self._counters = {}
+        connection = self._connection()
+        with connection:
+            connection.execute(f'DELETE FROM {self.name}')
+            connection.execute('DELETE FROM cache_counters WHERE name LIKE ? AND name != ?',
+                               (f'{self.name}.%', f'{self.name}.bytes'))
+
+    def stats(self):
+        """
+        Return usage statistics aggregated over every worker.
+
+        The counters of the other workers are included up to their last write.
+
+        Returns:
+            dict: Entries, bytes used, size bound, hits, misses, evictions and hit rate
+        """
+        self.flush_counters()
+        connection = self._connection()
+        entries = connection.execute(f'SELECT count(*) FROM {self.name}').fetchone()[0]
+        counters = {
+            name.split('.', 1)[1]: value for name, value in connection.execute(
+                'SELECT name, value FROM cache_counters WHERE name LIKE ?', (f'{self.name}.%',)
+            )
+        }
+        hits, misses = counters.get('hits', 0), counters.get('misses', 0)
+        return {
+            'entries': entries,
+            'bytes': counters.get('bytes', 0),
+            'max_bytes': self.max_bytes,
+            'file_bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            'hits': hits,
+            'misses': misses,
+            'evictions': counters.get('evictions', 0),
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+
+class SearchResultCache(SharedCache):
+    """Cache of the ordered matching id list and total count of each normalized search query."""
+
+    def __init__(self, path, max_bytes=32 * 1024 * 1024, ttl=24 * 60 * 60):
+        super().__init__(path, 'search_results', max_bytes, ttl)
+
+    def get(self, key, version):
+        """
+        Look up a query in the cache.
+
+        Args:
+            key (str): Key built by make_key
+            version (str): Current corpus version
+
+        Returns:
+            tuple: (ids, total_count), or None on a miss
+        """
+        value = self.get_value(key, version)
+        if value is None:
+            return None
+        # The total count is stored in front of the packed ids
+        values = array('I')
+        values.frombytes(value)
+        return values[1:].tolist(), values[0]
+
+    def put(self, key, version, ids, total_count):
+        """
+        Store the results of a query.
+
+        Args:
+            key (str): Key built by make_key
+            version (str): Corpus version the results were computed for
+            ids (list): Ordered list of matching contribution ids
+            total_count (int): Number of matching contributions
+        """
+        values = array('I', [total_count])
+        values.extend(ids)
+        self.put_value(key, version, values.tobytes())
+
+
+class FragmentCache(SharedCache):
+    """Cache of rendered HTML fragments, each stored with the strong ETag of its content."""
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, ttl=24 * 60 * 60):
+        super().__init__(path, 'rendered_fragments', max_bytes, ttl)
+
+    @staticmethod
+    def compute_etag(html):
+        """Return the strong ETag of a rendered fragment."""
+        return hashlib.sha1(html.encode('utf-8')).hexdigest()
+
+    def get(self, key, version):
+        """
+        Look up a rendered fragment.
+
+        Args:
+            key (str): Key built by make_key
+            version (str): Current corpus version
+
+        Returns:
+            tuple: (etag, html), or None on a miss
+        """
+        value = self.get_value(key, version)
+        if value is None:
+            return None
+        etag, html = value.decode('utf-8').split('\n', 1)
+        return etag, html
+
+    def put(self, key, version, html):
+        """
+        Store a rendered fragment.
+
+        Args:
+            key (str): Key built by make_key
+            version (str): Corpus version the fragment was rendered for
+            html (str): The rendered fragment
+
+        Returns:
+            str: The ETag of the fragment
+        """
+        etag = self.compute_etag(html)
+        self.put_value(key, version, f'{etag}\n{html}'.encode('utf-8'))
+        return etag
+
+
+# Caches shared by every request and every worker
+search_result_cache = SearchResultCache(SEARCH_CACHE_PATH)
+fragment_cache = FragmentCache(SEARCH_CACHE_PATH)
@@ -0,0 +1,201 @@
+import re
+import unicodedata
+
+from sqlalchemy import Integer, text
+
+# Name of the FTS5 virtual table mirroring the contributions table
+FTS_TABLE = 'contributions_fts'
+
+# unicode61 with remove_diacritics 2 folds French accents ("velo" matches "vélo")
+FTS_TOKENIZER = 'unicode61 remove_diacritics 2'
+
+# Column of the contributions table combining every searchable field (see Contribution.search_columns)
+FTS_COLUMN = 'search_text'
+
+_token_pattern = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize_text(value):
+    """
+    Fold accents and case so that French text can be compared loosely.
+
+    Args:
+        value (str): The text to normalize
+
+    Returns:
+        str: Lowercased text without diacritics ("Vélo" -> "velo")
+    """
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokenize(value):
+    """
+    Split text into normalized word tokens, like the FTS5 unicode61 tokenizer does.
+
+    Args:
+        value (str): The text to tokenize
+
+    Returns:
+        list: List of lowercased, accent-folded tokens
+    """
+    return _token_pattern.findall(normalize_text(value))
+
+
+def normalize_keywords(keywords):
+    """
+    Normalize keywords the same way the search does.
+
+    Args:
+        keywords (list): List of keywords typed by the user
+
+    Returns:
+        tuple: Sorted tuple of token tuples, one per searchable keyword (hashable, used as cache key)
+    """
+    return tuple(sorted({tuple(tokens) for tokens in map(tokenize, keywords) if tokens}))
+
+
+def fts_schema_statements():
+    """
+    Return the statements creating the FTS5 table and the triggers keeping it in sync.
+
+    The table is an external-content index over contributions.search_text: the text is not
+    stored twice, and the triggers pass the old values FTS5 needs to delete entries.
+    All statements are idempotent so they can be replayed at every start-up.
+    """
+    insert_new = f"INSERT INTO {FTS_TABLE}(rowid, {FTS_COLUMN}) VALUES (new.id, new.{FTS_COLUMN});"
+    delete_old = (f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {FTS_COLUMN}) "
+                  f"VALUES ('delete', old.id, old.{FTS_COLUMN});")
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({FTS_COLUMN}, content='contributions', "
+        f"content_rowid='id', tokenize='{FTS_TOKENIZER}')",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON contributions BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON contributions BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON contributions BEGIN "
+        f"{delete_old} {insert_new} END",
+    ]
+
+
+def fts_available(connection):
+    """Check whether the SQLite library behind the connection was compiled with FTS5."""
+    options = connection.execute(text('PRAGMA compile_options')).scalars().all()
+    return 'ENABLE_FTS5' in options
+
+
+def fts_index_exists(connection):
+    """Check whether the FTS5 table has been created in the database."""
+    return connection.execute(
+        text("SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE}
+    ).scalar() > 0
+
+
+def drop_outdated_fts_index(connection):
+    """
+    Drop the FTS5 table and its triggers if they were created with another layout.
+
+    Databases indexed before the search_text column existed used a standalone four-column table.
+
+    Returns:
+        bool: True if an outdated index was dropped
+    """
+    if not fts_index_exists(connection):
+        return False
+    columns = [row[1] for row in connection.execute(text(f'PRAGMA table_info({FTS_TABLE})'))]
+    if columns == [FTS_COLUMN]:
+        return False
+    for suffix in ('ai', 'ad', 'au'):
+        connection.execute(text(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}'))
+    connection.execute(text(f'DROP TABLE {FTS_TABLE}'))
+    return True
+
+
+def create_fts_index(connection):
+    """
+    Create the FTS5 table and its triggers, then rebuild it if it is out of sync.
+
+    Args:
+        connection: SQLAlchemy connection or session bound to the SQLite database
+
+    Returns:
+        bool: True if the index is usable, False if FTS5 is not available
+    """
+    if not fts_available(connection):
+        return False
+
+    drop_outdated_fts_index(connection)
+    for statement in fts_schema_statements():
+        connection.execute(text(statement))
+
+    # count(*) on an external-content table reads the content table, the docsize shadow table
+    # holds one row per indexed contribution
+    indexed_count = connection.execute(text(f'SELECT count(*) FROM {FTS_TABLE}_docsize')).scalar()
+    contributions_count = connection.execute(text('SELECT count(*) FROM contributions')).scalar()
+    if indexed_count != contributions_count:
+        rebuild_fts_index(connection)
+    return True
+
+
+def rebuild_fts_index(connection):
+    """Re-index every contribution in the FTS5 table."""
+    connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def build_fts_match_query(keywords):
+    """
+    Build an FTS5 MATCH expression requiring every keyword.
+
+    The rule is the one of ContributionIndex.search: every token of every keyword is required,
+    anywhere in the contribution, and the last token of a keyword may be a prefix. So "12/04"
+    matches "12" and a word starting with "04" (not only the adjacent date tokens "12 04...") and
+    "velo" matches "vélos". Keywords without any word character cannot be indexed and are ignored.
+
+    Args:
+        keywords (list): List of keywords typed by the user
+
+    Returns:
+        str: The MATCH expression, or an empty string if no keyword is searchable
+    """
+    terms = []
+    for tokens in map(tokenize, keywords):
+        # Tokens only hold word characters, quoting them keeps FTS5 keywords (AND, NEAR...) literal
+        terms.extend(f'"{token}"' for token in tokens[:-1])
+        if tokens:
+            terms.append(f'"{tokens[-1]}"*')
+    return ' AND '.join(terms)
+
+
+# Escape character of the LIKE patterns built by build_like_pattern
+LIKE_ESCAPE = '\\'
+
+
+def build_like_pattern(keyword):
+    """
+    Build a LIKE pattern matching search_text values that contain a keyword.
+
+    The keyword is normalized like search_text, and the LIKE wildcards it contains are escaped
+    with LIKE_ESCAPE, so that "100%" or "a_b" match literally.
+
+    Args:
+        keyword (str): A keyword typed by the user
+
+    Returns:
+        str: The pattern, to be used with escape=LIKE_ESCAPE
+    """
+    escaped = re.sub(r'([%_\\])', r'\\\1', normalize_text(keyword))
+    return f'%{escaped}%'
+
+
+def fts_matching_ids(match_query):
+    """
+    Return a selectable yielding the ids of the contributions matching an FTS5 expression.
+
+    Args:
+        match_query (str): Expression built by build_fts_match_query
+
+    Returns:
+        TextualSelect: A subquery usable in Contribution.id.in_()
+    """
+    return text(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match_query'
+    ).bindparams(match_query=match_query).columns(rowid=Integer)
@@ -0,0 +1,197 @@
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from app.search import normalize_keywords, tokenize
+
+# BM25 parameters (usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Highest code point, used to compute the upper bound of a prefix range in the sorted term list
+_MAX_CHAR = '\U0010ffff'
+
+
+class ContributionIndex:
+    """
+    In-memory inverted index over the contributions corpus.
+
+    The corpus is read-only between imports, so the index is built once at start-up and then only
+    read; after an import by another process, each worker builds the index of the new corpus
+    version in the background (see view). Posting lists are concatenated in a few flat arrays (instead of one Python object per posting)
+    so that the index stays compact and its pages stay shared between forked gunicorn workers.
+    """
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self.terms = []  # Sorted term dictionary
+        self.posting_offsets = array('I', [0])  # Postings of terms[i] are in [offsets[i], offsets[i + 1])
+        self.posting_ids = array('I')  # Contribution ids, sorted within each posting list
+        self.posting_frequencies = array('I')  # Term frequency for each posting
+        self.doc_ids = array('I')  # Sorted ids of every indexed contribution
+        self.doc_lengths = array('I')  # Number of tokens of each contribution, parallel to doc_ids
+        self.average_doc_length = 0.0
+        self.version = None  # Corpus version the index was built from
+        self.ready = False
+        self._rebuilt = None  # Index of a newer corpus version, built by view
+        self._rebuilding = False
+        self._rebuild_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def build(self, documents, version=None):
+        """
+        Build the index from (id, text) pairs.
+
+        Args:
+            documents (iterable): Iterable of (contribution_id, searchable_text) tuples
+            version (str): Corpus version of the documents
+        """
+        postings = defaultdict(list)
+        doc_lengths = {}
+        for doc_id, searchable_text in documents:
+            tokens = tokenize(searchable_text)
+            doc_lengths[doc_id] = len(tokens)
+            for term, frequency in Counter(tokens).items():
+                postings[term].append((doc_id, frequency))
+
+        terms = sorted(postings)
+        posting_offsets = array('I', [0])
+        posting_ids = array('I')
+        posting_frequencies = array('I')
+        for term in terms:
+            term_postings = sorted(postings[term])
+            posting_ids.extend(doc_id for doc_id, _ in term_postings)
+            posting_frequencies.extend(frequency for _, frequency in term_postings)
+            posting_offsets.append(len(posting_ids))
+
+        doc_ids = sorted(doc_lengths)
+        self.terms = terms
+        self.posting_offsets = posting_offsets
+        self.posting_ids = posting_ids
+        self.posting_frequencies = posting_frequencies
+        self.doc_ids = array('I', doc_ids)
+        self.doc_lengths = array('I', (doc_lengths[doc_id] for doc_id in doc_ids))
+        self.average_doc_length = sum(self.doc_lengths) / len(doc_ids) if doc_ids else 0.0
+        self.version = version
+        self.ready = True
+
+    def _term_range(self, token, prefix):
+        """Return the range of term indexes equal to (or starting with, if prefix) the token."""
+        start = bisect_left(self.terms, token)
+        if prefix:
+            return range(start, bisect_left(self.terms, token + _MAX_CHAR, start))
+        if start < len(self.terms) and self.terms[start] == token:
+            return range(start, start + 1)
+        return range(0)
+
+    def _idf(self, document_frequency):
+        """BM25 inverse document frequency of a term."""
+        doc_count = len(self.doc_ids)
+        return math.log(1 + (doc_count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def _doc_length(self, doc_id):
+        return self.doc_lengths[bisect_left(self.doc_ids, doc_id)]
+
+    def _match_keyword(self, tokens, scores):
+        """
+        Return the set of ids matching the tokens of one keyword, accumulating BM25 scores if requested.
+
+        Every token of the keyword must be present and the last one may be a prefix (e.g. "12/04"
+        requires "12" and a term starting with "04"), the rule of the FTS5 query (see
+        app.search.build_fts_match_query).
+        """
+        keyword_ids = None
+        for position, token in enumerate(tokens):
+            token_ids = set()
+            for term_index in self._term_range(token, prefix=position == len(tokens) - 1):
+                start, end = self.posting_offsets[term_index], self.posting_offsets[term_index + 1]
+                ids = self.posting_ids[start:end]
+                token_ids.update(ids)
+                if scores is not None:
+                    idf = self._idf(end - start)
+                    for doc_id, frequency in zip(ids, self.posting_frequencies[start:end]):
+                        length_ratio = self._doc_length(doc_id) / self.average_doc_length
+                        scores[doc_id] += idf * frequency * (BM25_K1 + 1) / (
+                            frequency + BM25_K1 * (1 - BM25_B + BM25_B * length_ratio))
+            keyword_ids = token_ids if keyword_ids is None else keyword_ids & token_ids
+        return keyword_ids
+
+    def search(self, keywords, order='id'):
+        """
+        Return the ids of the contributions containing every keyword.
+
+        Args:
+            keywords (list): List of keywords typed by the user
+            order (str): 'id' for contribution number order, 'relevance' for BM25 order
+
+        Returns:
+            list: Ordered list of matching contribution ids
+        """
+        scores = defaultdict(float) if order == 'relevance' else None
+        matches = None
+        # Keywords without any word character are ignored, as by the FTS5 search
+        for tokens in normalize_keywords(keywords):
+            keyword_ids = self._match_keyword(tokens, scores)
+            matches = keyword_ids if matches is None else matches & keyword_ids
+            if not matches:
+                return []
+
+        if matches is None:
+            return list(self.doc_ids)
+        if scores is not None:
+            return sorted(matches, key=lambda doc_id: (-scores[doc_id], doc_id))
+        return sorted(matches)
+
+    def view(self, version, load_documents=None):
+        """
+        Return the index of a corpus version.
+
+        When this index was built for another version, the index of the requested version is
+        built in a background thread with load_documents, and swapped in as a whole once it is
+        complete, so that concurrent searches never see a half-built index. Callers fall back to
+        SQL until then.
+
+        Args:
+            version (str): The current corpus version
+            load_documents (callable): Function returning the corpus version and the
+                (contribution_id, searchable_text) tuples of every contribution, None to not rebuild
+
+        Returns:
+            ContributionIndex: This index or the rebuilt one, None if there is none for this version
+        """
+        if self.ready and self.version == version:
+            return self
+        rebuilt = self._rebuilt
+        if rebuilt is not None and rebuilt.version == version:
+            return rebuilt
+        if load_documents is not None:
+            with self._rebuild_lock:
+                if self._rebuilding:
+                    return None
+                self._rebuilding = True
+            threading.Thread(target=self._rebuild, args=(load_documents,), name='search-index-rebuild',
+                             daemon=True).start()
+        return None
+
+    def _rebuild(self, load_documents):
+        try:
+            started_at = time.monotonic()
+            version, documents = load_documents()
+            index = ContributionIndex()
+            index.build(documents, version=version)
+            self._rebuilt = index
+            print(f"Search index rebuilt for corpus version {version} ({len(index)} contributions) "
+                  f"in {time.monotonic() - started_at:.1f} s.")
+        except Exception as e:
+            print(f"Error rebuilding the search index: {str(e)}")
+        finally:
+            self._rebuilding = False
+
+
+# Index shared by every request of the process (and by forked workers when the app is preloaded)
+contribution_index = ContributionIndex()
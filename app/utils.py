@@ -1,19 +1,53 @@
 import os
-import base64
+import hashlib
+import hmac
 import io
-from captcha.image import ImageCaptcha
+import secrets
 from flask import session
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from app import app, db_path
+from app.captcha_pool import CaptchaPool, CaptchaReplaySet
+
+# Tokens already submitted, next to the application database
+CAPTCHA_REPLAY_PATH = db_path.parent / "captchas.db"
+
+
+def _captcha_serializer():
+    return URLSafeTimedSerializer(app.config["SECRET_KEY"], salt="captcha")
+
+
+def _captcha_digest(nonce, captcha_text):
+    """Keyed hash of a captcha answer, so that the token never reveals the answer."""
+    message = f"{nonce}:{captcha_text.strip().upper()}".encode('utf-8')
+    return hmac.new(app.config["SECRET_KEY"].encode('utf-8'), message, hashlib.sha256).hexdigest()
+
+
+def create_captcha_token(captcha_text):
+    """
+    Create the signed token sent with a captcha instead of its plaintext answer.
+
+    Args:
+        captcha_text (str): The captcha answer
+
+    Returns:
+        str: URL-safe token, valid for CAPTCHA_MAX_AGE seconds
+    """
+    nonce = secrets.token_urlsafe(12)
+    return _captcha_serializer().dumps({'nonce': nonce, 'digest': _captcha_digest(nonce, captcha_text)})
 
-from app import app
 
 def generate_captcha():
     """
-    Generate a captcha image and text.
+    Generate a captcha image and its signed token.
+
+    Requests should take their captcha from captcha_pool, which calls this function in the background.
 
     Returns:
-        tuple: (captcha_text, captcha_image_base64)
+        tuple: (captcha_token, captcha_image_png)
     """
-    # Create a captcha image generator
+    # Create a captcha image generator, imported on first use (it loads PIL and the fonts)
+    from captcha.image import ImageCaptcha
     image = ImageCaptcha(width=280, height=90)
 
     # Generate a random captcha text
@@ -24,21 +58,36 @@ def generate_captcha():
     # Generate the captcha image
     captcha_image = image.generate(captcha_text)
 
-    # Convert the image to base64 for embedding in HTML
     captcha_image.seek(0)
-    captcha_image_base64 = base64.b64encode(captcha_image.read()).decode('utf-8')
+    return create_captcha_token(captcha_text), captcha_image.read()
 
-    return captcha_text, captcha_image_base64
 
-def validate_captcha(user_input, captcha_text):
+def validate_captcha(user_input, captcha_token):
     """
-    Validate the user's captcha input against the generated captcha text.
+    Validate the user's captcha input against the token sent with the captcha.
+
+    A token can only be submitted once: it is consumed even when the input is wrong.
 
     Args:
         user_input (str): The user's input
-        captcha_text (str): The generated captcha text
+        captcha_token (str): The token returned by generate_captcha
 
     Returns:
-        bool: True if the input matches the captcha text, False otherwise
+        bool: True if the token is authentic, not expired, not used yet and matches the input, False otherwise
     """
-    return user_input and user_input.upper() == captcha_text
+    if not user_input or not captcha_token:
+        return False
+    max_age = app.config["CAPTCHA_MAX_AGE"]
+    try:
+        payload, signed_at = _captcha_serializer().loads(captcha_token, max_age=max_age, return_timestamp=True)
+        nonce, digest = payload['nonce'], payload['digest']
+    except (BadSignature, KeyError, TypeError):
+        return False
+    if not captcha_replay_set.claim(nonce, signed_at.timestamp() + max_age):
+        return False
+    return hmac.compare_digest(digest, _captcha_digest(nonce, user_input))
+
+
+# Captchas shared by every request of the worker, and tokens shared by every worker
+captcha_replay_set = CaptchaReplaySet(CAPTCHA_REPLAY_PATH)
+captcha_pool = CaptchaPool(generate_captcha, max_age=app.config["CAPTCHA_MAX_AGE"] / 2)
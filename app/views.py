@@ -1,115 +1,280 @@
+import base64
 import json
-import re
-from pathlib import Path
+from bisect import bisect_right
+from datetime import datetime
 
-from flask import render_template, request, jsonify, redirect, send_from_directory
+from flask import render_template, request, jsonify, redirect, make_response, Response, stream_with_context
 from markupsafe import Markup
-from mistralai import Mistral
-from sqlalchemy import or_
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import selectinload
 
 from app import app, db
+from app.corpus_snapshot import corpus_snapshot
+from app.database import get_corpus_version, read_search_documents
+from app.discussion_events import (BUSY_RETRY_DELAY_MS, latest_event_id, max_streams, publish_event, stream_events,
+                                   stream_slots)
+from app.downloads import download_manifest, send_download
+from app.exports import EXPORT_FILE_NAMES, EXPORT_RETRY_AFTER, get_export
+from app.highlight import highlight_contributions
+from app.log_writer import log_writer
 from app.models import Contribution, Comment, Answer, SearchLog, AnalyseChat, DownloadLog
-from app.utils import generate_captcha, validate_captcha
+from app.near_duplicates import near_duplicate_index
+from app.pagination import cursor_int, decode_cursor, encode_cursor
+from app.result_cache import fragment_cache, search_result_cache
+from app.search import LIKE_ESCAPE, build_fts_match_query, build_like_pattern, fts_matching_ids
+from app.search_index import contribution_index
+from app.utils import captcha_pool, validate_captcha
 
 
-def highlight_keywords(text, keywords):
+@app.route('/')
+def index():
+    """Home page route."""
+    return redirect('/contributions')
+
+
+def get_contributions_by_ids(ids, corpus_version=None):
     """
-    Highlight keywords in text by wrapping them in span tags with a highlight class.
+    Load contributions by id, keeping the order of the given ids.
+
+    Contributions are read from the memory-mapped corpus snapshot when it is the one of the
+    corpus version, from the database otherwise.
 
     Args:
-        text (str): The text to search in
-        keywords (list): List of keywords to highlight
+        ids (list): Ordered list of contribution ids
+        corpus_version (str): Current corpus version, None to read the database
 
     Returns:
-        Markup: HTML-safe string with highlighted keywords
+        list: List of Contribution (or SnapshotContribution) objects in the same order as ids
     """
-    if not keywords or not text:
-        return Markup(text)
+    if not ids:
+        return []
+    snapshot = corpus_snapshot.view(corpus_version) if corpus_version is not None else None
+    if snapshot is not None:
+        return snapshot.get(ids)
+    contribs_by_id = {contrib.id: contrib for contrib in Contribution.query.filter(Contribution.id.in_(ids))}
+    return [contribs_by_id[contrib_id] for contrib_id in ids if contrib_id in contribs_by_id]
 
-    # Convert text to string if it's not already
-    text = str(text)
 
-    # Create a copy of the text for highlighting
-    highlighted_text = text
+def filter_contributions_query(query, keywords):
+    """
+    Restrict a Contribution query to the contributions containing every keyword.
 
-    # Sort keywords by length (longest first) to avoid partial matches
-    sorted_keywords = sorted(keywords, key=len, reverse=True)
+    Args:
+        query (Query): The query to filter
+        keywords (list): List of keywords typed by the user
 
-    for keyword in sorted_keywords:
-        # Use regex for case-insensitive matching
-        pattern = re.compile(re.escape(keyword), re.IGNORECASE)
-        # Replace with the same text wrapped in a highlight span
-        highlighted_text = pattern.sub(lambda m: f'<span class="keyword-highlight">{m.group(0)}</span>',
-                                       highlighted_text)
+    Returns:
+        Query: The filtered query
+    """
+    if keywords and app.config.get('SEARCH_FTS_ENABLED'):
+        # Use the FTS5 index: one indexed lookup for all keywords instead of a table scan per keyword
+        match_query = build_fts_match_query(keywords)
+        if match_query:
+            query = query.filter(Contribution.id.in_(fts_matching_ids(match_query)))
+        return query
 
-    return Markup(highlighted_text)
+    for keyword in keywords:
+        # search_text already combines every searchable field, lowercased and accent-folded
+        query = query.filter(Contribution.search_text.like(build_like_pattern(keyword), escape=LIKE_ESCAPE))
+    return query
 
 
-@app.route('/')
-def index():
-    """Home page route."""
-    return redirect('/contributions')
+def load_search_documents():
+    """Read the documents of the in-memory search index, from a background thread."""
+    with app.app_context():
+        return read_search_documents()
+
+
+def current_search_index(corpus_version):
+    """
+    Return the in-memory search index of the current corpus.
+
+    After an import by another process, the index of the new corpus version is rebuilt in the
+    background, and searches fall back to SQL until it is ready.
+
+    Args:
+        corpus_version (str): Current corpus version
+
+    Returns:
+        ContributionIndex: The index, None if it is not built for this version yet
+    """
+    return contribution_index.view(corpus_version, load_search_documents)
+
+
+def search_contribution_ids(keywords, order, corpus_version):
+    """
+    Return the ordered ids of the contributions containing every keyword.
 
+    Results are read from the cross-worker result cache, or computed with the in-memory index
+    (or SQL when the index is not built for the current corpus version) and then cached.
 
-def get_contributions_data(search_query='', page=1):
+    Args:
+        keywords (list): List of keywords typed by the user
+        order (str): 'id' or 'relevance'
+        corpus_version (str): Current corpus version, entries of other versions are ignored
+
+    Returns:
+        list: Ordered list of matching contribution ids
+    """
+    index = current_search_index(corpus_version)
+    if index is None:
+        # Relevance order needs the index
+        order = 'id'
+
+    # Keyed on the keywords as typed (not their tokens, as LIKE matches "100%" and "100" differently)
+    # and on the engine, whose matching rules are not exactly the same
+    if index is not None:
+        engine = 'index'
+    else:
+        engine = 'fts' if app.config.get('SEARCH_FTS_ENABLED') else 'like'
+    cache_key = search_result_cache.make_key(sorted({keyword.lower() for keyword in keywords}), order, engine)
+    cached = search_result_cache.get(cache_key, corpus_version)
+    if cached is not None:
+        return cached[0]
+
+    if index is not None:
+        matching_ids = index.search(keywords, order)
+    else:
+        query = filter_contributions_query(db.session.query(Contribution.id), keywords)
+        matching_ids = [contrib_id for contrib_id, in query.order_by(Contribution.id)]
+
+    search_result_cache.put(cache_key, corpus_version, matching_ids, len(matching_ids))
+    return matching_ids
+
+
+def get_contributions_data(search_query='', cursor=None, order='id', collapse=False):
     """
     Helper function to fetch and process contributions data.
     Used by both the contributions and get-contributions routes.
 
+    Pages are read with keyset pagination: the cursor records the last contribution id shown
+    (or the position in the ranked list when sorting by relevance) and the total count, which is
+    only computed for the first page of a query.
+
     Args:
         search_query (str): The search query to filter contributions
-        page (int): The page number for pagination
+        cursor (str): Opaque cursor returned with the previous page, None for the first page
+        order (str): 'id' to sort by contribution number, 'relevance' to sort by BM25 score
+            (relevance needs the in-memory index, otherwise results are sorted by number)
+        collapse (bool): Show only one contribution per cluster of near-duplicates
 
     Returns:
-        tuple: (highlighted_contribs, page, has_more, search_query, keywords, total_count)
+        tuple: (highlighted_contribs, next_cursor, search_query, keywords, total_count)
     """
     per_page = 30
-    offset = (page - 1) * per_page if page > 1 or not search_query else 0
-
-    # Create a query that searches for contributions containing all keywords
-    query = Contribution.query
-
-    if search_query:
-        # Split the search query into keywords
-        keywords = search_query.split()
-
-        for keyword in keywords:
-            search_fields = [
-                Contribution.formatted_time.ilike(f'%{keyword}%'),
-                Contribution.body.ilike(f'%{keyword}%'),
-                # Convert ID to string for searching
-                Contribution.id.cast(db.String).ilike(f'%{keyword}%'),
-                Contribution.anonymized_contributor.ilike(f'%{keyword}%')
-            ]
-
-            query = query.filter(or_(*search_fields))
-
-        # Get the total count of matching contributions
-        total_count = query.count()
-
-        # Get results with pagination
-        contribs = query.order_by(Contribution.id).offset(offset).limit(per_page).all()
-
-        # Create highlighted versions of the contribution fields
-        highlighted_contribs = []
-        for contrib in contribs:
-            highlighted_contribs.append({
-                'id': highlight_keywords(contrib.id, keywords),
-                'anonymized_contributor': highlight_keywords(contrib.anonymized_contributor, keywords),
-                'body': highlight_keywords(contrib.body, keywords),
-                'formatted_time': highlight_keywords(contrib.formatted_time, keywords)
-            })
-
-        # Check if there are more results
-        has_more = len(contribs) == per_page and total_count > offset + per_page
+    keywords = search_query.split()
+    cursor_values = decode_cursor(cursor)
+    after_id = cursor_int(cursor_values, 'after')
+    total_count = cursor_int(cursor_values, 'total')
+    corpus_version = get_corpus_version()
+
+    index = current_search_index(corpus_version)
+    if keywords or collapse or index is not None:
+        # Page through the ordered list of matching ids (the whole corpus for an empty query)
+        if keywords or index is None:
+            matching_ids = search_contribution_ids(keywords, order, corpus_version)
+        else:
+            matching_ids = index.search([], order)
+        near_duplicates = near_duplicate_index.view(corpus_version) if collapse else None
+        if near_duplicates is not None:
+            matching_ids = near_duplicates.collapse(matching_ids)
+        total_count = len(matching_ids)
+        if order == 'relevance':
+            start = cursor_int(cursor_values, 'position') or 0
+        else:
+            start = bisect_right(matching_ids, after_id) if after_id is not None else 0
+        page_ids = matching_ids[start:start + per_page]
+        contribs = get_contributions_by_ids(page_ids, corpus_version)
+        has_more = start + len(page_ids) < len(matching_ids)
+        next_values = {'position': start + len(page_ids)} if order == 'relevance' else {}
+    elif (snapshot := corpus_snapshot.view(corpus_version)) is not None:
+        # Browse the snapshot when the in-memory index is not available
+        total_count = len(snapshot)
+        contribs = snapshot.page(after_id, per_page + 1)
+        has_more = len(contribs) > per_page
+        contribs = contribs[:per_page]
+        next_values = {}
     else:
+        # Browse the whole table when neither the in-memory index nor the snapshot is available
+        query = Contribution.query
+
+        # Count the contributions once, later pages carry it in the cursor
+        if total_count is None:
+            total_count = query.count()
+
+        # Seek past the last contribution shown instead of using an offset
+        if after_id is not None:
+            query = query.filter(Contribution.id > after_id)
+        contribs = query.order_by(Contribution.id).limit(per_page + 1).all()
+        has_more = len(contribs) > per_page
+        contribs = contribs[:per_page]
+        next_values = {}
+
+    next_cursor = None
+    if has_more and contribs:
+        next_values.update({'after': contribs[-1].id, 'total': total_count})
+        next_cursor = encode_cursor(next_values)
+
+    if not keywords:
         # If no search query, return all contributions without highlighting
-        total_count = query.count()
-        highlighted_contribs = query.order_by(Contribution.id).offset(offset).limit(per_page).all()
-        has_more = len(highlighted_contribs) == per_page and total_count > offset + per_page
-        keywords = []
+        return contribs, next_cursor, search_query, [], total_count
+
+    # Create highlighted versions of the contribution fields
+    highlighted_contribs = highlight_contributions(contribs, keywords)
 
-    return highlighted_contribs, page, has_more, search_query, keywords if search_query else [], total_count
+    return highlighted_contribs, next_cursor, search_query, keywords, total_count
+
+
+def render_contributions_response(template_name, search_query, cursor, order, collapse=False):
+    """
+    Render a contributions template through the shared fragment cache.
+
+    The rendered HTML only depends on the query, the cursor, the order, the collapse option,
+    the corpus version and the near-duplicate clusters,
+    so it is cached under these and served with a strong ETag: GET requests repeating a known
+    ETag get a 304, and the Cache-Control header lets a reverse proxy absorb repeated traffic.
+
+    Args:
+        template_name (str): 'contributions.html' or 'contributions_content.html'
+        search_query (str): The search query to filter contributions
+        cursor (str): Opaque cursor of the requested page
+        order (str): 'id' or 'relevance'
+        collapse (bool): Show only one contribution per cluster of near-duplicates
+
+    Returns:
+        Response: The (possibly 304) response
+    """
+    search_query = ' '.join(search_query.split())
+    corpus_version = get_corpus_version()
+    # Clusters are only shown once the near-duplicate index was built for the current corpus
+    near_duplicates = near_duplicate_index.view(corpus_version)
+    cache_key = fragment_cache.make_key(template_name, search_query, cursor or '', order, collapse,
+                                        near_duplicates is not None)
+
+    cached = fragment_cache.get(cache_key, corpus_version)
+    if cached is not None:
+        etag, html = cached
+    else:
+        highlighted_contribs, next_cursor, search_query, keywords, total_count = get_contributions_data(search_query,
+                                                                                                        cursor, order,
+                                                                                                        collapse)
+        html = render_template(template_name,
+                               contributions=highlighted_contribs,
+                               next_cursor=next_cursor,
+                               search_query=search_query,
+                               order=order,
+                               collapse=collapse,
+                               near_duplicates=near_duplicates,
+                               keywords=keywords,
+                               total_count=total_count)
+        etag = fragment_cache.put(cache_key, corpus_version, html)
+
+    response = make_response(html)
+    response.set_etag(etag)
+    if request.method == 'GET':
+        response.headers['Cache-Control'] = f"public, max-age={app.config['CONTRIBUTIONS_CACHE_MAX_AGE']}"
+        return response.make_conditional(request)
+    return response
 
 
 @app.route('/contributions', methods=['GET'])
@@ -118,19 +283,12 @@ def contributions():
     Route for the initial page load of contributions.
     - GET to /contributions: Initial page load with full HTML template
     """
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     search_query = request.args.get('search', '')
+    order = request.args.get('order', 'id')
+    collapse = request.args.get('collapse') == '1'
 
-    highlighted_contribs, page, has_more, search_query, keywords, total_count = get_contributions_data(search_query,
-                                                                                                       page)
-
-    return render_template('contributions.html',
-                           contributions=highlighted_contribs,
-                           page=page,
-                           has_more=has_more,
-                           search_query=search_query,
-                           keywords=keywords,
-                           total_count=total_count)
+    return render_contributions_response('contributions.html', search_query, cursor, order, collapse)
 
 
 @app.route('/get-contributions', methods=['GET', 'POST'])
@@ -139,10 +297,14 @@ def get_contributions():
     Route for dynamic content updates.
     - POST to /get-contributions: Search with form data
     - GET to /get-contributions: Load more results with pagination
+    Both are served from the fragment cache, POST searches are still logged.
     """
     # Get search query from appropriate source based on request type
     search_query = request.form.get('search', request.args.get('search', ''))
-    page = request.args.get('page', 1, type=int)
+    # Searches (POST) always start from the first page
+    cursor = request.args.get('cursor') if request.method == 'GET' else None
+    order = request.form.get('order', request.args.get('order', 'id'))
+    collapse = request.form.get('collapse', request.args.get('collapse')) == '1'
 
     # Log search queries when using POST method with a search query
     if request.method == 'POST' and search_query:
@@ -151,83 +313,122 @@ def get_contributions():
         # Get the user agent
         user_agent = request.headers.get('User-Agent', '')
 
-        # Create a new search log entry
-        search_log = SearchLog(
-            search_content=search_query,
-            ip_address=ip_address,
-            user_agent=user_agent
-        )
+        # Queue the search log entry, it is written in a batch by the background logger
+        log_writer.log(SearchLog, search_content=search_query, ip_address=ip_address, user_agent=user_agent)
 
-        # Save the log to the database
-        try:
-            db.session.add(search_log)
-            db.session.commit()
-        except Exception as e:
-            # Log the error but continue with the request
-            print(f"Error logging search query: {str(e)}")
-            db.session.rollback()
+    return render_contributions_response('contributions_content.html', search_query, cursor, order, collapse)
+
+
+@app.route('/contributions/<int:contribution_id>/similar', methods=['GET'])
+def similar_contributions(contribution_id):
+    """
+    Partial listing the near-duplicates of a contribution, loaded on demand from the feed.
+
+    Args:
+        contribution_id (int): The contribution number
+    """
+    corpus_version = get_corpus_version()
+    near_duplicates = near_duplicate_index.view(corpus_version)
+    similar = near_duplicates.similar(contribution_id) if near_duplicates is not None else []
+    similarities = dict(similar)
+    contribs = get_contributions_by_ids([similar_id for similar_id, _ in similar], corpus_version)
+    return render_template('similar_contributions.html',
+                           contribution_id=contribution_id,
+                           similar_contributions=[(contrib, similarities[contrib.id]) for contrib in contribs])
+
+
+@app.route('/captcha', methods=['GET'])
+def captcha():
+    """
+    Partial with a fresh captcha image and its signed token.
 
-    highlighted_contribs, page, has_more, search_query, keywords, total_count = get_contributions_data(search_query,
-                                                                                                       page)
+    Comment and answer forms load it only when the user starts writing, so that
+    rendering the discussion page does not generate any image.
+    """
+    # Pre-rendered by the captcha pool, so that bursts of visitors do not wait for image rendering
+    captcha_token, captcha_image = captcha_pool.take()
+    response = make_response(render_template('captcha_partial.html',
+                                              captcha_token=captcha_token,
+                                              captcha_image=base64.b64encode(captcha_image).decode('utf-8')))
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
-    return render_template('contributions_content.html',
-                           contributions=highlighted_contribs,
-                           page=page,
-                           has_more=has_more,
-                           search_query=search_query,
-                           keywords=keywords,
-                           total_count=total_count)
+
+def get_comments_page(cursor=None, per_page=20):
+    """
+    Load a page of comments, newest first, with all their answers.
+
+    The page is read with keyset pagination on (created_at, id), and the answers of the whole
+    page are loaded by a single selectin query, so a page costs two queries whatever the size
+    of the discussion.
+
+    Args:
+        cursor (str): Opaque cursor returned with the previous page, None for the first page
+        per_page (int): Number of comments per page
+
+    Returns:
+        tuple: (comments, next_cursor) where next_cursor is None on the last page
+    """
+    query = Comment.query.options(selectinload(Comment.answers)).order_by(Comment.created_at.desc(),
+                                                                          Comment.id.desc())
+
+    # Seek past the last comment shown instead of using an offset
+    cursor_values = decode_cursor(cursor)
+    before_id = cursor_int(cursor_values, 'id')
+    try:
+        before = datetime.fromisoformat(cursor_values.get('before', ''))
+    except (TypeError, ValueError):
+        before = None
+    if before is not None and before_id is not None:
+        query = query.filter(or_(Comment.created_at < before,
+                                 and_(Comment.created_at == before, Comment.id < before_id)))
+
+    comments = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(comments) > per_page:
+        comments = comments[:per_page]
+        next_cursor = encode_cursor({'before': comments[-1].created_at.isoformat(), 'id': comments[-1].id})
+    return comments, next_cursor
 
 
 @app.route('/discussion', methods=['GET', 'POST'])
 def discussion():
-    """Discussion page with comments."""
+    """
+    Discussion page with comments.
+    - GET to /discussion: Page with the first comments
+    - GET to /discussion?format=json: Every comment as JSON, or a page of them with limit and/or cursor
+    - GET to /discussion?cursor=...: Next page of comments, loaded with HTMX
+    - POST to /discussion: Comment submission
+    """
     is_htmx = request.headers.get('HX-Request') == 'true'
 
-    def get_db_comments():
-        return Comment.query.order_by(Comment.created_at.desc()).all()
+    def render_first_page(**messages):
+        comments, next_cursor = get_comments_page()
+        return render_template('discussion.html', comments=comments, next_cursor=next_cursor, is_htmx=is_htmx,
+                               last_event_id=latest_event_id(), **messages)
 
-    def generate_captcha_for_comment_answers():
-        # Generate captchas for each answer form
-        answer_captcha_texts = {}
-        answer_captcha_images = {}
-        for comment in get_db_comments():  # Get all comments ordered by creation date (newest first)
-            answer_captcha_text, answer_captcha_image = generate_captcha()
-            answer_captcha_texts[comment.id] = answer_captcha_text
-            answer_captcha_images[comment.id] = answer_captcha_image
-        return answer_captcha_texts, answer_captcha_images
+    def render_submission(new_comment_html=None, **messages):
+        # HTMX submissions only get the form back, the new comment is inserted out-of-band
+        # (other readers receive it from the discussion event stream)
+        if is_htmx:
+            return render_template('comment_form.html', new_comment_html=new_comment_html, **messages)
+        return render_first_page(**messages)
 
     if request.method == 'POST':
         # Handle form submission for creating a new comment
         username = request.form.get('username')
         body = request.form.get('body')
         captcha_input = request.form.get('captcha')
-        captcha_text = request.form.get('captcha_text')
+        captcha_token = request.form.get('captcha_token')
         ip_address = request.remote_addr
         user_agent = request.headers.get('User-Agent', '')
 
-        # Generate a new captcha for the form
-        new_captcha_text, new_captcha_image = generate_captcha()
-        answer_captcha_texts, answer_captcha_images = generate_captcha_for_comment_answers()
-
         if not username or not body:
-            return render_template('discussion.html', comments=get_db_comments(),
-                                   error="Username and comment are required",
-                                   captcha_text=new_captcha_text,
-                                   captcha_image=new_captcha_image,
-                                   answer_captcha_texts=answer_captcha_texts,
-                                   answer_captcha_images=answer_captcha_images,
-                                   is_htmx=is_htmx)
+            return render_submission(error="Username and comment are required")
 
         # Validate the captcha
-        if not validate_captcha(captcha_input, captcha_text):
-            return render_template('discussion.html', comments=get_db_comments(),
-                                   error="Invalid captcha. Please try again.",
-                                   captcha_text=new_captcha_text,
-                                   captcha_image=new_captcha_image,
-                                   answer_captcha_texts=answer_captcha_texts,
-                                   answer_captcha_images=answer_captcha_images,
-                                   is_htmx=is_htmx)
+        if not validate_captcha(captcha_input, captcha_token):
+            return render_submission(error="Invalid captcha. Please try again.")
 
         # Create a new comment
         new_comment = Comment(
@@ -238,47 +439,81 @@ def discussion():
         )
 
         try:
-            # Add the comment to the database
+            # Add the comment to the database, with the event announcing it to the other readers
             db.session.add(new_comment)
+            db.session.flush()
+            new_comment_html = render_template('comment_partial.html', comment=new_comment)
+            publish_event('comment', new_comment.id, new_comment.id, new_comment_html)
             db.session.commit()
 
-            # After successful comment creation, return the updated page
-            answer_captcha_texts, answer_captcha_images = generate_captcha_for_comment_answers()
-            return render_template('discussion.html', comments=get_db_comments(),
-                                   success="Your comment has been submitted successfully.",
-                                   captcha_text=new_captcha_text,
-                                   captcha_image=new_captcha_image,
-                                   answer_captcha_texts=answer_captcha_texts,
-                                   answer_captcha_images=answer_captcha_images,
-                                   is_htmx=is_htmx)
+            return render_submission(new_comment_html=Markup(new_comment_html),
+                                     success="Your comment has been submitted successfully.")
         except Exception as e:
             db.session.rollback()
-            return render_template('discussion.html', comments=get_db_comments(),
-                                   error=str(e),
-                                   captcha_text=new_captcha_text,
-                                   captcha_image=new_captcha_image,
-                                   answer_captcha_texts=answer_captcha_texts,
-                                   answer_captcha_images=answer_captcha_images,
-                                   is_htmx=is_htmx)
+            return render_submission(error=str(e))
 
+    cursor = request.args.get('cursor')
 
     # Check if the request wants HTML or JSON
     if request.args.get('format') != 'json':
-        # Generate captcha for the comment form and for each answers form
-        captcha_text, captcha_image = generate_captcha()
-        answer_captcha_texts, answer_captcha_images = generate_captcha_for_comment_answers()
+        comments, next_cursor = get_comments_page(cursor)
+        # Captchas are loaded on demand from the /captcha partial
+        if cursor:
+            return render_template('comments_page.html', comments=comments, next_cursor=next_cursor)
         return render_template('discussion.html',
-                               comments=get_db_comments(),
-                               captcha_text=captcha_text,
-                               captcha_image=captcha_image,
-                               answer_captcha_texts=answer_captcha_texts,
-                               answer_captcha_images=answer_captcha_images,
+                               comments=comments,
+                               next_cursor=next_cursor,
+                               last_event_id=latest_event_id(),
                                is_htmx=is_htmx)
     else:
-        # Return JSON for API clients
+        # Return JSON for API clients: every comment, newest first, unless a page is requested
+        # with the limit or cursor parameter (the next page is then requested with the
+        # X-Next-Cursor header value). /api/comments pages through comments with their answers.
+        limit = request.args.get('limit', type=int)
+        next_cursor = None
+        if limit is not None or cursor:
+            comments, next_cursor = get_comments_page(cursor, per_page=max(1, min(limit or 20, 100)))
+        else:
+            comments = Comment.query.order_by(Comment.created_at.desc(), Comment.id.desc()).all()
         result = [{"id": comment.id, "username": comment.username, "body": comment.body,
-                   "created_at": comment.created_at.isoformat()} for comment in get_db_comments()]
-        return jsonify(result)
+                   "created_at": comment.created_at.isoformat()} for comment in comments]
+        response = jsonify(result)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+
+
+@app.route('/discussion/events', methods=['GET'])
+def discussion_events():
+    """
+    Server-Sent Events stream of the comments and answers posted after the page was loaded.
+
+    Each event carries the pre-rendered fragment of the new comment or answer, so that readers
+    only insert the delta. Streams are resumed from the Last-Event-ID header on reconnection,
+    or from the 'after' parameter (the last event id when the page was rendered).
+
+    Each stream holds a worker thread, so streams may only hold the DISCUSSION_EVENTS_STREAM_SHARE
+    of the WORKER_THREADS at once; above that, clients are answered 503 with Retry-After and try
+    again later.
+    """
+    limit = max_streams(app.config['WORKER_THREADS'], app.config['DISCUSSION_EVENTS_STREAM_SHARE'])
+    if not stream_slots.acquire(limit):
+        return Response(f'retry: {BUSY_RETRY_DELAY_MS}\n\n', status=503, mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'Retry-After': str(BUSY_RETRY_DELAY_MS // 1000)})
+    try:
+        last_event_id = request.headers.get('Last-Event-ID', request.args.get('after', ''))
+        after_id = int(last_event_id) if last_event_id.isdigit() else latest_event_id()
+        stream = stream_events(after_id,
+                               max_duration=app.config['DISCUSSION_EVENTS_MAX_DURATION'],
+                               poll_interval=app.config['DISCUSSION_EVENTS_POLL_INTERVAL'])
+        response = Response(stream_with_context(stream), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    except Exception:
+        stream_slots.release()
+        raise
+    # Called by the server once the stream ended or the client went away
+    response.call_on_close(stream_slots.release)
+    return response
 
 
 @app.route('/comment/<int:comment_id>/answer', methods=['POST'])
@@ -290,29 +525,18 @@ def add_answer(comment_id):
     username = request.form.get('username')
     body = request.form.get('body')
     captcha_input = request.form.get('captcha')
-    captcha_text = request.form.get('captcha_text')
+    captcha_token = request.form.get('captcha_token')
     ip_address = request.remote_addr
     user_agent = request.headers.get('User-Agent', '')
 
-    # Generate a new captcha for the answer form
-    new_captcha_text, new_captcha_image = generate_captcha()
-
-    # Generate captchas for all answer forms
-    answer_captcha_texts = {comment.id: new_captcha_text}
-    answer_captcha_images = {comment.id: new_captcha_image}
-
     if not username or not body:
         return render_template('comment_partial.html', comment=comment,
-                               error="Username and answer are required",
-                               answer_captcha_texts=answer_captcha_texts,
-                               answer_captcha_images=answer_captcha_images)
+                               answer_error="Username and answer are required")
 
     # Validate the captcha
-    if not validate_captcha(captcha_input, captcha_text):
+    if not validate_captcha(captcha_input, captcha_token):
         return render_template('comment_partial.html', comment=comment,
-                               error="Invalid captcha. Please try again.",
-                               answer_captcha_texts=answer_captcha_texts,
-                               answer_captcha_images=answer_captcha_images)
+                               answer_error="Invalid captcha. Please try again.")
 
     # Create new answer
     new_answer = Answer(
@@ -324,20 +548,19 @@ def add_answer(comment_id):
     )
 
     try:
+        # Add the answer, with the event announcing it to the other readers
         db.session.add(new_answer)
+        db.session.flush()
+        publish_event('answer', comment_id, new_answer.id, render_template('answer_partial.html', answer=new_answer))
         db.session.commit()
     except Exception as e:
         db.session.rollback()
         return render_template('comment_partial.html', comment=comment,
-                               error=f"Error: {str(e)}",
-                               answer_captcha_texts=answer_captcha_texts,
-                               answer_captcha_images=answer_captcha_images)
+                               answer_error=f"Error: {str(e)}")
 
     # Return the updated comment HTML with success message
     return render_template('comment_partial.html', comment=comment,
-                           answer_success="Your answer has been submitted successfully.",
-                           answer_captcha_texts=answer_captcha_texts,
-                           answer_captcha_images=answer_captcha_images)
+                           answer_success="Your answer has been submitted successfully.")
 
 
 def get_mistral_answer(chat_messages: list[dict], prompt: str):
@@ -348,6 +571,8 @@ def get_mistral_answer(chat_messages: list[dict], prompt: str):
     api_key = ""
     model = "mistral-large-latest"
 
+    # Imported on first use: the client takes longer to import than the rest of the application
+    from mistralai import Mistral
     client = Mistral(api_key=api_key)
 
     messages = []
@@ -366,57 +591,53 @@ def get_mistral_answer(chat_messages: list[dict], prompt: str):
 @app.route('/download')
 def download():
     """
-    Download page with buttons to download anonymized contributions in CSV and JSON formats.
+    Download page with buttons to download anonymized contributions in CSV, JSON Lines and JSON formats.
     """
     return render_template('download.html')
 
 
-@app.route('/download-file/<file_name>')
+@app.route('/download-file/<path:file_name>')
 def download_file(file_name):
     """
-    Route to download any file from the resources directory.
+    Route to download an anonymised export of the contributions, or any file from the resources directory.
+
+    Exports are built from the contributions table after each import (see app.exports),
+    resources are looked up in the download manifest (see app.downloads). Both are sent with
+    conditional requests and byte ranges, precompressed when the client accepts it, or handed
+    over to the fronting proxy with the DOWNLOAD_OFFLOAD setting.
 
     Args:
-        file_name (str): The name of the file within the resources directory
+        file_name (str): One of EXPORT_FILE_NAMES, or the path of a file relative to the resources
+            directory (its bare name is enough when no other resource has the same name)
 
     Returns:
         Response: The file download response
     """
-    # List files in resources directory
-    resources_path = Path(__file__).resolve().parent.parent / "resources"
-    available_files = {fp.name: fp for fp in resources_path.rglob('*')}
-
-    if file_name not in available_files:
-        return "Invalid file name", 400
+    download_name = file_name
+    if file_name in EXPORT_FILE_NAMES:
+        export = get_export(file_name, get_corpus_version())
+        if export is None:
+            return "Export not available yet", 503, {'Retry-After': str(EXPORT_RETRY_AFTER)}
+        path, mimetype, etag, location, variants = (export['path'], export['mimetype'], export['etag'],
+                                                     export['location'], export['variants'])
+    else:
+        entry = download_manifest.get(file_name)
+        if entry is None:
+            return "Invalid file name", 400
+        path, mimetype, etag, location, variants = (entry['path'], entry['mimetype'], entry['sha256'],
+                                                     entry['location'], entry['variants'])
+        download_name = entry['name']
 
     # Get the requester's IP address
     ip_address = request.remote_addr
     # Get the user agent
     user_agent = request.headers.get('User-Agent', '')
 
-    # Log the download in the database
-    download_log = DownloadLog(
-        file_name=file_name,
-        ip_address=ip_address,
-        user_agent=user_agent
-    )
-
-    # Save the log to the database
-    try:
-        db.session.add(download_log)
-        db.session.commit()
-    except Exception as e:
-        # Log the error but continue with the request
-        print(f"Error logging download: {str(e)}")
-        db.session.rollback()
+    # Queue the download log entry, it is written in a batch by the background logger
+    log_writer.log(DownloadLog, file_name=file_name, ip_address=ip_address, user_agent=user_agent)
 
     # Send the file to the client
-    return send_from_directory(
-        available_files[file_name].parent.resolve(),
-        file_name,
-        as_attachment=True,
-        download_name=file_name
-    )
+    return send_download(path, download_name, mimetype, etag, location, variants)
 
 
 @app.route('/analyse', methods=['GET', 'POST'])
@@ -444,20 +665,9 @@ def analyse():
         # Create the server response
         server_response = get_mistral_answer(previous_messages, prompt)
 
-        # Log the chat in the database using the new AnalyseChat model
-        chat_log = AnalyseChat(
-            user_message=prompt,
-            server_response=server_response,
-            ip_address=ip_address,
-            user_agent=user_agent
-        )
-
-        try:
-            db.session.add(chat_log)
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            return f"Error logging chat: {str(e)}", 500
+        # Queue the chat log entry, it is written in a batch by the background logger
+        log_writer.log(AnalyseChat, user_message=prompt, server_response=server_response,
+                       ip_address=ip_address, user_agent=user_agent)
 
         # Return the message exchange HTML
         return render_template('analyse_message.html',
@@ -0,0 +1,198 @@
+"""
+Synthetic corpus generator for the benchmarks.
+
+Writes a contributions.json file in the format of resources/verbatims/contributions.json,
+and a comments.json file with comments and their answers, from French-like random text.
+The output only depends on the number of rows and the seed.
+
+Usage:
+    python -m benchmarks.corpus --rows 100000 --output-dir /tmp/corpus-100k
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Common words, most frequent first (their weights follow a Zipf law)
+COMMON_WORDS = (
+    "de la le et les des à en un une du est que pour pas il qui dans ce ne sur se plus par au "
+    "nous ces sont vous mais ou comme avec tout on leur fait été aux cette être très bien sans "
+    "aussi même faut encore car peu nos notre avons donc déjà entre avant après toujours"
+).split()
+
+# Vocabulary of the public inquiry, accented words included
+TOPIC_WORDS = (
+    "projet télésiège côte 2000 villard lans station ski neige forêt montagne commune "
+    "enquête publique avis favorable défavorable opposé soutien tourisme été hiver eau "
+    "biodiversité paysage parking trafic routier emplois économie village habitants "
+    "saisonniers réchauffement climatique altitude remontées mécaniques investissement "
+    "coût élus conseil municipal randonnée vélo famille enfants avenir patrimoine faune "
+    "flore tétras lyre zone humide captage enneigement artificiel retenue collinaire "
+    "dérogation espèces protégées étude impact financement département région domaine "
+    "nordique alpin piste débutants sécurité accessibilité vieillissant remplacer moderniser"
+).split()
+
+FIRST_NAMES = ("Marie Jean Pierre Sophie Luc Camille Nicolas Julie Thomas Claire Antoine Élodie "
+               "François Chloé Mathieu Léa Hélène Rémi Agnès Gérard").split()
+LAST_NAMES = ("Martin Bernard Dubois Thomas Robert Richard Petit Durand Leroy Moreau Simon Laurent "
+              "Lefèvre Michel Garcia Faure Rousseau Blanc Guérin Chevalier").split()
+
+# Openings and closings of template contributions, which produce near-duplicates
+TEMPLATE_OPENINGS = (
+    "Je suis opposé au projet de télésiège de la Côte 2000",
+    "Je soutiens le projet de la Côte 2000 pour l'avenir de la station",
+    "Avis défavorable au remplacement du télésiège",
+    "Avis favorable, la station doit se moderniser",
+)
+TEMPLATE_CLOSINGS = ("Merci.", "Cordialement.", "Bien à vous.", "")
+
+START_TIME = datetime(2025, 3, 20, 9, 0, 0)
+END_TIME = datetime(2025, 4, 30, 18, 0, 0)
+
+# Share of contributions written from a template (near-duplicates) and of anonymous ones
+TEMPLATE_RATE = 0.15
+ANONYMOUS_RATE = 0.4
+
+
+def _sentence(generator, words, cumulative=None, min_words=6, max_words=24):
+    """Return a random sentence starting with a capital letter (uniform words if cumulative is None)."""
+    sentence = ' '.join(generator.choices(words, cum_weights=cumulative, k=generator.randint(min_words, max_words)))
+    return sentence[0].upper() + sentence[1:] + generator.choice('....!?')
+
+
+def _vocabulary():
+    """Return the word list and the cumulative Zipf weights used by random.choices."""
+    words = list(COMMON_WORDS) + list(TOPIC_WORDS)
+    weights = [1 / (rank + 1) for rank in range(len(COMMON_WORDS))]
+    weights += [0.15 / (1 + rank % 10) for rank in range(len(TOPIC_WORDS))]
+    cumulative, total = [], 0.0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return words, cumulative
+
+
+def generate_contributions(rows, seed=6058):
+    """
+    Generate contributions, numbered from 1 and sorted by time.
+
+    Args:
+        rows (int): Number of contributions
+        seed (int): Seed of the random generator
+
+    Yields:
+        dict: Contribution with the 'number', 'user', 'body' and 'time' keys (all strings)
+    """
+    generator = random.Random(seed)
+    words, cumulative = _vocabulary()
+    templates = [
+        f"{opening}. {_sentence(generator, words, None, 10, 25)} {_sentence(generator, words, None, 10, 25)}"
+        for opening in TEMPLATE_OPENINGS
+    ]
+    step = (END_TIME - START_TIME) / max(rows, 1)
+    for number in range(1, rows + 1):
+        if generator.random() < TEMPLATE_RATE:
+            body = f"{generator.choice(templates)} {generator.choice(TEMPLATE_CLOSINGS)}".strip()
+        else:
+            body = ' '.join(_sentence(generator, words, cumulative)
+                            for _ in range(generator.randint(1, 6)))
+        if generator.random() < ANONYMOUS_RATE:
+            user = 'Anonyme'
+        else:
+            user = f"{generator.choice(FIRST_NAMES)} {generator.choice(LAST_NAMES)}"
+        time = START_TIME + step * (number - 1) + timedelta(seconds=generator.randint(0, 59))
+        yield {'body': body, 'number': str(number), 'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'user': user}
+
+
+def generate_comments(count, max_answers=4, seed=6058):
+    """
+    Generate discussion comments with their answers.
+
+    Args:
+        count (int): Number of comments
+        max_answers (int): Maximum number of answers per comment
+        seed (int): Seed of the random generator
+
+    Returns:
+        list: List of comments with the 'username', 'body', 'created_at' and 'answers' keys,
+            answers having the same keys except 'answers'
+    """
+    generator = random.Random(seed + 1)
+    words, cumulative = _vocabulary()
+    comments = []
+    for index in range(count):
+        created_at = START_TIME + (END_TIME - START_TIME) * index / max(count, 1)
+        answers = []
+        for answer_index in range(generator.randint(0, max_answers)):
+            answers.append({
+                'username': generator.choice(FIRST_NAMES),
+                'body': _sentence(generator, words, cumulative),
+                'created_at': (created_at + timedelta(hours=answer_index + 1)).isoformat(),
+            })
+        comments.append({
+            'username': generator.choice(FIRST_NAMES),
+            'body': ' '.join(_sentence(generator, words, cumulative)
+                             for _ in range(generator.randint(1, 4))),
+            'created_at': created_at.isoformat(),
+            'answers': answers,
+        })
+    return comments
+
+
+def write_corpus(output_dir, rows, comments=None, seed=6058):
+    """
+    Write contributions.json and comments.json in a directory.
+
+    Contributions are written one at a time, so that large corpora do not have to fit in memory.
+
+    Args:
+        output_dir (Path): Directory of the files, created if needed
+        rows (int): Number of contributions
+        comments (int): Number of comments, by default one per 20 contributions (at most 200)
+        seed (int): Seed of the random generator
+
+    Returns:
+        tuple: (contributions_path, comments_path)
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if comments is None:
+        comments = min(rows // 20, 200)
+
+    contributions_path = output_dir / 'contributions.json'
+    with open(contributions_path, 'w', encoding='utf-8') as file:
+        file.write('[')
+        for index, contribution in enumerate(generate_contributions(rows, seed)):
+            file.write(',\n' if index else '\n')
+            file.write(json.dumps(contribution, ensure_ascii=False))
+        file.write('\n]\n')
+
+    comments_path = output_dir / 'comments.json'
+    with open(comments_path, 'w', encoding='utf-8') as file:
+        json.dump(generate_comments(comments, seed=seed), file, ensure_ascii=False, indent=1)
+    return contributions_path, comments_path
+
+
+def parse_size(size):
+    """Parse a corpus size such as '1k', '100k' or '1M'."""
+    multipliers = {'k': 1000, 'K': 1000, 'm': 1000000, 'M': 1000000}
+    if size and size[-1] in multipliers:
+        return int(float(size[:-1]) * multipliers[size[-1]])
+    return int(size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic contributions corpus.")
+    parser.add_argument('--rows', default='1k', help="Number of contributions, e.g. 1000, 100k or 1M")
+    parser.add_argument('--comments', type=int, default=None, help="Number of discussion comments")
+    parser.add_argument('--seed', type=int, default=6058)
+    parser.add_argument('--output-dir', type=Path, required=True)
+    args = parser.parse_args()
+
+    contributions_path, comments_path = write_corpus(args.output_dir, parse_size(args.rows), args.comments, args.seed)
+    print(f"Corpus written to {contributions_path} and {comments_path}")
+
+
+if __name__ == '__main__':
+    main()
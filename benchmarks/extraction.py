@@ -0,0 +1,76 @@
+"""
+Benchmark of the HTML extraction of scripts/extract.py on a scrape.
+
+Compares the wall time of the reference implementation (BeautifulSoup's html.parser, one
+file after the other) with the lxml parser, in the current process and across a process pool,
+and checks that every variant extracts the same contributions.
+
+Usage:
+    python -m benchmarks.extraction
+    python -m benchmarks.extraction --data-dir scripts/scrap-data/scrap-data-250430T165525 --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.run import REPOSITORY_PATH, summarize
+
+sys.path.insert(0, str(REPOSITORY_PATH))
+
+from scripts.extract import extract_all  # noqa: E402
+
+DEFAULT_DATA_DIR = REPOSITORY_PATH / 'scripts' / 'scrap-data' / 'scrap-data-250430T165525'
+
+
+def run_variants(html_files, repeat, workers):
+    """
+    Time every extraction variant.
+
+    Args:
+        html_files (list): Paths of the HTML files
+        repeat (int): Number of runs of each variant
+        workers (int): Number of processes of the pool
+
+    Returns:
+        dict: Output of summarize for each variant, and the number of contributions extracted
+    """
+    variants = {
+        'html_parser_serial': lambda: extract_all(html_files, 1, 'html.parser'),
+        'lxml_serial': lambda: extract_all(html_files, 1, 'lxml'),
+        f'lxml_pool_{workers}': lambda: extract_all(html_files, workers, 'lxml'),
+    }
+    results, reference = {}, None
+    for name, variant in variants.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            contributions = variant()
+            timings.append(time.perf_counter() - start)
+        if reference is None:
+            reference = contributions
+            results['contributions'] = len(contributions)
+        elif contributions != reference:
+            raise AssertionError(f"{name} does not extract the same contributions as the reference implementation")
+        results[name] = summarize(timings)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the extraction of the scraped HTML pages.")
+    parser.add_argument('--data-dir', type=Path, default=DEFAULT_DATA_DIR, help="Directory of contrib-page-*.html")
+    parser.add_argument('--repeat', type=int, default=3, help="Number of runs of each variant")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Number of processes of the pool")
+    args = parser.parse_args()
+
+    html_files = list(args.data_dir.glob('contrib-page-*.html'))
+    results = run_variants(html_files, args.repeat, args.workers)
+    print(f"{len(html_files)} pages, {results.pop('contributions')} contributions")
+    reference = results['html_parser_serial']['median_ms']
+    for name, summary in results.items():
+        print(f"{name:<24} {summary['median_ms']:>10.1f} ms  x{reference / summary['median_ms']:.1f}")
+
+
+if __name__ == '__main__':
+    main()
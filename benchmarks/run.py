@@ -0,0 +1,343 @@
+"""
+Performance benchmarks of the web app on synthetic corpora.
+
+For each corpus size, a corpus is generated (and kept in benchmarks/.corpora for the next runs),
+then the app is imported in fresh processes against a temporary database:
+
+- a cold start imports the corpus (DatabaseInitializer) and runs the request-level benchmarks:
+  get_contributions_data for an empty and multi-keyword queries on a shallow and a deep page,
+  highlight_keywords on a page of results and the rendering of the discussion page;
+- a warm start only measures the start-up time on the already imported database.
+
+Timings are in milliseconds, memory peaks (maximum resident set size) in kilobytes. Results are
+written to benchmarks/results/<timestamp>-<commit>.json, and two result files can be compared
+to spot regressions between commits.
+
+Usage:
+    python -m benchmarks.run --sizes 1k,100k
+    python -m benchmarks.run --compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.corpus import parse_size, write_corpus
+
+BENCHMARKS_PATH = Path(__file__).resolve().parent
+REPOSITORY_PATH = BENCHMARKS_PATH.parent
+CORPORA_PATH = BENCHMARKS_PATH / '.corpora'
+RESULTS_PATH = BENCHMARKS_PATH / 'results'
+
+# Queries of the search benchmarks: frequent words, rarer words and a word prefix
+SEARCH_QUERIES = {
+    'two_keywords': 'projet forêt',
+    'three_keywords': 'télésiège enneigement artificiel',
+    'prefix': 'biodiv',
+}
+
+# Position of the deep page in the result list
+DEEP_PAGE_RATIO = 0.9
+
+
+def summarize(timings):
+    """
+    Summarize a list of durations.
+
+    Args:
+        timings (list): Durations in seconds
+
+    Returns:
+        dict: Minimum, median and 95th percentile in milliseconds, and the number of runs
+    """
+    timings = sorted(timings)
+    return {
+        'min_ms': round(timings[0] * 1000, 3),
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 3),
+        'runs': len(timings),
+    }
+
+
+def measure(function, repeat, setup=None):
+    """
+    Time a function.
+
+    Args:
+        function (callable): The function to time, called without arguments
+        repeat (int): Number of runs
+        setup (callable): Function called before each run, not timed
+
+    Returns:
+        dict: Output of summarize
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def max_rss_kb():
+    """Return the maximum resident set size of the current process, in kilobytes."""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return max_rss // 1024 if sys.platform == 'darwin' else max_rss
+
+
+def import_comments(comments_path):
+    """Insert the generated comments and answers in the benchmark database."""
+    from app import app, db
+    from app.models import Answer, Comment
+
+    with open(comments_path, 'r', encoding='utf-8') as file:
+        comments = json.load(file)
+    with app.app_context():
+        for item in comments:
+            comment = Comment(username=item['username'], body=item['body'],
+                              created_at=datetime.fromisoformat(item['created_at']))
+            db.session.add(comment)
+            db.session.flush()
+            for answer in item['answers']:
+                db.session.add(Answer(username=answer['username'], body=answer['body'], comment_id=comment.id,
+                                      created_at=datetime.fromisoformat(answer['created_at'])))
+        db.session.commit()
+    return len(comments)
+
+
+def run_request_benchmarks(comments_path, repeat):
+    """
+    Benchmark the request-level functions, within the imported app.
+
+    Args:
+        comments_path (Path): Generated comments.json
+        repeat (int): Number of runs of each benchmark
+
+    Returns:
+        dict: Results of each benchmark
+    """
+    from app import app
+    from app.highlight import highlight_keywords
+    from app.pagination import encode_cursor
+    from app.result_cache import fragment_cache, search_result_cache
+    from app.views import get_contributions_data, search_contribution_ids
+    from app.database import get_corpus_version
+
+    results = {'comments': import_comments(comments_path)}
+
+    def clear_caches():
+        search_result_cache.clear()
+        fragment_cache.clear()
+
+    with app.app_context():
+        corpus_version = get_corpus_version()
+        all_ids = search_contribution_ids([], 'id', corpus_version)
+        clear_caches()
+        deep_cursor = encode_cursor({'after': all_ids[int(len(all_ids) * DEEP_PAGE_RATIO)], 'total': len(all_ids)})
+        results['empty_query_first_page'] = measure(lambda: get_contributions_data(''), repeat, clear_caches)
+        results['empty_query_deep_page'] = measure(lambda: get_contributions_data('', deep_cursor), repeat,
+                                                   clear_caches)
+
+        for name, query in SEARCH_QUERIES.items():
+            keywords = query.split()
+            matching_ids = search_contribution_ids(keywords, 'id', corpus_version)
+            clear_caches()
+            results[f'{name}_matches'] = len(matching_ids)
+            results[f'{name}_first_page'] = measure(lambda: get_contributions_data(query), repeat, clear_caches)
+            results[f'{name}_first_page_cached'] = measure(lambda: get_contributions_data(query), repeat)
+            results[f'{name}_relevance_first_page'] = measure(
+                lambda: get_contributions_data(query, order='relevance'), repeat, clear_caches)
+            if matching_ids:
+                cursor = encode_cursor({'after': matching_ids[int(len(matching_ids) * DEEP_PAGE_RATIO)],
+                                        'total': len(matching_ids)})
+                results[f'{name}_deep_page'] = measure(lambda: get_contributions_data(query, cursor), repeat,
+                                                       clear_caches)
+
+        # Highlighting of a page of 30 results, the cost paid by each search request
+        page, _, _, _, _ = get_contributions_data('')
+        bodies = [contrib.body for contrib in page]
+        keywords = SEARCH_QUERIES['three_keywords'].split()
+        results['highlight_keywords_page'] = measure(
+            lambda: [highlight_keywords(body, keywords) for body in bodies], repeat)
+
+    client = app.test_client()
+    results['discussion_page'] = measure(lambda: client.get('/discussion'), max(1, repeat // 5))
+    return results
+
+
+def run_worker(corpus_path, phase, repeat, output_path):
+    """
+    Run the benchmarks of one process, the database being set up by the parent process.
+
+    Args:
+        corpus_path (Path): Directory of the generated corpus
+        phase (str): 'cold' to import the corpus and run every benchmark, 'warm' to only time the start-up
+        repeat (int): Number of runs of each benchmark
+        output_path (Path): File the results are written to, as JSON
+    """
+    start = time.perf_counter()
+    from app import create_app
+    create_app()
+    results = {
+        'startup_ms': round((time.perf_counter() - start) * 1000, 3),
+        'max_rss_after_startup_kb': max_rss_kb(),
+    }
+    if phase == 'cold':
+        results.update(run_request_benchmarks(corpus_path / 'comments.json', repeat))
+        results['max_rss_kb'] = max_rss_kb()
+    with open(output_path, 'w', encoding='utf-8') as file:
+        json.dump(results, file)
+
+
+def spawn_worker(corpus_path, database_dir, phase, repeat):
+    """Run run_worker in a fresh Python process against the benchmark database and return its results."""
+    output_path = database_dir / f'{phase}-results.json'
+    environment = dict(os.environ,
+                       VERBATIMS_DB_PATH=str(database_dir / 'sqlite.db'),
+                       VERBATIMS_CONTRIBUTIONS_PATH=str(corpus_path / 'contributions.json'))
+    subprocess.run(
+        [sys.executable, '-m', 'benchmarks.run', '--worker', phase, '--corpus', str(corpus_path),
+         '--repeat', str(repeat), '--output', str(output_path)],
+        cwd=REPOSITORY_PATH, env=environment, check=True, stdout=subprocess.DEVNULL
+    )
+    with open(output_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def benchmark_size(size, repeat, seed):
+    """
+    Generate (or reuse) the corpus of a size and benchmark the app on it.
+
+    Args:
+        size (str): Corpus size, e.g. '1k'
+        repeat (int): Number of runs of each benchmark
+        seed (int): Seed of the corpus generator
+
+    Returns:
+        dict: Results of the cold and warm starts
+    """
+    rows = parse_size(size)
+    corpus_path = CORPORA_PATH / f'{rows}-{seed}'
+    if not (corpus_path / 'comments.json').exists():
+        print(f"Generating a corpus of {rows} contributions...")
+        start = time.perf_counter()
+        write_corpus(corpus_path, rows, seed=seed)
+        print(f"Corpus generated in {time.perf_counter() - start:.1f}s")
+
+    database_dir = Path(tempfile.mkdtemp(prefix=f'verbatims-benchmark-{size}-'))
+    try:
+        print(f"Benchmarking {size} (cold start)...")
+        cold = spawn_worker(corpus_path, database_dir, 'cold', repeat)
+        print(f"Benchmarking {size} (warm start)...")
+        warm = spawn_worker(corpus_path, database_dir, 'warm', repeat)
+    finally:
+        shutil.rmtree(database_dir, ignore_errors=True)
+    return {'rows': rows, 'cold': cold, 'warm': warm}
+
+
+def git_revision():
+    """Return the current commit and whether the working tree has uncommitted changes."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPOSITORY_PATH,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPOSITORY_PATH,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+    return commit, dirty
+
+
+def flatten(results, prefix=''):
+    """Flatten nested results into {'1k.cold.startup_ms': value} pairs of numeric values."""
+    values = {}
+    for key, value in results.items():
+        name = f'{prefix}.{key}' if prefix else key
+        if isinstance(value, dict):
+            values.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+
+def compare(old_path, new_path, threshold=0.1):
+    """
+    Print the metrics of two result files side by side.
+
+    Args:
+        old_path (Path): Reference result file
+        new_path (Path): Result file to compare with the reference
+        threshold (float): Relative increase reported as a regression
+
+    Returns:
+        int: Number of timing or memory metrics that regressed by more than threshold
+    """
+    with open(old_path, 'r', encoding='utf-8') as file:
+        old = json.load(file)
+    with open(new_path, 'r', encoding='utf-8') as file:
+        new = json.load(file)
+    print(f"{old['commit']} -> {new['commit']}")
+
+    old_values, new_values = flatten(old['sizes']), flatten(new['sizes'])
+    regressions = 0
+    for name in sorted(old_values.keys() & new_values.keys()):
+        old_value, new_value = old_values[name], new_values[name]
+        change = (new_value - old_value) / old_value if old_value else 0.0
+        # Counts such as matches or runs are shown but never reported as regressions
+        regressed = name.endswith(('_ms', '_kb')) and change > threshold
+        regressions += regressed
+        print(f"{name:<60} {old_value:>12} {new_value:>12} {change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app on synthetic corpora.")
+    parser.add_argument('--sizes', default='1k,100k', help="Comma-separated corpus sizes, e.g. 1k,100k,1M")
+    parser.add_argument('--repeat', type=int, default=20, help="Number of runs of each benchmark")
+    parser.add_argument('--seed', type=int, default=6058, help="Seed of the corpus generator")
+    parser.add_argument('--output', type=Path, default=None, help="Result file (default: benchmarks/results/)")
+    parser.add_argument('--compare', nargs=2, type=Path, metavar=('OLD', 'NEW'),
+                        help="Compare two result files instead of running the benchmarks")
+    parser.add_argument('--worker', choices=('cold', 'warm'), help=argparse.SUPPRESS)
+    parser.add_argument('--corpus', type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.corpus, args.worker, args.repeat, args.output)
+        return
+    if args.compare:
+        sys.exit(1 if compare(*args.compare) else 0)
+
+    commit, dirty = git_revision()
+    results = {
+        'commit': commit,
+        'dirty': dirty,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'repeat': args.repeat,
+        'seed': args.seed,
+        'sizes': {size: benchmark_size(size, args.repeat, args.seed) for size in args.sizes.split(',')},
+    }
+
+    output_path = args.output or RESULTS_PATH / f"{datetime.now():%Y%m%dT%H%M%S}-{commit}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {output_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,7 @@ import multiprocessing
 # Bind and process count
 bind = "0.0.0.0:5001"
 workers = multiprocessing.cpu_count() * 2 + 1
-threads = 2
+threads = 4  # Discussion event streams take at most the DISCUSSION_EVENTS_STREAM_SHARE of them
 worker_class = "gthread"
 # worker_connections = 1000 # For async workers
 
@@ -32,4 +32,51 @@ limit_request_field_size = 8190  # Limit the allowed size of an HTTP header
 
 # Graceful handling
 graceful_timeout = 30  # How long to wait for workers to finish their work during shutdown
-# preload_app = True  # Load application code before worker processes are forked
+preload_app = True  # Load application code before worker processes are forked (workers share the search index)
+
+
+def on_starting(server):
+    """Bootstrap the database once, in the master process, before any worker is forked."""
+    from app import create_app
+    create_app()
+    server.log.info("Database bootstrapped in the master process")
+
+
+def pre_fork(server, worker):
+    """Move the preloaded objects out of the garbage collector's reach so forked pages stay shared."""
+    import gc
+    import time
+    gc.freeze()
+    worker.forked_at = time.monotonic()
+
+
+def post_fork(server, worker):
+    """
+    Drop the database connections inherited from the master process, size the event streams to the worker
+    threads and start filling the captcha pool.
+    """
+    from app import app, db
+    from app.utils import captcha_pool
+    app.config["WORKER_THREADS"] = server.cfg.threads
+    with app.app_context():
+        db.engine.dispose(close=False)
+    captcha_pool.start()
+
+
+def post_worker_init(worker):
+    """Log the start-up time of the worker, from the fork to the loaded application."""
+    import time
+    worker.log.info(f"Worker {worker.pid} ready in {(time.monotonic() - worker.forked_at) * 1000:.1f} ms")
+
+
+def worker_exit(server, worker):
+    """Write the log records and cache counters still queued by the worker before it exits."""
+    from app.log_writer import log_writer
+    from app.result_cache import fragment_cache, search_result_cache
+    from app.utils import captcha_pool
+    log_writer.stop()
+    search_result_cache.flush_counters()
+    fragment_cache.flush_counters()
+    captcha_pool.stop()
+    server.log.info(f"Worker {worker.pid} log writer: {log_writer.stats()}")
+    server.log.info(f"Worker {worker.pid} captcha pool: {captcha_pool.stats()}")
@@ -1,25 +1,52 @@
-import json
-
-with open('../resources/verbatims/contributions.json', 'r', encoding='utf-8') as file:
-    data = json.load(file)
-
-for item in data:
-    if item['user'] != 'Anonyme':
-        item['user'] = 'Anonymisé'
-
-import pandas as pd
-pd.DataFrame.from_dict(data).to_csv('../resources/verbatims/contributions-anonymisees.csv', index=False)
-
-# Write to JSON file
-# with open('../resources/verbatims/contributions-anonymisees.json', 'w+', encoding='utf-8') as f:
-#     json.dump(data, f, ensure_ascii=False, indent=4)
-
-# Write to JSONL file (one JSON object per line)
-# with open('../resources/verbatims/contributions-anonymisees.jsonl', 'w+', encoding='utf-8') as f:
-#     if isinstance(data, list):
-#         # If the JSON is an array of objects
-#         for item in data:
-#             f.write(json.dumps(item, ensure_ascii=False) + '\n')
-#     else:
-#         # If the JSON is a single object
-#         f.write(json.dumps(data, ensure_ascii=False) + '\n')
+#!/usr/bin/env python3
+"""
+Write anonymised CSV, JSON Lines and JSON copies of a contributions file.
+
+The app builds the same exports from its database for /download-file (see app/exports.py);
+this script produces them offline from an extracted contributions file, with the same
+anonymisation rules and format.
+
+Usage:
+    python scripts/anonymise-contrib-json.py
+    python scripts/anonymise-contrib-json.py --input scripts/scrap-data/extracted --output-dir /tmp/exports
+"""
+import argparse
+import sys
+from pathlib import Path
+
+REPOSITORY_PATH = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPOSITORY_PATH))
+
+from app.exports import EXPORT_FILE_NAMES, iter_export  # noqa: E402
+from app.models import Contribution  # noqa: E402
+from scripts.extract import iter_dataset  # noqa: E402
+
+
+def iter_anonymised_records(input_dir):
+    """Read the records of contributions.jsonl (or contributions.json) and anonymise their user."""
+    for record in iter_dataset(input_dir):
+        yield {
+            'body': record['body'],
+            'number': str(record['number']),
+            'time': record['time'],
+            'user': Contribution.anonymise_contributor(record['user']),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write anonymised copies of a contributions file.")
+    parser.add_argument('--input', type=Path, default=REPOSITORY_PATH / 'resources' / 'verbatims',
+                        help="Directory of contributions.jsonl or contributions.json")
+    parser.add_argument('--output-dir', type=Path, default=Path.cwd())
+    args = parser.parse_args()
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    for file_name, export_format in EXPORT_FILE_NAMES.items():
+        with open(args.output_dir / file_name, 'w', encoding='utf-8', newline='') as file:
+            for chunk in iter_export(iter_anonymised_records(args.input), export_format):
+                file.write(chunk)
+        print(f"Saved {args.output_dir / file_name}")
+
+
+if __name__ == '__main__':
+    main()
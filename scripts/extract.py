@@ -1,71 +1,178 @@
 #!/usr/bin/env python3
 
+import argparse
 import os
 import re
+import hashlib
 import json
 import csv
+import sys
 from bs4 import BeautifulSoup
-import locale
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
 from typing import Dict, List, Union, TypedDict, Optional
 
+import lxml.html
 
-locale.setlocale(locale.LC_ALL, 'fr_FR.UTF-8')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-def extract_contributions(html_file):
+from app.json_stream import iter_json_array  # noqa: E402
+
+
+# French month names, so that dates are parsed without depending on an installed fr_FR locale
+FRENCH_MONTHS = {
+    'janvier': 1, 'février': 2, 'mars': 3, 'avril': 4, 'mai': 5, 'juin': 6,
+    'juillet': 7, 'août': 8, 'septembre': 9, 'octobre': 10, 'novembre': 11, 'décembre': 12,
+}
+
+NUMBER_PATTERN = re.compile(r'(\d+)\s')
+USER_PATTERN = re.compile(r'Anonyme|Par\s+(.+?)\n')
+TIME_PATTERN = re.compile(r'Déposée\s+le\s+(.+)')
+FRENCH_DATETIME_PATTERN = re.compile(r'(\d{1,2})\s+(\S+)\s+(\d{4})\s+à\s+(\d{1,2})h(\d{2})')
+
+# Whitespace characters of BeautifulSoup's whitespace-only strings
+ASCII_SPACES = ' \n\t\x0c\r'
+
+
+def _has_class(class_name):
+    """XPath test matching a class among the others, as BeautifulSoup's class_ does."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+# Fields of the output records, in the column order of contributions.csv
+RECORD_FIELDS = ('number', 'user', 'time', 'body')
+
+# Manifest of the extracted pages, in the output directory
+EXTRACTION_MANIFEST_NAME = 'manifest.json'
+
+CONTRIBUTIONS_XPATH = f"//div[{_has_class('one-obs')}]"
+INFOS_XPATH = f".//div[{_has_class('infos-obs')}]"
+SPAN_BODY_XPATH = f".//span[{_has_class('obs-hide')}]"
+DIV_BODY_XPATH = f".//div[{_has_class('obs-hide')}]"
+CONTENT_XPATH = f".//div[{_has_class('obs-content')}]"
+
+
+def parse_french_datetime(value):
     """
-    Extract contribution data from an HTML file.
+    Parse a date such as '30 avril 2025 à 16h55'.
 
     Args:
-        html_file (str): Path to the HTML file
+        value (str): Date in the format of the registre
 
     Returns:
-        list: List of dictionaries containing contribution data
+        datetime: The parsed date
     """
-    with open(html_file, 'r', encoding='utf-8') as file:
-        soup = BeautifulSoup(file.read(), 'html.parser')
+    match = FRENCH_DATETIME_PATTERN.fullmatch(value.strip())
+    if not match or match.group(2).lower() not in FRENCH_MONTHS:
+        raise ValueError(f"Unknown date format: {value}")
+    day, month, year, hour, minute = match.groups()
+    return datetime(int(year), FRENCH_MONTHS[month.lower()], int(day), int(hour), int(minute))
+
+
+def _text(element):
+    """
+    Return the text of an element as BeautifulSoup's get_text() does.
+
+    Like BeautifulSoup, whitespace-only text nodes are collapsed to a newline (or a space
+    if they hold none), so that both parsers produce the same bodies.
+    """
+    parts = []
+    for text in element.itertext():
+        if text and not text.strip(ASCII_SPACES):
+            text = '\n' if '\n' in text else ' '
+        parts.append(text)
+    return ''.join(parts)
+
+
+def page_number(html_file):
+    """Return the page number of a contrib-page-<n>.html file."""
+    return int(Path(html_file).stem.rsplit('-', 1)[1])
+
+
+def _parse_infos(user_info, contribution):
+    """Fill the user and time of a contribution from the text of its infos-obs div."""
+    # Extract username using regex to handle different formats
+    user_match = USER_PATTERN.search(user_info)
+    if user_match:
+        if 'Anonyme' in user_match.group(0):
+            contribution['user'] = 'Anonyme'
+        if user_match.group(1):
+            contribution['user'] = user_match.group(1).strip()
+    else:
+        contribution['user'] = 'Anonyme'
+
+    # Extract post time
+    time_match = TIME_PATTERN.search(user_info)
+    if time_match:
+        contribution['time'] = parse_french_datetime(time_match.group(1))
+
+
+def _new_contribution():
+    contribution: Dict[str, Union[None, int, str, datetime]] = {
+        'number': None,
+        'user': None,
+        'time': None,
+        'body': None
+    }
+    return contribution
+
+
+def _extract_with_lxml(html):
+    """Extract the contributions of a page with lxml (libxml2's HTML parser and XPath)."""
+    contributions = []
+    for contrib_div in lxml.html.document_fromstring(html).xpath(CONTRIBUTIONS_XPATH):
+        contribution = _new_contribution()
+
+        h2_tags = contrib_div.xpath('.//h2')
+        if h2_tags:
+            number_match = NUMBER_PATTERN.search(_text(h2_tags[0]).strip())
+            if number_match:
+                contribution['number'] = number_match.group(1)
+
+        info_divs = contrib_div.xpath(INFOS_XPATH)
+        if info_divs:
+            _parse_infos(_text(info_divs[0]).strip(), contribution)
+
+        # The body is in the obs-hide span, else in a non-empty obs-hide div, else in the obs-content div
+        span_bodies = contrib_div.xpath(SPAN_BODY_XPATH)
+        if span_bodies:
+            contribution['body'] = _text(span_bodies[0]).strip()
+        else:
+            div_bodies = contrib_div.xpath(DIV_BODY_XPATH)
+            if div_bodies and _text(div_bodies[0]).strip():
+                contribution['body'] = _text(div_bodies[0]).strip()
+            else:
+                content_divs = contrib_div.xpath(CONTENT_XPATH)
+                if content_divs:
+                    contribution['body'] = _text(content_divs[0]).strip()
+
+        contributions.append(contribution)
+    return contributions
+
+
+def _extract_with_soup(html):
+    """Extract the contributions of a page with BeautifulSoup's pure-Python html.parser (reference implementation)."""
+    soup = BeautifulSoup(html, 'html.parser')
 
     contributions = []
 
     # Find all contribution divs with class "one-obs"
     for contrib_div in soup.find_all('div', class_='one-obs'):
         # Initialize contribution with default values
-        contribution: Dict[str, Union[None, int, str, datetime]] = {
-            'number': None,
-            'user': None,
-            'time': None,
-            'body': None
-        }
+        contribution = _new_contribution()
 
         # Extract contribution number from h2 tag
         h2_tag = contrib_div.find('h2')
-        number_match = re.search(r'(\d+)\s', h2_tag.text.strip())
-        if h2_tag and number_match:
+        number_match = NUMBER_PATTERN.search(h2_tag.text.strip()) if h2_tag else None
+        if number_match:
             contribution['number'] = number_match.group(1)
 
         # Extract user info and post time from div with class "infos-obs"
         info_div = contrib_div.find('div', class_='infos-obs')
         if info_div:
-            # Extract user name
-            user_info = info_div.get_text().strip()
-
-            # Extract username using regex to handle different formats
-            user_match = re.search(r'Anonyme|Par\s+(.+?)\n', user_info)
-            if user_match:
-                if 'Anonyme' in user_match.group(0):
-                    contribution['user'] = 'Anonyme'
-                if user_match.group(1):
-                    contribution['user'] = user_match.group(1).strip()
-            else:
-               contribution['user'] = 'Anonyme'
-
-            # Extract post time
-            time_match = re.search(r'Déposée\s+le\s+(.+)', user_info)
-            if time_match:
-                contribution['time'] = datetime.strptime(time_match.group(1).strip(), "%d %B %Y à %Hh%M")
-
+            _parse_infos(info_div.get_text().strip(), contribution)
 
         # Try to extract contribution body from span with class "obs-hide"
         body_div = contrib_div.find('span', class_='obs-hide')
@@ -86,74 +193,353 @@ def extract_contributions(html_file):
 
     return contributions
 
-def save_to_json(contributions, output_file):
+
+PARSERS = {'lxml': _extract_with_lxml, 'html.parser': _extract_with_soup}
+
+
+def extract_contributions(html_file, parser='lxml'):
     """
-    Save contributions to a JSON file.
+    Extract contribution data from an HTML file.
 
     Args:
-        contributions (list): List of contribution dictionaries
-        output_file (str): Path to the output JSON file
+        html_file (str): Path to the HTML file
+        parser (str): 'lxml', or 'html.parser' for the slower BeautifulSoup implementation
+
+    Returns:
+        list: List of dictionaries containing contribution data, in page order
     """
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(contributions, f, ensure_ascii=False, indent=4, sort_keys=True, default=str)
-        f.write('\n' if contributions else '')
-    print(f"Saved {len(contributions)} contributions to {output_file}")
+    with open(html_file, 'r', encoding='utf-8') as file:
+        return PARSERS[parser](file.read())
+
 
-def save_to_csv(contributions, output_file):
+def extract_pages(html_files, workers=None, parser='lxml'):
     """
-    Save contributions to a CSV file.
+    Extract the contributions of several pages across a process pool, one task per file.
 
     Args:
-        contributions (list): List of contribution dictionaries
-        output_file (str): Path to the output CSV file
+        html_files (list): Paths of the HTML files
+        workers (int): Number of processes, by default the number of CPUs (1 extracts in the current process)
+        parser (str): Parser of extract_contributions
+
+    Yields:
+        list: Contributions of each file, in the order of html_files
     """
-    if not contributions:
-        print("No contributions to save.")
+    html_files = list(html_files)
+    if workers == 1 or len(html_files) < 2:
+        for html_file in html_files:
+            yield extract_contributions(html_file, parser)
         return
+    workers = min(workers or os.cpu_count() or 1, len(html_files))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(extract_contributions, html_files, [parser] * len(html_files),
+                                chunksize=max(1, len(html_files) // (workers * 4)))
 
-    # Get the fieldnames from the first contribution
-    fieldnames = contributions[0].keys()
 
-    with open(output_file, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(contributions)
-    print(f"Saved {len(contributions)} contributions to {output_file}")
+def extract_all(html_files, workers=None, parser='lxml'):
+    """
+    Extract the contributions of several pages across a process pool.
 
-def main():
-    working_dir: Path = Path(__file__).resolve().parent
-    # Directory containing HTML files
-    data_dir = working_dir / 'scrap-data' / 'scrap-data-250430T165525'
+    Args:
+        html_files (list): Paths of the HTML files
+        workers (int): Number of processes, by default the number of CPUs (1 extracts in the current process)
+        parser (str): Parser of extract_contributions
+
+    Returns:
+        list: Contributions of every page, in page order then in the order of each page
+    """
+    return list(iter_records(html_files, workers, parser, as_records=False))
+
+
+def iter_records(html_files, workers=None, parser='lxml', as_records=True):
+    """
+    Extract the contributions of several pages as a stream, one page after the other.
+
+    Args:
+        html_files (list): Paths of the HTML files
+        workers (int): Number of processes of extract_pages
+        parser (str): Parser of extract_contributions
+        as_records (bool): Yield records as written to the output files instead of parsed contributions
+
+    Yields:
+        dict: Contributions of every page, in page order then in the order of each page
+    """
+    for contributions in extract_pages(sorted(html_files, key=page_number), workers, parser):
+        for contribution in contributions:
+            yield contribution_record(contribution) if as_records else contribution
+
+
+def contribution_record(contribution):
+    """Return a contribution as stored in the output files (time as 'YYYY-MM-DD HH:MM:SS')."""
+    time = contribution['time']
+    return {
+        'number': contribution['number'],
+        'user': contribution['user'],
+        'time': time.strftime('%Y-%m-%d %H:%M:%S') if isinstance(time, datetime) else time,
+        'body': contribution['body'],
+    }
+
+
+def file_sha256(path):
+    """Return the SHA-256 of a file content."""
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def load_extraction_manifest(output_dir):
+    """Load the manifest of the pages already extracted into output_dir (an empty one if there is none)."""
+    manifest_path = Path(output_dir) / EXTRACTION_MANIFEST_NAME
+    if manifest_path.exists():
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    return {'pages': {}}
+
+
+def iter_dataset(output_dir):
+    """
+    Read the contributions extracted by the previous runs, one at a time, in their stored order
+    (by decreasing number, as save_records writes them).
+
+    Args:
+        output_dir (Path): Output directory of the previous runs
+
+    Yields:
+        dict: Records of contributions.jsonl (or of contributions.json, written before JSONL outputs existed)
+    """
+    jsonl_path = Path(output_dir) / 'contributions.jsonl'
+    json_path = Path(output_dir) / 'contributions.json'
+    if jsonl_path.exists():
+        with open(jsonl_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+    elif json_path.exists():
+        with open(json_path, 'r', encoding='utf-8') as file:
+            yield from iter_json_array(file)
+
+
+def parse_number(number):
+    """Return a contribution number as an int, None if it is missing or not numeric."""
+    try:
+        return int(number)
+    except (TypeError, ValueError):
+        return None
+
+
+def merge_records(dataset, extracted, listed_numbers, delta):
+    """
+    Merge the extracted contributions into the dataset stream, by decreasing number.
+
+    Args:
+        dataset (iterable): Records of the previous dataset, by decreasing number
+        extracted (dict): Records of the parsed pages, by number (numeric strings only)
+        listed_numbers (set): Numbers listed by at least one current page
+        delta (dict): Delta whose 'added', 'updated' and 'removed' lists are filled
+
+    Yields:
+        dict: Records of the merged dataset, by decreasing number
+    """
+    extracted_numbers = sorted(extracted, key=int, reverse=True)
+    position = 0
+    for record in dataset:
+        number = parse_number(record.get('number'))
+        if number is None:
+            print(f"Skipping a contribution of the dataset without a valid number: {record.get('number')!r}")
+            continue
+        # Extracted numbers greater than the current one are not in the dataset
+        while position < len(extracted_numbers) and int(extracted_numbers[position]) > number:
+            delta['added'].append(extracted[extracted_numbers[position]])
+            yield extracted[extracted_numbers[position]]
+            position += 1
+        if record['number'] in extracted:
+            position += 1
+            if extracted[record['number']] != record:
+                delta['updated'].append(extracted[record['number']])
+            yield extracted[record['number']]
+        elif record['number'] in listed_numbers:
+            yield record
+        else:
+            delta['removed'].append(record['number'])
+    for number in extracted_numbers[position:]:
+        delta['added'].append(extracted[number])
+        yield extracted[number]
+
+
+def extract_incremental(html_files, base_dir, output_dir, workers=None, full=False):
+    """
+    Extract the new and changed pages, and merge their contributions into the dataset by number.
+
+    The manifest of output_dir records the SHA-256 of each page extracted (by path relative to
+    base_dir) and the contribution numbers it produced, so that unchanged pages are not parsed
+    again. A number extracted with different contents from two pages of the run is a conflict,
+    resolved in favor of the page listed last (the most recent snapshot). Contributions no
+    page lists anymore are removed.
+
+    Only the contributions of the parsed pages are held in memory: the previous dataset is
+    streamed from contributions.jsonl and merged into the new output files.
 
-    # Get all HTML files in the directory
-    html_files = list(data_dir.glob('*.html'))
+    Args:
+        html_files (list): Paths of the current copy of every page, oldest snapshot first
+        base_dir (Path): Directory the page paths of the manifest are relative to
+        output_dir (Path): Directory of the output files, the manifest and the deltas
+        workers (int): Number of processes of extract_pages
+        full (bool): Parse every page, ignoring the manifest
+
+    Returns:
+        dict: The delta ('added' and 'updated' contributions, 'removed' numbers, 'conflicts'),
+            with the counts of 'parsed_pages' and 'total' contributions
+    """
+    output_dir = Path(output_dir)
+    manifest = {'pages': {}} if full else load_extraction_manifest(output_dir)
+    pages = {str(Path(html_file).resolve().relative_to(Path(base_dir).resolve())): html_file
+             for html_file in html_files}
+    hashes = {page: file_sha256(html_file) for page, html_file in pages.items()}
+    changed = [page for page in pages if manifest['pages'].get(page, {}).get('sha256') != hashes[page]]
+    dropped = set(manifest['pages']) - set(pages)
+
+    extracted, sources, conflicts = {}, {}, []
+    for page, contributions in zip(changed, extract_pages([pages[page] for page in changed], workers)):
+        numbers = []
+        for contribution in contributions:
+            record = contribution_record(contribution)
+            number = record['number']
+            if parse_number(number) is None:
+                print(f"Skipping a contribution of {page} without a valid number: {number!r}")
+                continue
+            if number in extracted and extracted[number] != record:
+                conflicts.append({'number': number, 'pages': [sources[number], page]})
+            extracted[number], sources[number] = record, page
+            numbers.append(number)
+        manifest['pages'][page] = {'sha256': hashes[page], 'numbers': numbers}
+    for page in dropped:
+        del manifest['pages'][page]
+
+    delta = {'added': [], 'updated': [], 'removed': [], 'conflicts': conflicts, 'parsed_pages': len(changed),
+             'total': None}
+    if changed or dropped:
+        listed_numbers = {number for entry in manifest['pages'].values() for number in entry['numbers']}
+        delta['total'] = save_records(merge_records(iter_dataset(output_dir), extracted, listed_numbers, delta),
+                                      output_dir)
+        if delta['added'] or delta['updated'] or delta['removed']:
+            save_delta(delta, output_dir / f"delta-{datetime.now():%y%m%dT%H%M%S}.json")
+        save_manifest(manifest, output_dir)
+    else:
+        delta['total'] = sum(len(entry['numbers']) for entry in manifest['pages'].values())
+    return delta
+
+
+def save_delta(delta, output_file):
+    """
+    Save the changes of an extraction, to be applied to the database with `flask apply-contributions-delta`.
+
+    Args:
+        delta (dict): Output of extract_incremental
+        output_file (Path): Path to the output JSON file
+    """
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({key: delta[key] for key in ('added', 'updated', 'removed', 'conflicts')}, f,
+                  ensure_ascii=False, indent=4, sort_keys=True)
+        f.write('\n')
+    print(f"Saved {len(delta['added'])} added, {len(delta['updated'])} updated and "
+          f"{len(delta['removed'])} removed contributions to {output_file}")
 
-    all_contributions = []
 
-    # Process each HTML file
-    for html_file in html_files:
-        print(f"Processing {html_file}...")
-        contributions = extract_contributions(html_file)
-        all_contributions.extend(contributions)
-        print(f"Found {len(contributions)} contributions in {html_file}")
+def save_manifest(manifest, output_dir):
+    """Write the extraction manifest atomically, once the dataset it describes is written."""
+    manifest_path = Path(output_dir) / EXTRACTION_MANIFEST_NAME
+    temporary_path = manifest_path.with_suffix('.tmp')
+    with open(temporary_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.write('\n')
+    temporary_path.replace(manifest_path)
 
-    print(f"Total contributions extracted: {len(all_contributions)}")
 
-    # Save the extracted data to files
-    output_dir = data_dir / "extracted"
-    output_dir.mkdir(exist_ok=True)
+def save_records(records, output_dir):
+    """
+    Save a stream of contributions to contributions.json, contributions.jsonl and contributions.csv in one pass.
 
-    save_to_json(all_contributions, str(output_dir / 'contributions.json'))
-    save_to_csv(all_contributions, str(output_dir / 'contributions.csv'))
+    Each record is written to the three files as it comes, so memory does not grow with the
+    corpus. contributions.json keeps its format (an indented array with sorted keys). Files are
+    written next to the previous ones and replace them once complete, so that the previous
+    dataset can be the source of the stream.
 
-    # Print a sample of the extracted data
-    if all_contributions:
-        print("\nSample contribution:")
-        sample = all_contributions[0]
-        print(f"Number: {sample['number']}")
-        print(f"User: {sample['user']}")
-        print(f"Time: {sample['time']}")
-        print(f"Body: {sample['body'][:100]}...")
+    Args:
+        records (iterable): Records with the 'number', 'user', 'time' and 'body' keys
+        output_dir (Path): Directory of the output files
+
+    Returns:
+        int: Number of contributions saved
+    """
+    output_dir = Path(output_dir)
+    paths = [output_dir / f'contributions.{extension}' for extension in ('json', 'jsonl', 'csv')]
+    temporary_paths = [path.with_name(f'{path.name}.tmp') for path in paths]
+    count = 0
+    with open(temporary_paths[0], 'w', encoding='utf-8') as json_file, \
+            open(temporary_paths[1], 'w', encoding='utf-8') as jsonl_file, \
+            open(temporary_paths[2], 'w', encoding='utf-8', newline='') as csv_file:
+        csv_writer = csv.DictWriter(csv_file, fieldnames=RECORD_FIELDS)
+        csv_writer.writeheader()
+        json_file.write('[')
+        for record in records:
+            json_file.write(',\n' if count else '\n')
+            # Only the newlines of the indentation are raw in JSON (textwrap would also split at U+2028)
+            json_file.write('    ' + json.dumps(record, ensure_ascii=False, indent=4, sort_keys=True).replace('\n', '\n    '))
+            jsonl_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            csv_writer.writerow(record)
+            count += 1
+        json_file.write('\n]\n' if count else ']')
+    for temporary_path, path in zip(temporary_paths, paths):
+        temporary_path.replace(path)
+    print(f"Saved {count} contributions to {', '.join(str(path) for path in paths)}")
+    return count
+
+
+def current_page_files(scrap_data_dir):
+    """
+    Return the current copy of every scraped page, oldest snapshot first.
+
+    The scrape manifest written by scrap.py points to the latest copy of each page; without
+    it, the pages of the most recent snapshot directory are used.
+
+    Args:
+        scrap_data_dir (Path): The scrap-data directory
+
+    Returns:
+        list: Paths of the HTML files
+    """
+    scrape_manifest_path = scrap_data_dir / 'manifest.json'
+    if scrape_manifest_path.exists():
+        with open(scrape_manifest_path, 'r', encoding='utf-8') as file:
+            files = sorted(entry['file'] for entry in json.load(file)['pages'].values())
+        return [scrap_data_dir / file for file in files]
+    snapshots = sorted(scrap_data_dir.glob('scrap-data-*'))
+    return sorted(snapshots[-1].glob('contrib-page-*.html'), key=page_number) if snapshots else []
+
+
+def main():
+    working_dir: Path = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(description="Extract the contributions of the scraped pages.")
+    parser.add_argument('--scrap-data-dir', type=Path, default=working_dir / 'scrap-data',
+                        help="Directory of the scrape snapshots and manifest")
+    parser.add_argument('--output-dir', type=Path, default=None, help="Default: <scrap-data-dir>/extracted")
+    parser.add_argument('--workers', type=int, default=None, help="Number of processes (default: number of CPUs)")
+    parser.add_argument('--full', action='store_true', help="Parse every page, ignoring the manifest")
+    args = parser.parse_args()
+
+    # Directory containing HTML files
+    html_files = current_page_files(args.scrap_data_dir)
+    output_dir = args.output_dir or args.scrap_data_dir / "extracted"
+    output_dir.mkdir(exist_ok=True, parents=True)
+
+    # Process the new and changed HTML files in parallel
+    print(f"Checking {len(html_files)} files...")
+    delta = extract_incremental(html_files, args.scrap_data_dir, output_dir, args.workers, args.full)
+
+    print(f"Parsed {delta['parsed_pages']} new or changed pages: {len(delta['added'])} added, "
+          f"{len(delta['updated'])} updated, {len(delta['removed'])} removed contributions "
+          f"({delta['total']} in total)")
+    for conflict in delta['conflicts']:
+        print(f"Conflict: contribution {conflict['number']} differs in {' and '.join(conflict['pages'])}, "
+              f"kept the version of {conflict['pages'][-1]}")
 
 if __name__ == "__main__":
     main()
@@ -1,40 +1,315 @@
-import urllib3
-from pathlib import Path
+#!/usr/bin/env python3
+"""
+Incremental scraper of the contributions of the registre.
+
+Contribution pages are listed newest first (page 1 holds the last contributions), so the
+scraper fetches them in order, a window of pages at a time, over one pool of keep-alive
+connections, and stops at the first page that holds nothing new. Each page is requested with
+the ETag / Last-Modified validators recorded in scrap-data/manifest.json at the previous run,
+and the manifest keeps, for every page, the SHA-256 of its content, the contribution numbers it
+lists and the snapshot file holding its latest copy. Only new or changed pages are written to
+a new scrap-data-<timestamp> snapshot directory.
+
+Usage:
+    python scripts/scrap.py                          # one incremental run
+    python scripts/scrap.py --full                   # fetch every page
+    python scripts/scrap.py --start-at 2025-04-30T18:00 --every 24
+    python scripts/scrap.py --init-from scripts/scrap-data/scrap-data-250430T165525
+"""
+import argparse
+import hashlib
 import html
-from tqdm import tqdm
+import json
 import re
-from datetime import datetime
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import urllib3
+from tqdm import tqdm
+from urllib3.util.retry import Retry
+
+CONTRIB_BASE_URL: str = "https://www.registre-dematerialise.fr/6058/contributions/"
+SCRAP_DATA_DIR: Path = Path(__file__).resolve().parent / "scrap-data"
+MANIFEST_NAME: str = "manifest.json"
+
+PAGE_COUNT_PATTERN = re.compile('data-max="(.*?)" data-url=')
+CONTRIB_NUMBER_PATTERN = re.compile(r'Contribution n°(\d+)')
+
+
+def page_file_name(page: int) -> str:
+    return f"contrib-page-{page}.html"
+
+
+def page_entry(content: str, file: str, etag=None, last_modified=None) -> dict:
+    """
+    Build the manifest entry of a page.
+
+    Args:
+        content (str): Unescaped HTML of the page, as written to disk
+        file (str): Path of the snapshot file, relative to the scrap-data directory
+        etag (str): ETag header of the response
+        last_modified (str): Last-Modified header of the response
+
+    Returns:
+        dict: Entry with the validators, content hash and contribution numbers of the page
+    """
+    return {
+        'file': file,
+        'sha256': hashlib.sha256(content.encode('utf-8')).hexdigest(),
+        'numbers': [int(number) for number in CONTRIB_NUMBER_PATTERN.findall(content)],
+        'etag': etag,
+        'last_modified': last_modified,
+    }
+
+
+def load_manifest(data_dir: Path) -> dict:
+    """Load the manifest of a scrap-data directory (an empty one if there is none)."""
+    manifest_path = data_dir / MANIFEST_NAME
+    if manifest_path.exists():
+        return json.loads(manifest_path.read_text(encoding='utf-8'))
+    return {'page_count': None, 'pages': {}}
+
+
+def save_manifest(data_dir: Path, manifest: dict):
+    """Write the manifest atomically, so that an interrupted run keeps the previous one."""
+    manifest_path = data_dir / MANIFEST_NAME
+    temporary_path = manifest_path.with_suffix('.tmp')
+    temporary_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True) + '\n',
+                              encoding='utf-8')
+    temporary_path.replace(manifest_path)
+
+
+def seed_manifest(data_dir: Path, snapshot_dir: Path) -> dict:
+    """
+    Build the manifest of an existing snapshot, without any request.
+
+    Args:
+        data_dir (Path): The scrap-data directory
+        snapshot_dir (Path): Snapshot directory holding contrib-page-*.html files
+
+    Returns:
+        dict: The manifest, also written to the scrap-data directory
+    """
+    manifest = {'page_count': None, 'pages': {}, 'scraped_at': None}
+    for path in snapshot_dir.glob('contrib-page-*.html'):
+        page = int(path.stem.rsplit('-', 1)[1])
+        manifest['pages'][str(page)] = page_entry(path.read_text(encoding='utf-8'),
+                                                  str(path.relative_to(data_dir)))
+    if manifest['pages']:
+        manifest['page_count'] = max(int(page) for page in manifest['pages'])
+    save_manifest(data_dir, manifest)
+    return manifest
+
+
+class Scraper:
+    """
+    Scraper of the contribution pages, sharing one connection pool between its threads.
+
+    Transient failures (connection errors, 429 and 5xx responses) are retried with an
+    exponential backoff, honoring Retry-After.
+    """
+
+    def __init__(self, base_url: str = CONTRIB_BASE_URL, data_dir: Path = SCRAP_DATA_DIR,
+                 concurrency: int = 4, retries: int = 5, backoff_factor: float = 0.5, timeout: float = 30.0):
+        """
+        Initialize the scraper.
+
+        Args:
+            base_url (str): URL of the contribution pages, followed by the page number
+            data_dir (Path): The scrap-data directory, holding the manifest and the snapshots
+            concurrency (int): Number of pages fetched at the same time (and of pooled connections)
+            retries (int): Maximum number of retries of a request
+            backoff_factor (float): Base delay of the exponential backoff, in seconds
+            timeout (float): Timeout of a request, in seconds
+        """
+        self.base_url = base_url
+        self.data_dir = data_dir
+        self.concurrency = concurrency
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=('GET',), respect_retry_after_header=True)
+        # block=True: threads wait for a free connection instead of opening extra ones
+        self.http = urllib3.PoolManager(num_pools=1, maxsize=concurrency, block=True, retries=retry,
+                                        timeout=urllib3.Timeout(total=timeout))
+
+    def fetch_page(self, page: int, entry=None) -> dict:
+        """
+        Fetch a page, conditionally if its validators are known.
+
+        Args:
+            page (int): Page number
+            entry (dict): Manifest entry of the page at the previous run
+
+        Returns:
+            dict: 'page', 'status' (200 or 304), and for a 200 response the unescaped
+                'content' and the 'etag' and 'last_modified' headers
+        """
+        headers = {}
+        if entry is not None and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry is not None and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        response = self.http.request('GET', f"{self.base_url}{page}", headers=headers)
+        if response.status == 304:
+            return {'page': page, 'status': 304}
+        if response.status != 200:
+            raise RuntimeError(f"Unexpected status {response.status} for page {page}")
+        return {
+            'page': page,
+            'status': 200,
+            'content': html.unescape(response.data.decode('utf-8')),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+
+    def scrape(self, full: bool = False) -> dict:
+        """
+        Fetch the new and changed pages, and update the manifest.
+
+        A page holds nothing new when the server answers 304, when its content hash is the
+        one recorded for it, or when every contribution it lists was already scraped (new
+        contributions shift the older ones to the following pages). Without full, the scrape
+        stops at the first such page, after the window of pages being fetched.
+
+        Args:
+            full (bool): Fetch every page, even after an unchanged one
+
+        Returns:
+            dict: Counters of the run ('fetched', 'not_modified', 'unchanged', 'written'),
+                its 'page_count' and its 'snapshot' directory (None if nothing was written)
+        """
+        manifest = load_manifest(self.data_dir)
+        known_numbers = {number for entry in manifest['pages'].values() for number in entry['numbers']}
+        snapshot_name = f"scrap-data-{datetime.now().strftime('%y%m%dT%H%M%S')}"
+        stats = {'fetched': 0, 'not_modified': 0, 'unchanged': 0, 'written': 0, 'page_count': None, 'snapshot': None}
+
+        first = self.fetch_page(1, manifest['pages'].get('1'))
+        if first['status'] == 304 and manifest.get('page_count') is None:
+            # The page count is read from page 1, which the manifest does not know it from
+            first = self.fetch_page(1)
+        if first['status'] == 304:
+            if not full:
+                stats['not_modified'] += 1
+                stats['page_count'] = manifest['page_count']
+                return stats
+            page_count = manifest['page_count']
+        else:
+            page_count = int(PAGE_COUNT_PATTERN.findall(first['content'])[0])
+        stats['page_count'] = page_count
+
+        results = [first]
+        next_page = 2
+        progress = tqdm(total=page_count, desc="Pages")
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while True:
+                stop = False
+                for result in results:
+                    progress.update(1)
+                    if not self._record(manifest, result, known_numbers, snapshot_name, stats) and not full:
+                        stop = True
+                if stop or next_page > page_count:
+                    break
+                window = range(next_page, min(next_page + self.concurrency, page_count + 1))
+                next_page = window.stop
+                results = list(executor.map(
+                    lambda page: self.fetch_page(page, manifest['pages'].get(str(page))), window
+                ))
+        progress.close()
 
-time.sleep(2*60*60+7*60)
+        # Pages beyond the new page count no longer exist
+        for page in [page for page in manifest['pages'] if int(page) > page_count]:
+            del manifest['pages'][page]
+        manifest['page_count'] = page_count
+        manifest['scraped_at'] = datetime.now().isoformat(timespec='seconds')
+        save_manifest(self.data_dir, manifest)
+        if stats['written']:
+            stats['snapshot'] = self.data_dir / snapshot_name
+        return stats
 
-contrib_base_url: str = "https://www.registre-dematerialise.fr/6058/contributions/"
-scrap_data: Path = Path(__file__).resolve().parent / "scrap-data" / f"scrap-data-{datetime.now().strftime('%y%m%dT%H%M%S')}"
-scrap_data.mkdir(exist_ok=True, parents=True)
+    def _record(self, manifest, result, known_numbers, snapshot_name, stats) -> bool:
+        """Write a fetched page if it changed and update its manifest entry; return False if it holds nothing new."""
+        key = str(result['page'])
+        if result['status'] == 304:
+            stats['not_modified'] += 1
+            return False
+        stats['fetched'] += 1
+        file = f"{snapshot_name}/{page_file_name(result['page'])}"
+        entry = page_entry(result['content'], file, result['etag'], result['last_modified'])
+        previous = manifest['pages'].get(key)
+        if previous is not None and previous['sha256'] == entry['sha256']:
+            # Same content: keep the file of the previous snapshot, refresh the validators
+            previous.update(etag=entry['etag'], last_modified=entry['last_modified'])
+            stats['unchanged'] += 1
+            return False
+        is_new = not set(entry['numbers']) <= known_numbers
+        snapshot_dir = self.data_dir / snapshot_name
+        snapshot_dir.mkdir(exist_ok=True, parents=True)
+        (snapshot_dir / page_file_name(result['page'])).write_text(result['content'], encoding='utf-8')
+        manifest['pages'][key] = entry
+        stats['written'] += 1
+        if not is_new:
+            stats['unchanged'] += 1
+        return is_new
 
-# Creating a PoolManager instance for sending requests.
-http = urllib3.PoolManager()
 
+def next_run(start_at, every, now=None):
+    """
+    Return the time of the next scheduled run.
 
-def write_html(hstr: str, p: Path):
-    with p.open('w+') as fp:
-        fp.write(hstr)
+    Args:
+        start_at (datetime): Time of the first run, None to start now
+        every (timedelta): Delay between two runs, None for a single run
+        now (datetime): Current time
 
+    Returns:
+        datetime: The first run time, or the first start_at + k * every still to come
+    """
+    now = now or datetime.now()
+    if start_at is None or start_at >= now:
+        return start_at or now
+    if every is None:
+        return now
+    periods = -(-(now - start_at) // every)  # Ceiling division
+    return start_at + periods * every
 
-def get_contrib_page_data(url: str) -> str:
-    # Sending a GET request and getting back response as HTTPResponse object.
-    resp = http.request("GET", url)
-    return html.unescape(resp.data.decode("utf-8"))
 
+def main():
+    parser = argparse.ArgumentParser(description="Scrap the contributions of the registre incrementally.")
+    parser.add_argument('--base-url', default=CONTRIB_BASE_URL)
+    parser.add_argument('--data-dir', type=Path, default=SCRAP_DATA_DIR)
+    parser.add_argument('--concurrency', type=int, default=4, help="Number of pages fetched at the same time")
+    parser.add_argument('--full', action='store_true', help="Fetch every page, even after an unchanged one")
+    parser.add_argument('--start-at', type=datetime.fromisoformat, default=None,
+                        help="Wait until this time before the first run, e.g. 2025-04-30T18:00")
+    parser.add_argument('--every', type=float, default=None, help="Run again every N hours")
+    parser.add_argument('--init-from', type=Path, default=None,
+                        help="Build the manifest from an existing snapshot directory, without fetching")
+    args = parser.parse_args()
 
-def get_last_contrib_page_number(url: str) -> int:
-    first_c_page = get_contrib_page_data(url + "1")
-    return int(re.findall('data-max="(.*?)" data-url=', first_c_page)[0])
+    if args.init_from is not None:
+        manifest = seed_manifest(args.data_dir, args.init_from.resolve())
+        print(f"Manifest built from {len(manifest['pages'])} pages of {args.init_from}")
+        return
 
+    scraper = Scraper(args.base_url, args.data_dir, args.concurrency)
+    every = timedelta(hours=args.every) if args.every else None
+    start_at = args.start_at
+    while True:
+        run_at = next_run(start_at, every)
+        delay = (run_at - datetime.now()).total_seconds()
+        if delay > 0:
+            print(f"Next scrape at {run_at.isoformat(timespec='seconds')}")
+            time.sleep(delay)
+        try:
+            stats = scraper.scrape(full=args.full)
+            print(f"Scrape done: {stats}")
+        except Exception as e:
+            print(f"Error scraping contributions: {str(e)}")
+        if every is None:
+            return
+        start_at = run_at + every
 
-for i in tqdm(range(1, get_last_contrib_page_number(contrib_base_url) + 1)):
-    write_html(
-        get_contrib_page_data(contrib_base_url + str(i)),
-        scrap_data / f"contrib-page-{i}.html"
-    )
 
+if __name__ == '__main__':
+    main()
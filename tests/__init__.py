@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# Importing the app no longer touches the database, so the tests run against their own database
+# instead of the development one (app/database/sqlite.db), which some tests empty
+_database_dir = tempfile.mkdtemp(prefix='verbatims-tests-')
+os.environ.setdefault('VERBATIMS_DB_PATH', os.path.join(_database_dir, 'sqlite.db'))
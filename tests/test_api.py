@@ -0,0 +1,94 @@
+import json
+import sys
+import unittest
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import app, db
+from app.models import Answer, Comment
+from app.pagination import encode_cursor
+
+
+class TestApi(unittest.TestCase):
+    """Test the read-only JSON API."""
+
+    def setUp(self):
+        """Add a few comments with answers."""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            comments = [Comment(username=f'user{i}', body=f'comment {i}', ip_address='10.0.0.1') for i in range(5)]
+            db.session.add_all(comments)
+            db.session.flush()
+            db.session.add_all([Answer(username='other', body='answer', comment_id=comments[1].id),
+                                Answer(username='other', body='answer 2', comment_id=comments[1].id)])
+            db.session.commit()
+            self.comment_ids = [comment.id for comment in comments]
+
+    def tearDown(self):
+        """Clean up after tests."""
+        with app.app_context():
+            for comment in Comment.query.filter(Comment.id.in_(self.comment_ids)):
+                db.session.delete(comment)
+            db.session.commit()
+            db.session.remove()
+
+    def get_json(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data)
+
+    def test_pages_and_fields(self):
+        """Pages follow each other with the requested fields only."""
+        # The table may hold other comments, start right before ours
+        cursor = encode_cursor({'after': self.comment_ids[0] - 1})
+        page = self.get_json(f'/api/comments?limit=2&fields=body,answers&cursor={cursor}')
+        self.assertEqual([comment['body'] for comment in page['data']], ['comment 0', 'comment 1'])
+        self.assertEqual(set(page['data'][0]), {'body', 'answers'})
+        self.assertEqual([answer['body'] for answer in page['data'][1]['answers']], ['answer', 'answer 2'])
+
+        next_page = self.get_json(f'/api/comments?limit=2&fields=id&cursor={page["next_cursor"]}')
+        self.assertEqual(next_page['data'], [{'id': self.comment_ids[2]}, {'id': self.comment_ids[3]}])
+        self.assertNotIn(b'10.0.0.1', self.client.get('/api/comments').data)
+
+    def test_unknown_field(self):
+        """Unknown or private fields are rejected."""
+        response = self.client.get('/api/comments?fields=id,ip_address')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ip_address', response.get_json()['error'])
+
+    def test_ndjson_stream_matches_pages(self):
+        """The NDJSON stream returns every row of the paginated mode."""
+        response = self.client.get('/api/contributions?format=ndjson&fields=id,time')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        streamed = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+
+        paged, cursor = [], ''
+        while cursor is not None:
+            page = self.get_json(f'/api/contributions?fields=id,time&limit=1000&cursor={cursor}')
+            paged.extend(page['data'])
+            cursor = page['next_cursor']
+        self.assertEqual(streamed, paged)
+
+        answers = self.client.get('/api/answers', headers={'Accept': 'application/x-ndjson'})
+        self.assertEqual(answers.mimetype, 'application/x-ndjson')
+
+    def test_etag(self):
+        """Repeated requests get a 304 until the data changes."""
+        response = self.client.get('/api/comments?fields=id')
+        etag = response.headers['ETag']
+        self.assertEqual(self.client.get('/api/comments?fields=id', headers={'If-None-Match': etag}).status_code, 304)
+
+        with app.app_context():
+            comment = Comment(username='late', body='late comment')
+            db.session.add(comment)
+            db.session.commit()
+            self.comment_ids.append(comment.id)
+        self.assertEqual(self.client.get('/api/comments?fields=id', headers={'If-None-Match': etag}).status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import json
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.corpus import generate_contributions, parse_size, write_corpus
+from benchmarks.run import flatten, summarize
+
+
+class TestBenchmarkCorpus(unittest.TestCase):
+    """Test the synthetic corpus generator of the benchmarks."""
+
+    def test_contributions_format(self):
+        """Contributions have the format of contributions.json and are reproducible."""
+        contributions = list(generate_contributions(50, seed=1))
+        self.assertEqual(contributions, list(generate_contributions(50, seed=1)))
+        self.assertNotEqual(contributions, list(generate_contributions(50, seed=2)))
+        self.assertEqual([c['number'] for c in contributions], [str(n) for n in range(1, 51)])
+        for contribution in contributions:
+            self.assertEqual(set(contribution), {'body', 'number', 'time', 'user'})
+            self.assertTrue(contribution['body'] and contribution['user'])
+            datetime.strptime(contribution['time'], '%Y-%m-%d %H:%M:%S')
+
+    def test_write_corpus(self):
+        """Written files are valid JSON with the requested number of items."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            contributions_path, comments_path = write_corpus(temp_dir, 40, comments=3)
+            with open(contributions_path, encoding='utf-8') as file:
+                self.assertEqual(len(json.load(file)), 40)
+            with open(comments_path, encoding='utf-8') as file:
+                comments = json.load(file)
+        self.assertEqual(len(comments), 3)
+        self.assertTrue(all('answers' in comment for comment in comments))
+
+    def test_parse_size(self):
+        """Sizes accept k and M suffixes."""
+        self.assertEqual([parse_size(size) for size in ('500', '1k', '100k', '1M')], [500, 1000, 100000, 1000000])
+
+    def test_results_helpers(self):
+        """Timings are summarized in milliseconds and nested results flattened."""
+        self.assertEqual(summarize([0.003, 0.001, 0.002]), {'min_ms': 1.0, 'median_ms': 2.0, 'p95_ms': 3.0, 'runs': 3})
+        self.assertEqual(flatten({'1k': {'cold': {'startup_ms': 5, 'label': 'x'}}}), {'1k.cold.startup_ms': 5})
+
+
+if __name__ == '__main__':
+    unittest.main()
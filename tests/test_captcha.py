@@ -0,0 +1,131 @@
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import app, db
+from app.captcha_pool import CaptchaPool, CaptchaReplaySet
+from app.utils import create_captcha_token, validate_captcha
+
+
+class TestCaptcha(unittest.TestCase):
+    """Test the signed captcha tokens and the on-demand captcha partial."""
+
+    def setUp(self):
+        """Set up test environment."""
+        app.config['TESTING'] = True
+        self.max_age = app.config['CAPTCHA_MAX_AGE']
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        """Clean up after tests."""
+        app.config['CAPTCHA_MAX_AGE'] = self.max_age
+
+    def test_token_validation(self):
+        """A token validates its answer only, case-insensitively, and does not contain it."""
+        token = create_captcha_token('AB12CD')
+        self.assertNotIn('AB12CD', token)
+        self.assertTrue(validate_captcha('ab12cd', token))
+        self.assertFalse(validate_captcha('AB12CE', create_captcha_token('AB12CD')))
+        self.assertFalse(validate_captcha('', create_captcha_token('AB12CD')))
+        self.assertFalse(validate_captcha('AB12CD', None))
+        self.assertFalse(validate_captcha('AB12CD', create_captcha_token('AB12CD')[:-2] + 'xx'))
+
+    def test_token_is_single_use(self):
+        """A token is consumed by its first submission, even with a wrong answer."""
+        token = create_captcha_token('AB12CD')
+        self.assertTrue(validate_captcha('AB12CD', token))
+        self.assertFalse(validate_captcha('AB12CD', token))
+
+        token = create_captcha_token('AB12CD')
+        self.assertFalse(validate_captcha('WRONG', token))
+        self.assertFalse(validate_captcha('AB12CD', token))
+
+    def test_expired_token(self):
+        """Tokens are rejected after CAPTCHA_MAX_AGE seconds."""
+        token = create_captcha_token('AB12CD')
+        app.config['CAPTCHA_MAX_AGE'] = -1
+        self.assertFalse(validate_captcha('AB12CD', token))
+
+    def test_captcha_is_loaded_on_demand(self):
+        """The discussion page renders no image, the captcha partial renders one with its token."""
+        client = app.test_client()
+        response = client.get('/discussion')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b'data:image/png', response.data)
+
+        response = client.get('/captcha')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'data:image/png;base64,', response.data)
+        self.assertIn(b'name="captcha_token"', response.data)
+        self.assertEqual(response.headers['Cache-Control'], 'no-store')
+
+
+class TestCaptchaPool(unittest.TestCase):
+    """Test the pre-rendered captcha pool and the replay set."""
+
+    def setUp(self):
+        """Use a pool with a fast fake renderer."""
+        self.rendered = 0
+        self.render_lock = threading.Lock()
+        self.pool = CaptchaPool(self.render, size=4, low_water=2, max_age=60, check_interval=0.05)
+
+    def tearDown(self):
+        """Clean up after tests."""
+        self.pool.stop()
+
+    def render(self):
+        with self.render_lock:
+            self.rendered += 1
+            return f'token-{self.rendered}', b'png'
+
+    def wait_for_depth(self, depth):
+        deadline = time.monotonic() + 5
+        while self.pool.stats()['depth'] < depth and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_take_from_stock(self):
+        """Captchas are served from the stock once filled, and rendered on the spot when it is empty."""
+        self.assertEqual(self.pool.take(), ('token-1', b'png'))
+        self.assertEqual(self.pool.stats()['misses'], 1)
+
+        self.wait_for_depth(4)
+        tokens = [self.pool.take()[0] for _ in range(3)]
+        self.assertEqual(len(set(tokens)), 3)
+        self.assertNotIn('token-1', tokens)
+        stats = self.pool.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (3, 1))
+
+        # The stock went below the low-water mark, the thread refills it
+        self.wait_for_depth(4)
+        self.assertEqual(self.pool.stats()['depth'], 4)
+
+    def test_expired_captchas_are_discarded(self):
+        """Captchas older than max_age are never served."""
+        self.pool.max_age = 0.05
+        self.pool.refill()
+        time.sleep(0.1)
+        self.pool.refill()
+        self.assertEqual(self.pool.stats()['expired'], 4)
+        self.pool.max_age = 60
+        self.assertNotIn(self.pool.take()[0], {'token-1', 'token-2', 'token-3', 'token-4'})
+
+    def test_replay_set(self):
+        """A nonce can only be claimed once until it expires."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            replay_set = CaptchaReplaySet(Path(temp_dir) / 'captchas.db')
+            self.assertTrue(replay_set.claim('nonce', time.time() + 60))
+            self.assertFalse(replay_set.claim('nonce', time.time() + 60))
+            self.assertTrue(replay_set.claim('expired', time.time() - 1))
+            self.assertTrue(replay_set.claim('other', time.time() + 60))
+            self.assertEqual(len(replay_set), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
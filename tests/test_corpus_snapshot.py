@@ -0,0 +1,109 @@
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import app, db
+from app.corpus_snapshot import CorpusSnapshot, corpus_snapshot, write_corpus_snapshot
+from app.database import DatabaseInitializer, get_corpus_version
+from app.models import Contribution, CorpusVersion
+from app.result_cache import fragment_cache, search_result_cache
+from app.search_index import contribution_index
+
+CONTRIBUTION_IDS = [910001, 910002, 910003]
+
+
+class TestCorpusSnapshot(unittest.TestCase):
+    """Test the memory-mapped snapshot of the contributions."""
+
+    def setUp(self):
+        """Add a few contributions and stamp a new corpus version."""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.directory = Path(tempfile.mkdtemp())
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([
+                Contribution(id=910001, contributor='Anonyme', body='Premier avis', time=datetime(2025, 4, 1, 9, 5)),
+                Contribution(id=910002, contributor='Jean Dupont', body='Deuxième avis,\nsur deux lignes \u2028 été',
+                             time=datetime(2025, 4, 2, 10, 30)),
+                Contribution(id=910003, contributor='Marie', body='', time=datetime(2025, 4, 3, 18, 45)),
+            ])
+            db.session.add(CorpusVersion(contribution_count=Contribution.query.count()))
+            db.session.commit()
+            self.version = get_corpus_version()
+            self.expected = {contrib.id: (contrib.id, contrib.anonymized_contributor, contrib.formatted_time,
+                                          contrib.body) for contrib in Contribution.query}
+
+    def tearDown(self):
+        """Clean up after tests."""
+        with app.app_context():
+            Contribution.query.filter(Contribution.id.in_(CONTRIBUTION_IDS)).delete(synchronize_session=False)
+            db.session.add(CorpusVersion(contribution_count=Contribution.query.count()))
+            db.session.commit()
+            db.session.remove()
+        shutil.rmtree(self.directory)
+
+    def write(self, name='snapshot.bin'):
+        with app.app_context():
+            write_corpus_snapshot(self.version, self.directory / name)
+        return CorpusSnapshot(self.directory / name)
+
+    def test_lookups(self):
+        """Id lookups and pages return the fields of the database."""
+        view = self.write().view(self.version)
+        self.assertEqual(len(view), len(self.expected))
+        self.assertEqual([tuple(contrib) for contrib in view.get([910002, 12345678, 910001, 910003])],
+                         [self.expected[910002], self.expected[910001], self.expected[910003]])
+        self.assertEqual(view.get([910002])[0].anonymized_contributor, 'Anonymisée')
+        self.assertEqual([tuple(contrib) for contrib in view.page(910001, 10)][:2],
+                         [self.expected[910002], self.expected[910003]])
+        self.assertEqual([contrib.id for contrib in view.page(None, 2)], sorted(self.expected)[:2])
+
+    def test_stale(self):
+        """A snapshot is only used for its corpus version, and reopened when the file is replaced."""
+        snapshot = self.write()
+        self.assertIsNone(snapshot.view('another-version'))
+        self.assertIsNotNone(snapshot.view(self.version))
+        with app.app_context():
+            Contribution.query.filter_by(id=910001).delete()
+            db.session.add(CorpusVersion(contribution_count=Contribution.query.count()))
+            db.session.commit()
+            new_version = get_corpus_version()
+            self.assertIsNone(snapshot.view(new_version))
+            write_corpus_snapshot(new_version, snapshot.path)
+        self.assertEqual(snapshot.view(new_version).get([910001, 910002])[0].id, 910002)
+        self.assertIsNone(CorpusSnapshot(self.directory / 'missing.bin').view(new_version))
+
+    def test_feed_matches_database(self):
+        """The feed renders the same page from the snapshot and from the database."""
+        DatabaseInitializer(app).load_search_index()
+        corpus_snapshot.open()
+        pages = {}
+        for source in ('database', 'snapshot'):
+            if source == 'snapshot':
+                self.assertTrue(DatabaseInitializer(app).update_corpus_snapshot())
+                self.assertFalse(DatabaseInitializer(app).update_corpus_snapshot())
+                with app.app_context():
+                    self.assertIsNotNone(corpus_snapshot.view(get_corpus_version()))
+            for cache in (search_result_cache, fragment_cache):
+                cache.clear()
+            pages[source] = self.client.get('/get-contributions?search=avis').data
+        self.assertIn('Deuxième'.encode('utf-8'), pages['snapshot'])
+        self.assertEqual(pages['snapshot'], pages['database'])
+
+        # Without the in-memory index, the feed pages through the snapshot
+        index_version, contribution_index.version = contribution_index.version, None
+        try:
+            fragment_cache.clear()
+            self.assertIn(b'Premier avis', self.client.get('/get-contributions').data)
+        finally:
+            contribution_index.version = index_version
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,14 +1,21 @@
+import json
 import os
 import sys
+import tempfile
+import time
 import unittest
+from datetime import datetime
 from pathlib import Path
+from unittest import mock
 
 # Add the parent directory to the Python path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 from app import app, db
 from app.models import Contribution
-from app.database import DatabaseInitializer
+from app.database import DatabaseInitializer, get_corpus_version, read_search_documents
+from app.search_index import ContributionIndex, contribution_index
+from app.views import current_search_index, search_contribution_ids
 
 
 class TestDatabaseInitializer(unittest.TestCase):
@@ -88,6 +95,108 @@ class TestDatabaseInitializer(unittest.TestCase):
                 self.assertIsNotNone(contribution.body)
                 self.assertIsNotNone(contribution.time)
 
+    def test_apply_contributions_delta(self):
+        """Test the apply_contributions_delta method."""
+        item = {'number': '900001', 'user': 'Test User', 'body': 'Premier avis', 'time': '2025-05-02 10:30:00'}
+        other_item = dict(item, number='900002', user='Anonyme')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            delta_path = Path(temp_dir) / 'delta.json'
+            delta_path.write_text(json.dumps({'added': [item, other_item], 'updated': [], 'removed': []}))
+            stats = self.db_initializer.apply_contributions_delta(delta_path)
+            self.assertEqual((stats['inserted'], stats['updated'], stats['deleted']), (2, 0, 0))
+            with app.app_context():
+                contribution = db.session.get(Contribution, 900001)
+                self.assertEqual(contribution.body, 'Premier avis')
+                self.assertIn('premier avis', contribution.search_text)
+
+            delta_path.write_text(json.dumps({'added': [], 'updated': [dict(item, body='Avis modifié')],
+                                              'removed': ['900002']}))
+            stats = self.db_initializer.apply_contributions_delta(delta_path)
+            self.assertEqual((stats['inserted'], stats['updated'], stats['deleted']), (0, 1, 1))
+            with app.app_context():
+                self.assertEqual(db.session.get(Contribution, 900001).body, 'Avis modifié')
+                self.assertIsNone(db.session.get(Contribution, 900002))
+
+            delta_path.write_text(json.dumps({'added': [], 'updated': [], 'removed': ['900001']}))
+            self.db_initializer.apply_contributions_delta(delta_path)
+
+    def test_delta_is_searched_through_the_index(self):
+        """After a delta, searches of the importing process and of other workers use an up-to-date index."""
+        item = {'number': '900003', 'user': 'Anonyme', 'body': 'Funiculaire xylophone', 'time': '2025-05-02 10:30:00'}
+        with tempfile.TemporaryDirectory() as temp_dir:
+            delta_path = Path(temp_dir) / 'delta.json'
+            delta_path.write_text(json.dumps({'added': [item], 'updated': [], 'removed': []}))
+            try:
+                self.db_initializer.apply_contributions_delta(delta_path)
+                with app.app_context():
+                    version = get_corpus_version()
+                    self.assertIs(current_search_index(version), contribution_index)
+                    self.assertEqual(search_contribution_ids(['xylophone'], 'relevance', version), [900003])
+
+                    # A worker forked before the import rebuilds its index in the background
+                    stale_index = ContributionIndex()
+                    stale_index.build([], version='stale')
+
+                    def load_documents():
+                        with app.app_context():
+                            return read_search_documents()
+
+                    self.assertIsNone(stale_index.view(version, load_documents))
+                    for _ in range(100):
+                        if stale_index.view(version) is not None:
+                            break
+                        time.sleep(0.05)
+                    self.assertEqual(stale_index.view(version).search(['xylophone']), [900003])
+            finally:
+                delta_path.write_text(json.dumps({'added': [], 'updated': [], 'removed': ['900003']}))
+                self.db_initializer.apply_contributions_delta(delta_path)
+
+    def test_punctuation_is_part_of_the_cache_key(self):
+        """Keywords with the same tokens but different punctuation do not share cached results."""
+        fts_enabled = app.config.get('SEARCH_FTS_ENABLED')
+        app.config['SEARCH_FTS_ENABLED'] = False
+        try:
+            with app.app_context():
+                db.session.add_all([
+                    Contribution(id=900004, contributor='Anonyme', body='Hausse de 100% zygomatique',
+                                 time=datetime(2025, 5, 2, 10, 30)),
+                    Contribution(id=900005, contributor='Anonyme', body='Baisse de 100 zygomatique',
+                                 time=datetime(2025, 5, 2, 10, 30)),
+                ])
+                db.session.commit()
+                version = f'punctuation-test-{time.time()}'
+                # The LIKE search matches the keywords as typed
+                with mock.patch('app.views.current_search_index', return_value=None):
+                    self.assertEqual(search_contribution_ids(['zygomatique', '100%'], 'id', version), [900004])
+                    self.assertEqual(search_contribution_ids(['zygomatique', '100'], 'id', version), [900004, 900005])
+                    self.assertEqual(search_contribution_ids(['ZYGOMATIQUE', '100%'], 'id', version), [900004])
+        finally:
+            app.config['SEARCH_FTS_ENABLED'] = fts_enabled
+            with app.app_context():
+                Contribution.query.filter(Contribution.id.in_([900004, 900005])).delete()
+                db.session.commit()
+
+    def test_import_contributions(self):
+        """Test that the import_contributions method only writes the rows that changed."""
+        items = [{'number': str(900010 + index), 'user': 'Anonyme', 'body': f'Avis {index}',
+                  'time': '2025-05-02 10:30:00'} for index in range(3)]
+        try:
+            stats = self.db_initializer.import_contributions(items, batch_size=2)
+            self.assertEqual((stats['inserted'], stats['updated'], stats['unchanged']), (3, 0, 0))
+
+            items[1]['body'] = 'Avis modifié'
+            stats = self.db_initializer.import_contributions(items, batch_size=2)
+            self.assertEqual((stats['inserted'], stats['updated'], stats['unchanged']), (0, 1, 2))
+            with app.app_context():
+                contribution = db.session.get(Contribution, 900011)
+                self.assertEqual(contribution.body, 'Avis modifié')
+                self.assertIn('avis modifie', contribution.search_text)
+                self.assertEqual(contribution.formatted_time, 'Le 02/05/2025 à 10h30')
+        finally:
+            with app.app_context():
+                Contribution.query.filter(Contribution.id.between(900010, 900012)).delete()
+                db.session.commit()
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
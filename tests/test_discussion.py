@@ -0,0 +1,182 @@
+import sys
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import event
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import app, db
+from app.discussion_events import latest_event_id, max_streams, stream_slots
+from app.models import Answer, Comment, DiscussionEvent
+from app.utils import create_captcha_token
+from app.views import get_comments_page
+
+
+class TestDiscussionPages(unittest.TestCase):
+    """Test the paginated loading of comments and their answers."""
+
+    def setUp(self):
+        """Add comments newer than any existing one, with up to 2 answers each."""
+        app.config['TESTING'] = True
+        start = datetime(2100, 1, 1)
+        with app.app_context():
+            db.create_all()
+            comments = [Comment(username=f'user{i}', body=f'comment {i}', created_at=start + timedelta(minutes=i))
+                        for i in range(45)]
+            # Two comments at the same time, the cursor must not skip or repeat any of them
+            comments[20].created_at = comments[21].created_at
+            db.session.add_all(comments)
+            db.session.flush()
+            for i, comment in enumerate(comments):
+                db.session.add_all(Answer(username='other', body=f'answer {j}', comment_id=comment.id)
+                                   for j in range(i % 3))
+            db.session.commit()
+            self.comment_ids = [comment.id for comment in comments]
+
+    def tearDown(self):
+        """Clean up after tests."""
+        with app.app_context():
+            for comment in Comment.query.filter(Comment.id.in_(self.comment_ids)):
+                db.session.delete(comment)
+            db.session.commit()
+            db.session.remove()
+
+    def test_pages_cover_comments_newest_first(self):
+        """Pages follow each other without gaps or duplicates."""
+        with app.app_context():
+            first_page, cursor = get_comments_page(per_page=20)
+            second_page, cursor = get_comments_page(cursor, per_page=20)
+            third_page, _ = get_comments_page(cursor, per_page=20)
+        seen = [comment.id for comment in first_page + second_page + third_page][:45]
+        self.assertEqual(sorted(seen), sorted(self.comment_ids))
+        self.assertEqual(seen[0], self.comment_ids[-1])
+
+    def test_json_lists_every_comment_unless_paged(self):
+        """format=json returns every comment, and a page only when limit or cursor is given."""
+        client = app.test_client()
+        response = client.get('/discussion?format=json')
+        ids = [comment['id'] for comment in response.get_json()]
+        self.assertTrue(set(self.comment_ids) <= set(ids))
+        self.assertEqual(ids[0], self.comment_ids[-1])
+        self.assertNotIn('X-Next-Cursor', response.headers)
+
+        response = client.get('/discussion?format=json&limit=10')
+        self.assertEqual(len(response.get_json()), 10)
+        next_page = client.get(f"/discussion?format=json&cursor={response.headers['X-Next-Cursor']}&limit=10")
+        self.assertEqual([comment['id'] for comment in response.get_json() + next_page.get_json()], ids[:20])
+
+    def test_constant_number_of_queries(self):
+        """A page and every answer of its comments are loaded in two queries."""
+        statements = []
+
+        def count_statement(*args):
+            statements.append(args[2])
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', count_statement)
+            try:
+                comments, _ = get_comments_page(per_page=30)
+                answer_count = sum(len(comment.answers) for comment in comments)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', count_statement)
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(answer_count, sum(i % 3 for i in range(15, 45)))
+
+    def test_next_page_is_loaded_with_htmx(self):
+        """The discussion page links to the next page, which renders only comments."""
+        client = app.test_client()
+        response = client.get('/discussion')
+        self.assertIn(b'hx-trigger="revealed"', response.data)
+        cursor = response.data.split(b'/discussion?cursor=')[1].split(b'"')[0].decode()
+
+        response = client.get(f'/discussion?cursor={cursor}', headers={'HX-Request': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b'comment-form', response.data)
+        self.assertIn(b'comment 24', response.data)
+
+
+class TestDiscussionEvents(unittest.TestCase):
+    """Test the live updates of the discussion."""
+
+    def setUp(self):
+        """Set up test environment."""
+        app.config['TESTING'] = True
+        self.max_duration = app.config['DISCUSSION_EVENTS_MAX_DURATION']
+        app.config['DISCUSSION_EVENTS_MAX_DURATION'] = 0
+        self.client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            self.first_event_id = latest_event_id()
+
+    def tearDown(self):
+        """Clean up after tests."""
+        app.config['DISCUSSION_EVENTS_MAX_DURATION'] = self.max_duration
+        with app.app_context():
+            for discussion_event in DiscussionEvent.query.filter(DiscussionEvent.id > self.first_event_id):
+                Comment.query.filter_by(id=discussion_event.comment_id).delete()
+                Answer.query.filter_by(comment_id=discussion_event.comment_id).delete()
+                db.session.delete(discussion_event)
+            db.session.commit()
+            db.session.remove()
+
+    def post(self, url, body):
+        return self.client.post(url, headers={'HX-Request': 'true'}, data={
+            'username': 'reader', 'body': body, 'captcha': 'ABC', 'captcha_token': create_captcha_token('ABC')
+        })
+
+    def test_new_comments_and_answers_are_streamed(self):
+        """Comments and answers are published as pre-rendered fragments, from the given event on."""
+        response = self.post('/discussion', 'live comment')
+        # The author only gets the form back, with the comment inserted out-of-band
+        self.assertIn(b'id="comment-form"', response.data)
+        self.assertIn(b'hx-swap-oob="afterbegin:#comment-items"', response.data)
+        self.assertIn(b'live comment', response.data)
+        self.assertNotIn(b'comments-list', response.data)
+
+        with app.app_context():
+            comment_id = DiscussionEvent.query.order_by(DiscussionEvent.id.desc()).first().comment_id
+        self.post(f'/comment/{comment_id}/answer', 'live answer')
+
+        stream = self.client.get(f'/discussion/events?after={self.first_event_id}')
+        self.assertEqual(stream.mimetype, 'text/event-stream')
+        messages = stream.data.decode('utf-8').split('\n\n')
+        events = [message for message in messages if message.startswith('id: ')]
+        self.assertEqual(len(events), 2)
+        self.assertIn('event: comment', events[0])
+        self.assertIn(f'id=\\"comment-{comment_id}\\"', events[0])
+        self.assertIn('event: answer', events[1])
+        self.assertIn('live answer', events[1])
+        stream.close()
+
+        # A reconnecting client resumes after the last event it received
+        last_event_id = events[1].split('\n')[0][len('id: '):]
+        resumed = self.client.get('/discussion/events', headers={'Last-Event-ID': last_event_id})
+        self.assertNotIn('id: ', resumed.data.decode('utf-8'))
+        resumed.close()
+
+    def test_streams_are_capped_per_worker(self):
+        """Above the share of the worker threads, clients are told to retry later; closed streams free their slot."""
+        self.assertEqual([max_streams(threads, 0.75) for threads in (1, 2, 4, 8)], [1, 1, 3, 6])
+        limit = max_streams(app.config['WORKER_THREADS'], app.config['DISCUSSION_EVENTS_STREAM_SHARE'])
+        self.assertLess(limit, app.config['WORKER_THREADS'])
+        for _ in range(limit):
+            self.assertTrue(stream_slots.acquire(limit))
+        try:
+            refused = self.client.get('/discussion/events')
+        finally:
+            for _ in range(limit):
+                stream_slots.release()
+        self.assertEqual(refused.status_code, 503)
+        self.assertIn('retry: ', refused.data.decode('utf-8'))
+        self.assertIn('Retry-After', refused.headers)
+
+        stream = self.client.get('/discussion/events')
+        self.assertEqual(stream.status_code, 200)
+        stream.close()
+        self.assertEqual(stream_slots.open, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import gzip
+import hashlib
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import app, db
+from app.downloads import DownloadManifest, download_manifest
+
+
+class TestDownloadManifest(unittest.TestCase):
+    """Test the index of the downloadable files."""
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        (self.root / 'data').mkdir()
+        (self.root / 'data' / 'table.csv').write_text('a,b\n1,2\n', encoding='utf-8')
+        (self.root / 'data' / 'table.csv.gz').write_bytes(gzip.compress(b'a,b\n1,2\n'))
+        (self.root / 'notes.txt').write_text('notes', encoding='utf-8')
+        self.manifest = DownloadManifest(self.root, check_interval=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_entries(self):
+        """Files are indexed by name with their hash and precompressed copies, which are not listed themselves."""
+        entry = self.manifest.get('table.csv')
+        self.assertEqual(entry['sha256'], hashlib.sha256(b'a,b\n1,2\n').hexdigest())
+        self.assertEqual((entry['size'], entry['mimetype'], entry['location']),
+                         (8, 'text/csv', 'resources/data/table.csv'))
+        self.assertEqual(entry['variants']['gzip']['location'], 'resources/data/table.csv.gz')
+        self.assertEqual(self.manifest.names(), ['data/table.csv', 'notes.txt'])
+        self.assertIs(self.manifest.get('data/table.csv'), entry)
+        self.assertIsNone(self.manifest.get('table.csv.gz'))
+
+    def test_refresh(self):
+        """The tree is rescanned only when it changes, and unchanged files are not hashed again."""
+        self.assertTrue(self.manifest.refresh())
+        self.assertFalse(self.manifest.refresh())
+        (self.root / 'data' / 'new.json').write_text('[]', encoding='utf-8')
+        self.assertEqual(self.manifest.get('new.json')['size'], 2)
+        (self.root / 'notes.txt').unlink()
+        self.assertIsNone(self.manifest.get('notes.txt'))
+
+    def test_file_overwritten_in_place(self):
+        """A file rewritten without any change to its directory gets a new hash and size."""
+        self.manifest.check_interval = 60
+        entry = self.manifest.get('notes.txt')
+        (self.root / 'notes.txt').write_text('longer notes', encoding='utf-8')
+        new_entry = self.manifest.get('notes.txt')
+        self.assertEqual(new_entry['size'], 12)
+        self.assertEqual(new_entry['sha256'], hashlib.sha256(b'longer notes').hexdigest())
+        self.assertNotEqual(new_entry['sha256'], entry['sha256'])
+
+    def test_same_name_in_two_directories(self):
+        """Files with the same name are both indexed, and only served by relative path."""
+        (self.root / 'other').mkdir()
+        (self.root / 'other' / 'table.csv').write_text('c\n3\n', encoding='utf-8')
+        self.assertEqual(self.manifest.get('data/table.csv')['size'], 8)
+        self.assertEqual(self.manifest.get('other/table.csv')['size'], 4)
+        self.assertIsNone(self.manifest.get('table.csv'))
+
+
+class TestDownloadFile(unittest.TestCase):
+    """Test the delivery of the resource files."""
+
+    FILE_NAME = 'contributions.csv'
+
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.create_all()
+        self.entry = download_manifest.get(self.FILE_NAME)
+        self.content = self.entry['path'].read_bytes()
+
+    def tearDown(self):
+        app.config['DOWNLOAD_OFFLOAD'] = None
+
+    def test_conditional_and_range(self):
+        """The content hash is the ETag, and byte ranges are answered with a 206."""
+        response = self.client.get(f'/download-file/{self.FILE_NAME}')
+        self.assertEqual(response.data, self.content)
+        self.assertEqual(response.headers['ETag'], f'"{self.entry["sha256"]}"')
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+
+        cached = self.client.get(f'/download-file/{self.FILE_NAME}',
+                                 headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+        partial = self.client.get(f'/download-file/{self.FILE_NAME}', headers={'Range': 'bytes=10-19'})
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial.data, self.content[10:20])
+        self.assertEqual(partial.headers['Content-Range'], f'bytes 10-19/{len(self.content)}')
+
+    def test_unknown_file(self):
+        response = self.client.get('/download-file/missing.csv')
+        self.assertEqual(response.status_code, 400)
+
+    def test_offload(self):
+        """In offload mode, the proxy sends the bytes."""
+        app.config['DOWNLOAD_OFFLOAD'] = 'x-accel-redirect'
+        response = self.client.get(f'/download-file/{self.FILE_NAME}')
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.headers['X-Accel-Redirect'],
+                         '/protected-downloads/resources/verbatims/contributions.csv')
+        self.assertNotIn('X-Sendfile', response.headers)
+        self.assertIn('filename=contributions.csv', response.headers['Content-Disposition'])
+
+        cached = self.client.get(f'/download-file/{self.FILE_NAME}',
+                                 headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(cached.status_code, 304)
+        self.assertNotIn('X-Accel-Redirect', cached.headers)
+
+        app.config['DOWNLOAD_OFFLOAD'] = 'x-sendfile'
+        response = self.client.get(f'/download-file/{self.FILE_NAME}')
+        self.assertEqual(response.headers['X-Sendfile'], str(self.entry['path'].resolve()))
+
+
+if __name__ == '__main__':
+    unittest.main()
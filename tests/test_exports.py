@@ -0,0 +1,114 @@
+import csv
+import gzip
+import io
+import json
+import sys
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import app, db
+from app.database import get_corpus_version
+from app.exports import EXPORTS_DIR, build_export, build_exports
+from app.models import Contribution, CorpusVersion
+
+CONTRIBUTION_IDS = [900001, 900002, 900003]
+
+
+class TestExports(unittest.TestCase):
+    """Test the anonymised exports built from the contributions table."""
+
+    def setUp(self):
+        """Add a few contributions, stamp a new corpus version and build its exports, as an import does."""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([
+                Contribution(id=900001, contributor='Anonyme', body='Premier avis', time=datetime(2025, 4, 1, 9, 5)),
+                Contribution(id=900002, contributor='Jean Dupont', body='Avis "cité",\nsur deux lignes',
+                             time=datetime(2025, 4, 2, 10, 30)),
+                Contribution(id=900003, contributor='Marie', body='Séparateur \u2028 unicode',
+                             time=datetime(2025, 4, 3, 18, 45)),
+            ])
+            db.session.add(CorpusVersion(contribution_count=Contribution.query.count()))
+            db.session.commit()
+            self.version = get_corpus_version()
+            build_exports(self.version)
+
+    def tearDown(self):
+        """Clean up after tests."""
+        with app.app_context():
+            Contribution.query.filter(Contribution.id.in_(CONTRIBUTION_IDS)).delete(synchronize_session=False)
+            db.session.add(CorpusVersion(contribution_count=Contribution.query.count()))
+            db.session.commit()
+            db.session.remove()
+
+    def download(self, file_name, **headers):
+        response = self.client.get(f'/download-file/{file_name}', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_formats(self):
+        """The three formats hold the same anonymised records, newest first."""
+        records = [json.loads(line) for line in self.download('contributions-anonymisees.jsonl').data.splitlines()]
+        self.assertEqual(records[:3], [
+            {'body': 'Séparateur \u2028 unicode', 'number': '900003', 'time': '2025-04-03 18:45:00',
+             'user': 'Anonymisée'},
+            {'body': 'Avis "cité",\nsur deux lignes', 'number': '900002', 'time': '2025-04-02 10:30:00',
+             'user': 'Anonymisée'},
+            {'body': 'Premier avis', 'number': '900001', 'time': '2025-04-01 09:05:00', 'user': 'Anonyme'},
+        ])
+        self.assertEqual(json.loads(self.download('contributions-anonymisees.json').data), records)
+        csv_data = self.download('contributions-anonymisees.csv').data.decode('utf-8')
+        self.assertEqual(list(csv.DictReader(io.StringIO(csv_data, newline=''))), records)
+        self.assertNotIn(b'Jean Dupont', self.download('contributions-anonymisees.csv').data)
+
+    def test_gzip(self):
+        """Clients accepting gzip get the precompressed copy."""
+        plain = self.download('contributions-anonymisees.jsonl')
+        compressed = self.download('contributions-anonymisees.jsonl', **{'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed.headers['Vary'])
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(gzip.decompress(compressed.data), plain.data)
+        self.assertNotEqual(compressed.headers['ETag'], plain.headers['ETag'])
+
+    def test_built_once_per_version(self):
+        """An export is reused until the corpus version changes, then replaced."""
+        with app.app_context():
+            path = build_export('json', self.version)
+            mtime = path.stat().st_mtime_ns
+            self.assertEqual(build_export('json', self.version).stat().st_mtime_ns, mtime)
+            Contribution.query.filter_by(id=900001).delete()
+            db.session.add(CorpusVersion(contribution_count=Contribution.query.count()))
+            db.session.commit()
+            new_path = build_export('json', get_corpus_version())
+        self.assertNotEqual(new_path, path)
+        self.assertFalse(path.exists())
+        self.assertNotIn(b'"900001"', new_path.read_bytes())
+        stale_paths = [stale_path for pattern in ('*.json', '*.json.gz') for stale_path in EXPORTS_DIR.glob(pattern)]
+        self.assertEqual(sorted(stale_paths), [new_path, new_path.with_name(f'{new_path.name}.gz')])
+
+
+    def test_requests_do_not_build_exports(self):
+        """Until the export of a new corpus version is built, the previous one is served, or a 503."""
+        previous_etag = self.download('contributions-anonymisees.jsonl').headers['ETag']
+        with app.app_context():
+            db.session.add(CorpusVersion(contribution_count=Contribution.query.count()))
+            db.session.commit()
+            version = get_corpus_version()
+        self.assertEqual(self.download('contributions-anonymisees.jsonl').headers['ETag'], previous_etag)
+        self.assertFalse(any(version in path.name for path in EXPORTS_DIR.iterdir()))
+
+        for path in EXPORTS_DIR.glob('contributions-anonymisees-*.jsonl*'):
+            path.unlink()
+        response = self.client.get('/download-file/contributions-anonymisees.jsonl')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import json
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.extract import (extract_all, extract_contributions, extract_incremental, iter_dataset,
+                             load_extraction_manifest, merge_records, parse_french_datetime)
+
+SNAPSHOT_DIR = Path(__file__).resolve().parent.parent / 'scripts' / 'scrap-data' / 'scrap-data-250430T165525'
+
+
+class TestExtract(unittest.TestCase):
+    """Test the extraction of the scraped contribution pages."""
+
+    def test_parse_french_datetime(self):
+        """Dates are parsed without a French locale."""
+        self.assertEqual(parse_french_datetime('30 avril 2025 à 16h55'), datetime(2025, 4, 30, 16, 55))
+        self.assertEqual(parse_french_datetime(' 1 février 2025 à 9h05 '), datetime(2025, 2, 1, 9, 5))
+        with self.assertRaises(ValueError):
+            parse_french_datetime('30 april 2025 à 16h55')
+
+    def test_parsers_agree(self):
+        """The lxml parser extracts the same contributions as the BeautifulSoup implementation."""
+        for page in (1, 2, 180, 361):
+            html_file = SNAPSHOT_DIR / f'contrib-page-{page}.html'
+            contributions = extract_contributions(html_file)
+            self.assertEqual(len(contributions), 10)
+            self.assertEqual(contributions, extract_contributions(html_file, parser='html.parser'))
+
+    def test_extract_all_order(self):
+        """Contributions are returned in page order, whatever the order of the files and the number of processes."""
+        html_files = [SNAPSHOT_DIR / f'contrib-page-{page}.html' for page in (12, 3, 10, 1)]
+        contributions = extract_all(html_files, workers=2)
+        numbers = [int(contribution['number']) for contribution in contributions]
+        self.assertEqual(numbers, sorted(numbers, reverse=True))
+        self.assertEqual(numbers[0], 3610)
+        self.assertEqual(contributions, extract_all(html_files, workers=1))
+        first = contributions[0]
+        self.assertEqual((first['user'], first['time']), ('Anonyme', datetime(2025, 4, 30, 16, 55)))
+
+    def test_extract_incremental(self):
+        """Only new or changed pages are parsed, and their contributions are merged by number."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            scrap_data_dir = Path(temp_dir)
+            output_dir = scrap_data_dir / 'extracted'
+            output_dir.mkdir()
+            snapshot_dir = scrap_data_dir / 'scrap-data-250430T165525'
+            snapshot_dir.mkdir()
+            html_files = []
+            for page in (1, 2, 3):
+                html_files.append(snapshot_dir / f'contrib-page-{page}.html')
+                shutil.copy(SNAPSHOT_DIR / html_files[-1].name, html_files[-1])
+
+            delta = extract_incremental(html_files, scrap_data_dir, output_dir, workers=1)
+            self.assertEqual((delta['parsed_pages'], len(delta['added']), delta['total']), (3, 30, 30))
+            manifest = load_extraction_manifest(output_dir)
+            self.assertEqual(manifest['pages']['scrap-data-250430T165525/contrib-page-1.html']['numbers'][0], '3610')
+
+            # Nothing changed: no page is parsed
+            delta = extract_incremental(html_files, scrap_data_dir, output_dir, workers=1)
+            self.assertEqual((delta['parsed_pages'], delta['added'], delta['updated']), (0, [], []))
+
+            # A newer snapshot of page 2 with an edited contribution, and page 3 dropped
+            new_snapshot_dir = scrap_data_dir / 'scrap-data-250501T080000'
+            new_snapshot_dir.mkdir()
+            content = (snapshot_dir / 'contrib-page-2.html').read_text(encoding='utf-8')
+            (new_snapshot_dir / 'contrib-page-2.html').write_text(
+                content.replace('Je suis contre ce projet', 'Je suis pour ce projet'), encoding='utf-8'
+            )
+            html_files = [html_files[0], new_snapshot_dir / 'contrib-page-2.html']
+            delta = extract_incremental(html_files, scrap_data_dir, output_dir, workers=1)
+            self.assertEqual(delta['parsed_pages'], 1)
+            self.assertEqual([record['number'] for record in delta['updated']], ['3598'])
+            self.assertEqual(len(delta['removed']), 10)
+            self.assertEqual(delta['total'], 20)
+            with open(output_dir / 'contributions.json', encoding='utf-8') as file:
+                dataset = {record['number']: record for record in json.load(file)}
+            self.assertTrue(dataset['3598']['body'].startswith('Je suis pour ce projet'))
+            self.assertTrue(list(output_dir.glob('delta-*.json')))
+
+    def test_extract_incremental_conflict(self):
+        """A contribution extracted with two contents is reported, the last page listed wins."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            scrap_data_dir = Path(temp_dir)
+            html_files = []
+            for snapshot, edit in (('scrap-data-250430T165525', 'Bravo'), ('scrap-data-250501T080000', 'Merci')):
+                (scrap_data_dir / snapshot).mkdir()
+                content = (SNAPSHOT_DIR / 'contrib-page-1.html').read_text(encoding='utf-8')
+                html_files.append(scrap_data_dir / snapshot / 'contrib-page-1.html')
+                html_files[-1].write_text(content.replace('Bravo à toutes', f'{edit} à toutes'), encoding='utf-8')
+            delta = extract_incremental(html_files, scrap_data_dir, scrap_data_dir, workers=1)
+            self.assertEqual([conflict['number'] for conflict in delta['conflicts']], ['3610'])
+            record = next(record for record in delta['added'] if record['number'] == '3610')
+            self.assertTrue(record['body'].startswith('Merci'))
+
+
+    def test_merge_legacy_dataset(self):
+        """A legacy contributions.json is streamed in its order, records without a valid number are skipped."""
+        def record(number):
+            return {'number': number, 'user': 'Anonyme', 'time': '2025-04-30 16:55:00', 'body': f'Avis {number}'}
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_dir = Path(temp_dir)
+            with open(output_dir / 'contributions.json', 'w', encoding='utf-8') as file:
+                json.dump([record('5'), record(None), record('abc'), record('2')], file)
+            delta = {'added': [], 'updated': [], 'removed': []}
+            merged = list(merge_records(iter_dataset(output_dir), {'4': record('4')}, {'5', '4', '2'}, delta))
+        self.assertEqual([item['number'] for item in merged], ['5', '4', '2'])
+        self.assertEqual([item['number'] for item in delta['added']], ['4'])
+        self.assertEqual(delta['removed'], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.import_time import REPOSITORY_PATH, import_time_report, parse_import_times, profile_imports
+
+# Budget of `import app` under -X importtime, best of a few runs; it took about 1.3 s when the
+# Mistral client was imported eagerly, and 0.6 s without it
+IMPORT_TIME_BUDGET_MS = 1000
+
+# Subsystems loaded on first use only
+LAZY_MODULES = ['mistralai', 'captcha.image']
+
+
+class TestImportTime(unittest.TestCase):
+    """Test the import time of the application."""
+
+    def test_parse_import_times(self):
+        """Every line of the report is parsed, with the nesting depth of its module."""
+        report = ("import time: self [us] | cumulative | imported package\n"
+                  "import time:       239 |        239 |         captcha\n"
+                  "import time:       628 |      20535 |       captcha.image\n"
+                  "import time:      1128 |      23480 |     app.utils\n"
+                  "import time:      3920 |      30000 | app\n")
+        entries = parse_import_times(report)
+        self.assertEqual([entry['module'] for entry in entries], ['captcha', 'captcha.image', 'app.utils', 'app'])
+        self.assertEqual([entry['depth'] for entry in entries], [4, 3, 2, 0])
+        report = import_time_report(entries)
+        self.assertEqual(report['total_ms'], 30.0)
+        self.assertEqual(report['slowest'][0], {'package': 'app', 'ms': 5.0, 'modules': 2})
+
+    def test_lazy_modules(self):
+        """Importing the app does not load the subsystems that are loaded on first use."""
+        code = f"import sys, app; print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+        result = subprocess.run([sys.executable, '-c', code], cwd=REPOSITORY_PATH, capture_output=True, text=True,
+                                check=True)
+        self.assertEqual(result.stdout.strip(), '')
+
+    def test_import_time_budget(self):
+        """Importing the app stays within its budget."""
+        total_ms = min(import_time_report(profile_imports())['total_ms'] for _ in range(3))
+        self.assertLess(total_ms, IMPORT_TIME_BUDGET_MS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import io
+import json
+import sys
+import unittest
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.json_stream import iter_json_array, iter_json_lines
+
+
+class TestJsonStream(unittest.TestCase):
+    """Test the incremental JSON parsers."""
+
+    def test_iter_json_array(self):
+        """Items are the ones of json.loads, whatever the chunk boundaries."""
+        texts = ['[]', ' [ ] ', '[12345678901234]', '[1, 22 ,{"a": [1, 2], "b": "x\\"]"}, "Anonymisée\\u2028", null]',
+                 json.dumps([{'number': str(n), 'body': 'é' * n} for n in range(50)], indent=4)]
+        for text in texts:
+            for chunk_size in (1, 2, 7, 64 * 1024):
+                self.assertEqual(list(iter_json_array(io.StringIO(text), chunk_size)), json.loads(text))
+
+    def test_iter_json_array_errors(self):
+        """Invalid arrays raise a JSONDecodeError."""
+        for text in ['', '{}', '[1,]', '[1 2]', '[1', '[{"a": 1}']:
+            with self.assertRaises(json.JSONDecodeError, msg=text):
+                list(iter_json_array(io.StringIO(text), 2))
+
+    def test_iter_json_lines(self):
+        """Each non-empty line is an item."""
+        self.assertEqual(list(iter_json_lines(io.StringIO('{"a": 1}\n\n[2]\n"x"'))), [{'a': 1}, [2], 'x'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import sys
+import unittest
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import app, db
+from app.log_writer import WriteBehindLogger
+from app.models import DownloadLog, SearchLog
+
+
+class TestWriteBehindLogger(unittest.TestCase):
+    """Test the write-behind logger."""
+
+    def setUp(self):
+        """Set up test environment."""
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+        self.log_writer = WriteBehindLogger(app, batch_size=10, flush_interval=0.05, max_queue_size=5,
+                                            enqueue_timeout=0)
+
+    def tearDown(self):
+        """Clean up after tests."""
+        self.log_writer.stop()
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_records_are_written_in_batches(self):
+        """Queued records of several tables are written by the background thread."""
+        with app.app_context():
+            search_logs_before = SearchLog.query.count()
+        self.assertTrue(self.log_writer.log(SearchLog, search_content='vélo', ip_address='127.0.0.1'))
+        self.assertTrue(self.log_writer.log(DownloadLog, file_name='contributions.csv', ip_address='127.0.0.1'))
+        self.log_writer.stop()
+
+        with app.app_context():
+            self.assertEqual(SearchLog.query.count(), search_logs_before + 1)
+            self.assertIsNotNone(SearchLog.query.order_by(SearchLog.id.desc()).first().timestamp)
+        stats = self.log_writer.stats()
+        self.assertEqual((stats['flushed'], stats['dropped'], stats['queued']), (2, 0, 0))
+
+    def test_full_queue_drops_records(self):
+        """Records are dropped and counted when the queue is full."""
+        self.log_writer._ensure_started = lambda: None  # Keep the queue from being drained
+        results = [self.log_writer.log(SearchLog, search_content=str(i), ip_address='::1') for i in range(7)]
+        self.assertEqual(results.count(False), 2)
+        self.assertEqual(self.log_writer.stats()['dropped'], 2)
+
+        self.log_writer.flush()
+        self.assertEqual(self.log_writer.stats()['flushed'], 5)
+
+    def test_invalid_record_does_not_drop_its_batch(self):
+        """A record breaking a constraint is the only one lost from its batch."""
+        self.log_writer._ensure_started = lambda: None
+        with app.app_context():
+            search_logs_before = SearchLog.query.count()
+        self.log_writer.log(SearchLog, search_content='avant', ip_address='::1')
+        self.log_writer.log(SearchLog, search_content='sans adresse', ip_address=None)
+        self.log_writer.log(SearchLog, search_content='après', ip_address='::1')
+        self.log_writer.flush()
+
+        with app.app_context():
+            self.assertEqual(SearchLog.query.count(), search_logs_before + 2)
+        stats = self.log_writer.stats()
+        self.assertEqual((stats['flushed'], stats['failed']), (2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
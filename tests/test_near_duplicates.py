@@ -0,0 +1,87 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.near_duplicates import NearDuplicateIndex
+
+TEMPLATE = ("Je suis opposé au projet de télésiège de la Côte 2000 car il va détruire la forêt, "
+            "augmenter le trafic routier et coûter trop cher à la commune de Villard-de-Lans.")
+
+
+class TestNearDuplicateIndex(unittest.TestCase):
+    """Test the MinHash/LSH near-duplicate index."""
+
+    def setUp(self):
+        """Index a small corpus with one cluster of template contributions."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / 'near-duplicates.npz'
+        self.documents = [
+            (1, TEMPLATE),
+            (2, "Bonjour, le parking du front de neige est déjà saturé le week-end."),
+            (3, TEMPLATE + " Merci."),
+            (4, TEMPLATE.replace("trop cher", "beaucoup trop cher")),
+            (5, ""),
+            (6, ""),
+        ]
+        self.index = NearDuplicateIndex(path=self.path)
+        self.index.update(self.documents, version='1')
+
+    def tearDown(self):
+        """Clean up after tests."""
+        self.temp_dir.cleanup()
+
+    def test_clusters(self):
+        """Template contributions are grouped, distinct and empty ones stay alone."""
+        self.assertEqual([self.index.cluster_size(i) for i in range(1, 7)], [3, 1, 3, 3, 1, 1])
+        self.assertEqual(self.index.cluster_size(42), 1)
+        self.assertEqual([similar_id for similar_id, _ in self.index.similar(1)], [3, 4])
+        self.assertTrue(all(similarity >= 0.7 for _, similarity in self.index.similar(4)))
+        self.assertEqual(self.index.similar(2), [])
+
+    def test_collapse(self):
+        """Only the smallest id of each cluster is kept, in the given order."""
+        self.assertEqual(self.index.collapse([4, 3, 2, 1, 7]), [2, 1, 7])
+        self.assertEqual(self.index.collapse([4, 3]), [])
+
+    def test_incremental_update(self):
+        """Only new or modified contributions get a new signature."""
+        documents = self.documents[:5] + [(6, "Un tout autre avis."), (7, TEMPLATE)]
+        self.assertEqual(self.index.update(documents, version='2'), 2)
+        self.assertEqual(self.index.cluster_size(7), 4)
+        self.assertEqual(self.index.update(documents, version='2'), 0)
+
+    def test_save_and_load(self):
+        """A saved index is loaded with the same clusters, and ignored with other parameters."""
+        self.index.save()
+        loaded = NearDuplicateIndex(path=self.path)
+        self.assertTrue(loaded.load())
+        self.assertEqual(loaded.version, '1')
+        self.assertEqual(loaded.similar(1), self.index.similar(1))
+
+        self.assertFalse(NearDuplicateIndex(path=self.path, num_perm=64).load())
+        self.assertFalse(NearDuplicateIndex(path=Path(self.temp_dir.name) / 'missing.npz').load())
+        # An index saved for another corpus version is ignored
+        self.assertFalse(NearDuplicateIndex(path=self.path).load(version='2'))
+
+    def test_view_of_the_current_version(self):
+        """A stale index is not used, and the one saved by another process for the new version is read."""
+        self.assertIs(self.index.view('1'), self.index)
+        self.index.save()
+        self.assertIsNone(self.index.view('2'))
+
+        rebuilt = NearDuplicateIndex(path=self.path)
+        rebuilt.update(self.documents[:2] + [(3, "Un tout autre avis.")], version='2')
+        rebuilt.save()
+        view = self.index.view('2')
+        self.assertIsNot(view, self.index)
+        self.assertEqual(view.version, '2')
+        self.assertEqual(view.cluster_size(1), 1)
+        self.assertEqual(self.index.cluster_size(1), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.result_cache import FragmentCache, SearchResultCache
+
+
+class TestSearchResultCache(unittest.TestCase):
+    """Test the shared search result cache."""
+
+    def setUp(self):
+        """Use a cache file in a temporary directory."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = SearchResultCache(Path(self.temp_dir.name) / 'cache.db', max_bytes=100)
+
+    def tearDown(self):
+        """Clean up after tests."""
+        self.temp_dir.cleanup()
+
+    def test_hit_and_miss(self):
+        """Stored results are returned for the same version only."""
+        key = self.cache.make_key((('velo',),), 'id')
+        self.assertIsNone(self.cache.get(key, '1'))
+        self.cache.put(key, '1', [3, 1, 2], 3)
+        self.assertEqual(self.cache.get(key, '1'), ([3, 1, 2], 3))
+
+        # A new corpus version invalidates the entry
+        self.assertIsNone(self.cache.get(key, '2'))
+        self.assertIsNone(self.cache.get(key, '1'))
+
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 3))
+        self.assertEqual(stats['entries'], 0)
+
+    def test_lru_eviction(self):
+        """The least recently used entries are evicted beyond the size bound."""
+        self.cache.touch_interval = 0
+        for name in ('a', 'b', 'c'):
+            self.cache.put(name, '1', list(range(10)), 10)  # 40 bytes each
+        self.assertIsNone(self.cache.get('a', '1'))
+        self.assertIsNotNone(self.cache.get('b', '1'))
+
+        self.cache.put('d', '1', list(range(10)), 10)
+        self.assertIsNone(self.cache.get('c', '1'))
+        self.assertIsNotNone(self.cache.get('b', '1'))
+        self.assertLessEqual(self.cache.stats()['bytes'], 100)
+
+    def test_hits_do_not_write(self):
+        """Hits within the touch interval leave the file untouched, and the size is kept by the triggers."""
+        self.cache.put('a', '1', [1, 2], 2)
+        self.cache.put('a', '1', [1, 2, 3], 3)
+        self.cache.put('b', '1', [1], 1)
+        connection = self.cache._connection()
+        changes = connection.total_changes
+        for _ in range(5):
+            self.assertEqual(self.cache.get('a', '1'), ([1, 2, 3], 3))
+        self.assertEqual(connection.total_changes, changes)
+
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits'], 5)
+        self.assertEqual(stats['bytes'], 16 + 8)
+        self.cache.clear()
+        self.assertEqual(self.cache.stats()['bytes'], 0)
+
+    def test_ttl(self):
+        """Expired entries are not returned."""
+        self.cache.ttl = -1
+        self.cache.put('a', '1', [1], 1)
+        self.assertIsNone(self.cache.get('a', '1'))
+
+
+class TestFragmentCache(unittest.TestCase):
+    """Test the rendered fragment cache."""
+
+    def setUp(self):
+        """Use a cache file in a temporary directory."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = FragmentCache(Path(self.temp_dir.name) / 'cache.db')
+
+    def tearDown(self):
+        """Clean up after tests."""
+        self.temp_dir.cleanup()
+
+    def test_etag(self):
+        """Fragments are returned with the strong ETag of their content."""
+        key = self.cache.make_key('contributions_content.html', 'vélo', '', 'id')
+        etag = self.cache.put(key, '1', '<div>vélo\n</div>')
+        self.assertEqual(self.cache.get(key, '1'), (etag, '<div>vélo\n</div>'))
+        self.assertNotEqual(etag, self.cache.put(key, '1', '<div>velo</div>'))
+        self.assertIsNone(self.cache.get(key, '2'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.scrap import Scraper, load_manifest, next_run, save_manifest, seed_manifest
+
+SNAPSHOT_DIR = Path(__file__).resolve().parent.parent / 'scripts' / 'scrap-data' / 'scrap-data-250430T165525'
+PAGE_COUNT = 6
+
+
+class RegistreStandIn(ThreadingHTTPServer):
+    """Local stand-in for the registre, serving the first pages of the checked-in scrape."""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RegistreHandler)
+        self.pages = {}
+        for page in range(1, PAGE_COUNT + 1):
+            content = (SNAPSHOT_DIR / f'contrib-page-{page}.html').read_text(encoding='utf-8')
+            self.pages[page] = content.replace('data-max="361"', f'data-max="{PAGE_COUNT}"')
+        self.with_etags = True
+        self.failures = 0
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/6058/contributions/'
+
+
+class RegistreHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+        page = int(self.path.rsplit('/', 1)[1])
+        with server.lock:
+            server.requests.append(page)
+            if server.failures:
+                server.failures -= 1
+                self.send_response(503)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+        body = server.pages[page].encode('utf-8')
+        etag = f'"{hash(server.pages[page])}"'
+        if server.with_etags and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if server.with_etags:
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', formatdate(usegmt=True))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestScrap(unittest.TestCase):
+    """Test the incremental scraper against a local stand-in server."""
+
+    def setUp(self):
+        self.server = RegistreStandIn()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.data_dir = Path(tempfile.mkdtemp())
+        self.scraper = Scraper(self.server.base_url, self.data_dir, concurrency=3, backoff_factor=0)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.data_dir)
+
+    def test_first_scrape(self):
+        """A first run fetches every page into a snapshot and records them in the manifest."""
+        stats = self.scraper.scrape()
+        self.assertEqual(stats['fetched'], PAGE_COUNT)
+        self.assertEqual(stats['written'], PAGE_COUNT)
+        self.assertEqual(sorted(self.server.requests), list(range(1, PAGE_COUNT + 1)))
+        manifest = load_manifest(self.data_dir)
+        self.assertEqual(manifest['page_count'], PAGE_COUNT)
+        self.assertEqual(manifest['pages']['1']['numbers'], list(range(3610, 3600, -1)))
+        written = (stats['snapshot'] / 'contrib-page-2.html').read_text(encoding='utf-8')
+        self.assertEqual(written, self.server.pages[2])
+
+    def test_not_modified(self):
+        """A second run stops at the 304 answer to the conditional request of page 1."""
+        self.scraper.scrape()
+        self.server.requests.clear()
+        stats = self.scraper.scrape()
+        self.assertEqual(self.server.requests, [1])
+        self.assertEqual((stats['not_modified'], stats['written'], stats['snapshot']), (1, 0, None))
+
+    def test_not_modified_without_page_count(self):
+        """A 304 for page 1 with no page count in the manifest falls back to an unconditional request."""
+        self.scraper.scrape()
+        manifest = load_manifest(self.data_dir)
+        manifest['page_count'] = None
+        save_manifest(self.data_dir, manifest)
+        self.server.requests.clear()
+        stats = self.scraper.scrape(full=True)
+        self.assertEqual(self.server.requests[:2], [1, 1])
+        self.assertEqual((stats['page_count'], stats['written']), (PAGE_COUNT, 0))
+        self.assertEqual(load_manifest(self.data_dir)['page_count'], PAGE_COUNT)
+
+    def test_new_contributions(self):
+        """Without validators, the scrape stops at the first page holding no new contribution."""
+        self.server.with_etags = False
+        self.scraper.scrape()
+        self.server.requests.clear()
+        # Two new contributions shift every page
+        pages = self.server.pages
+        pages[1] = pages[1].replace('Contribution n°3610', 'Contribution n°3612').replace(
+            'Contribution n°3609', 'Contribution n°3611')
+        pages[2] = pages[2].replace('Contribution n°3600 ', 'Contribution n°3602 ')
+        stats = self.scraper.scrape()
+        # Page 2 lists known contributions only: page 3 is the last of the window
+        self.assertEqual(sorted(self.server.requests), [1, 2, 3, 4])
+        self.assertEqual(stats['written'], 2)
+        manifest = load_manifest(self.data_dir)
+        self.assertIn(3612, manifest['pages']['1']['numbers'])
+        self.assertTrue(manifest['pages']['1']['file'].startswith(stats['snapshot'].name))
+
+    def test_retry(self):
+        """Transient server errors are retried."""
+        self.server.failures = 2
+        stats = self.scraper.scrape()
+        self.assertEqual(stats['fetched'], PAGE_COUNT)
+        self.assertEqual(self.server.requests[:3], [1, 1, 1])
+
+    def test_seed_manifest(self):
+        """The manifest of an existing snapshot makes the next run conditional on content."""
+        snapshot_dir = self.data_dir / 'scrap-data-250430T165525'
+        snapshot_dir.mkdir()
+        for page, content in self.server.pages.items():
+            (snapshot_dir / f'contrib-page-{page}.html').write_text(content, encoding='utf-8')
+        manifest = seed_manifest(self.data_dir, snapshot_dir)
+        self.assertEqual(manifest['page_count'], PAGE_COUNT)
+        stats = self.scraper.scrape()
+        self.assertEqual((stats['unchanged'], stats['written']), (1, 0))
+
+    def test_next_run(self):
+        """Scheduled runs happen at start_at, then every period."""
+        now = datetime(2025, 5, 1, 12, 0)
+        self.assertEqual(next_run(None, None, now), now)
+        self.assertEqual(next_run(now + timedelta(hours=2), None, now), now + timedelta(hours=2))
+        start_at = datetime(2025, 4, 30, 18, 0)
+        self.assertEqual(next_run(start_at, timedelta(hours=24), now), datetime(2025, 5, 1, 18, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
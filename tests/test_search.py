@@ -0,0 +1,221 @@
+import sys
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert, select, text, update
+from sqlalchemy.orm import Session
+
+# Add the parent directory to the Python path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import db
+from app.models import Contribution
+from app.highlight import compile_keywords_pattern, highlight_keywords, normalize_keywords
+from app.pagination import cursor_int, decode_cursor, encode_cursor
+from app.search import LIKE_ESCAPE, build_fts_match_query, build_like_pattern, create_fts_index, fts_matching_ids
+from app.search_index import ContributionIndex
+
+
+class TestFullTextSearch(unittest.TestCase):
+    """Test the FTS5 index over contributions."""
+
+    def setUp(self):
+        """Set up a standalone in-memory database with a few contributions."""
+        self.engine = create_engine('sqlite://')
+        db.metadata.create_all(self.engine, tables=[Contribution.__table__])
+        self.connection = self.engine.connect()
+        self.connection.execute(insert(Contribution.__table__), [
+            self.make_row(1, 'Anonyme', 'Je viens à vélo jusqu\'à la station.', datetime(2025, 4, 12, 14, 30)),
+            self.make_row(2, 'Jean Dupont', 'Le projet est trop cher.', datetime(2025, 4, 28, 9, 5)),
+        ])
+        self.assertTrue(create_fts_index(self.connection))
+
+    def tearDown(self):
+        """Clean up after tests."""
+        self.connection.close()
+        self.engine.dispose()
+
+    @staticmethod
+    def make_row(contribution_id, contributor, body, time):
+        row = {'id': contribution_id, 'contributor': contributor, 'body': body, 'time': time}
+        row.update(Contribution.search_columns(contribution_id, contributor, body, time))
+        return row
+
+    def search(self, search_query):
+        match_query = build_fts_match_query(search_query.split())
+        statement = select(Contribution.id).where(Contribution.id.in_(fts_matching_ids(match_query)))
+        return self.connection.execute(statement.order_by(Contribution.id)).scalars().all()
+
+    def test_index_is_rebuilt_from_existing_rows(self):
+        """Rows inserted before the index existed are indexed."""
+        self.assertEqual(self.connection.execute(text('SELECT count(*) FROM contributions_fts_docsize')).scalar(), 2)
+
+    def test_accent_folding_and_prefix(self):
+        """Unaccented keywords match accented words, and keywords match word prefixes."""
+        self.assertEqual(self.search('velo'), [1])
+        self.assertEqual(self.search('VÉL'), [1])
+        self.assertEqual(self.search('proj cher'), [2])
+
+    def test_metadata_fields_are_searchable(self):
+        """The id, anonymized author and formatted time are searchable like the body."""
+        self.assertEqual(self.search('anonymisee'), [2])
+        self.assertEqual(self.search('12/04/2025'), [1])
+        self.assertEqual(self.search('1'), [1])
+
+    def test_triggers_keep_index_in_sync(self):
+        """Inserts, updates and deletes on contributions are mirrored in the index."""
+        self.connection.execute(insert(Contribution.__table__), [
+            self.make_row(3, 'Anonyme', 'Télécabine', datetime(2025, 4, 29))
+        ])
+        self.assertEqual(self.search('telecabine'), [3])
+
+        self.connection.execute(
+            update(Contribution.__table__).where(Contribution.id == 3),
+            Contribution.search_columns(3, 'Anonyme', 'Parking', datetime(2025, 4, 29))
+        )
+        self.assertEqual(self.search('telecabine'), [])
+        self.assertEqual(self.search('parking'), [3])
+
+        self.connection.execute(text('DELETE FROM contributions WHERE id = 3'))
+        self.assertEqual(self.search('parking'), [])
+
+    def test_orm_inserts_are_searchable_by_number(self):
+        """Contributions numbered by the database on insert get their number in search_text."""
+        with Session(bind=self.connection) as session:
+            contribution = Contribution(contributor='Anonyme', body='Télécabine', time=datetime(2025, 4, 29))
+            session.add(contribution)
+            session.flush()
+            self.assertEqual(contribution.id, 3)
+            self.assertTrue(contribution.search_text.startswith('3 '))
+            self.assertNotIn(contribution, session.dirty)
+        self.assertEqual(self.search('3'), [3])
+
+    def test_like_pattern_escaping(self):
+        """LIKE wildcards typed by the user match literally."""
+        self.connection.execute(insert(Contribution.__table__), [
+            self.make_row(3, 'Anonyme', '100% vélo', datetime(2025, 4, 29)),
+            self.make_row(4, 'Anonyme', '1000 velos', datetime(2025, 4, 29)),
+        ])
+        self.assertEqual(build_like_pattern('100%'), '%100\\%%')
+
+        def like(keyword):
+            statement = select(Contribution.id).where(
+                Contribution.search_text.like(build_like_pattern(keyword), escape=LIKE_ESCAPE))
+            return self.connection.execute(statement.order_by(Contribution.id)).scalars().all()
+
+        self.assertEqual(like('100%'), [3])
+        self.assertEqual(like('10_0'), [])
+        self.assertEqual(like('VÉLO'), [1, 3, 4])
+
+    def test_search_columns(self):
+        """The materialized columns combine every searchable field, accent-folded."""
+        columns = Contribution.search_columns(7, 'Jean Dupont', 'Le Vélo', datetime(2025, 4, 12, 14, 30))
+        self.assertEqual(columns['formatted_time'], 'Le 12/04/2025 à 14h30')
+        self.assertEqual(columns['anonymized_contributor'], 'Anonymisée')
+        self.assertEqual(columns['search_text'], '7 anonymisee le 12/04/2025 a 14h30 le velo')
+
+    def test_match_query_escaping(self):
+        """Quotes are escaped and keywords without word characters are ignored."""
+        self.assertEqual(build_fts_match_query(['l"ete', '-']), '"l" AND "ete"*')
+        self.assertEqual(build_fts_match_query(['AND', 'NEAR(a']), '"and"* AND "near" AND "a"*')
+        self.assertEqual(build_fts_match_query(['?']), '')
+
+    def test_same_results_as_the_index(self):
+        """The FTS5 query and the in-memory index apply the same rule to multi-token keywords."""
+        self.connection.execute(insert(Contribution.__table__), [
+            # "12" and "04" are in this contribution, but not as the adjacent date tokens "12 04"
+            self.make_row(3, 'Anonyme', 'Le 04 mai et le 12 avril, near and far', datetime(2025, 5, 20, 8, 0)),
+        ])
+        index = ContributionIndex()
+        index.build(self.connection.execute(select(Contribution.id, Contribution.search_text)))
+        for query in ('velo', 'VÉL stat', '12/04', '04/12', '12/04/2025', "jusqu'a", 'l"ete', 'near and',
+                      'anonymisee 2025', 'le proj', 'cher -'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), index.search(query.split()))
+        self.assertEqual(self.search('12/04'), [1, 3])
+
+
+class TestContributionIndex(unittest.TestCase):
+    """Test the in-memory inverted index."""
+
+    def setUp(self):
+        """Build an index over a few documents."""
+        self.index = ContributionIndex()
+        self.index.build([
+            (3, 'Le vélo, le vélo et encore le vélo'),
+            (1, 'Je viens à vélo le 12/04/2025 mais le parking est plein'),
+            (2, 'Le parking de la station'),
+        ])
+
+    def test_and_of_keywords(self):
+        """Every keyword must match, as an accent-insensitive prefix."""
+        self.assertTrue(self.index.ready)
+        self.assertEqual(self.index.search(['velo']), [1, 3])
+        self.assertEqual(self.index.search(['VÉL', 'park']), [1])
+        self.assertEqual(self.index.search(['velo', 'station']), [])
+        self.assertEqual(self.index.search(['12/04']), [1])
+
+    def test_empty_query_returns_every_id(self):
+        """Queries without searchable keywords return the whole corpus in id order."""
+        self.assertEqual(self.index.search([]), [1, 2, 3])
+        self.assertEqual(self.index.search(['-']), [1, 2, 3])
+
+    def test_relevance_order(self):
+        """BM25 ranks documents with more occurrences of the keyword first."""
+        self.assertEqual(self.index.search(['velo'], order='relevance'), [3, 1])
+        self.assertEqual(self.index.search(['parking'], order='relevance'), [2, 1])
+
+
+class TestHighlight(unittest.TestCase):
+    """Test the keyword highlighter."""
+
+    def test_accent_insensitive_single_pass(self):
+        """Keywords are matched at word starts without accents and the original text is kept."""
+        self.assertEqual(
+            highlight_keywords('Le Vélo et le développement', ['velo', 'de']),
+            'Le <span class="keyword-highlight">Vélo</span> et le '
+            '<span class="keyword-highlight">dé</span>veloppement'
+        )
+
+    def test_text_is_escaped(self):
+        """HTML in the text is escaped and keywords never match inside inserted tags."""
+        self.assertEqual(
+            highlight_keywords('<b>span</b>', ['span', 'class']),
+            '&lt;b&gt;<span class="keyword-highlight">span</span>&lt;/b&gt;'
+        )
+
+    def test_multi_token_keyword(self):
+        """Keywords made of several tokens match like the search phrases."""
+        self.assertEqual(
+            highlight_keywords('Le 12/04/2025 à 14h30', ['12/04']),
+            'Le <span class="keyword-highlight">12/04</span>/2025 à 14h30'
+        )
+
+    def test_pattern_cache(self):
+        """Equivalent queries share the same compiled pattern."""
+        self.assertEqual(normalize_keywords(['Vélo', 'parking']), normalize_keywords(['PARKING', 'velo']))
+        self.assertIs(compile_keywords_pattern(normalize_keywords(['Vélo', 'parking'])),
+                      compile_keywords_pattern(normalize_keywords(['parking', 'velo'])))
+        self.assertIsNone(compile_keywords_pattern(normalize_keywords(['-'])))
+
+
+class TestCursor(unittest.TestCase):
+    """Test the opaque pagination cursors."""
+
+    def test_round_trip(self):
+        """A cursor decodes to the values it was built from."""
+        values = {'after': 3041, 'total': 767}
+        self.assertEqual(decode_cursor(encode_cursor(values)), values)
+
+    def test_invalid_cursors(self):
+        """Missing or malformed cursors decode to an empty state."""
+        self.assertEqual(decode_cursor(None), {})
+        self.assertEqual(decode_cursor('not a cursor!'), {})
+        self.assertEqual(decode_cursor(encode_cursor([1, 2])), {})
+        self.assertIsNone(cursor_int({'after': -1}, 'after'))
+        self.assertIsNone(cursor_int({'after': '12'}, 'after'))
+
+
+if __name__ == '__main__':
+    unittest.main()
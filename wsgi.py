@@ -1,7 +1,9 @@
-from app import app
+from app import create_app
+
+app = create_app()
 
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=5001, debug=True)
 
 # WSGI entry point
-application = app
\ No newline at end of file
+application = app